@@ -8,4 +8,5 @@ class InventoryAppConfig(AppConfig):
 
     def ready(self):
         import inventory_app.signals
+        import inventory_app.utils.job_handlers  # تسجيل أنواع المهام الخلفية
 
@@ -0,0 +1,55 @@
+"""
+أمر Django لأخذ نسخة احتياطية كاملة أو تفاضلية إلى ملف
+(مناسب للجدولة الدورية: نسخة كاملة يومياً ونسخ تفاضلية كل ساعة).
+"""
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from inventory_app.utils.backup import backup_plan, save_watermark, stream_json_backup, stream_zip_backup
+from inventory_app.utils.streaming import buffered, gzip_stream
+
+
+class Command(BaseCommand):
+    help = 'أخذ نسخة احتياطية كاملة أو تفاضلية (التغييرات منذ آخر نسخة فقط)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--differential', action='store_true', help='تصدير التغييرات منذ علامة آخر نسخة فقط')
+        parser.add_argument('--output-dir', type=str, default=os.path.join(settings.BASE_DIR, 'backups'),
+                            help='مجلد حفظ ملفات النسخ')
+        parser.add_argument('--format', choices=['json', 'zip'], default='json', help='صيغة الملف')
+        parser.add_argument('--gzip', action='store_true', help='ضغط ملف JSON بصيغة gzip')
+
+    def handle(self, *args, **options):
+        differential = options['differential']
+        try:
+            sections, info, watermark = backup_plan(differential=differential)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        backup_type = 'differential' if differential else 'full'
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f"backup_{'diff' if differential else 'full'}_{timestamp}"
+        if options['format'] == 'zip':
+            stream = stream_zip_backup(sections, info)
+            name += '.zip'
+        else:
+            stream = buffered(stream_json_backup(sections, info))
+            name += '.json'
+            if options['gzip']:
+                stream = gzip_stream(stream)
+                name += '.gz'
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        path = os.path.join(options['output_dir'], name)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            for chunk in stream:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        # العلامة تتقدم فقط بعد أن يصبح الملف في مكانه، وإلا تُفقد تغييرات النسخة التفاضلية التالية
+        save_watermark(watermark, backup_type)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ تم حفظ النسخة: {path}'))
+        self.stdout.write(f"  - العلامة: {watermark['secure_backup_id']} ({watermark['timestamp']})")
@@ -1,9 +1,11 @@
-import json
 import os
 from django.core.management.base import BaseCommand
-from django.core import serializers
-from inventory_app.models import Product, Location, Warehouse, AuditLog
-from datetime import datetime
+from inventory_app.utils.backup import BACKUP_SECTIONS, export_info, iter_serialized, stream_json_backup
+from inventory_app.utils.streaming import ITERATOR_CHUNK_SIZE, buffered
+
+
+# الأقسام التي يصدّرها هذا الأمر (بترتيب الاعتماديات)
+EXPORT_SECTIONS = ['warehouses', 'locations', 'containers', 'products', 'audit_logs', 'orders', 'returns']
 
 
 class Command(BaseCommand):
@@ -21,45 +23,46 @@ class Command(BaseCommand):
             type=str,
             default='json',
             choices=['json', 'json-indent'],
-            help='صيغة الملف'
+            help='صيغة الملف (كلاهما يكتب سجلاً واحداً في كل سطر)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ITERATOR_CHUNK_SIZE,
+            help='عدد السجلات المقروءة من قاعدة البيانات في كل دفعة'
         )
 
     def handle(self, *args, **options):
         output_file = options['output']
-        format_type = options['format']
+        chunk_size = max(1, options['chunk_size'])
         
         self.stdout.write(self.style.WARNING('بدء عملية التصدير...'))
+
+        factories = dict(BACKUP_SECTIONS)
+        stats = {}
+
+        def section_records(name):
+            # قراءة القسم على دفعات مع طباعة التقدم بعد كل دفعة
+            def records():
+                count = 0
+                for record in iter_serialized(factories[name](), chunk_size=chunk_size):
+                    yield record
+                    count += 1
+                    if count % chunk_size == 0:
+                        self.stdout.write(f'  - {name}: {count}')
+                stats[name] = count
+            return records
+
+        sections = [(name, section_records(name)) for name in EXPORT_SECTIONS]
+        info = export_info(description='نسخ احتياطي كامل من نظام إدارة المستودع', backup_type='full')
         
         try:
-            # جمع البيانات من جميع النماذج
-            data = {
-                'export_info': {
-                    'date': datetime.now().isoformat(),
-                    'version': '1.0',
-                    'description': 'نسخ احتياطي كامل من نظام إدارة المستودع'
-                },
-                'warehouses': json.loads(serializers.serialize('json', Warehouse.objects.all())),
-                'locations': json.loads(serializers.serialize('json', Location.objects.all())),
-                'products': json.loads(serializers.serialize('json', Product.objects.all())),
-                'audit_logs': json.loads(serializers.serialize('json', AuditLog.objects.all())),
-            }
-            
-            # كتابة الملف
-            if format_type == 'json-indent':
-                json_data = json.dumps(data, ensure_ascii=False, indent=2)
-            else:
-                json_data = json.dumps(data, ensure_ascii=False)
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(json_data)
-            
-            # إحصائيات
-            stats = {
-                'warehouses': Warehouse.objects.count(),
-                'locations': Location.objects.count(),
-                'products': Product.objects.count(),
-                'audit_logs': AuditLog.objects.count(),
-            }
+            # الكتابة في ملف مؤقت ثم استبداله حتى لا يبقى ملف ناقص عند المقاطعة
+            tmp_file = f'{output_file}.tmp'
+            with open(tmp_file, 'wb') as f:
+                for chunk in buffered(stream_json_backup(sections, info)):
+                    f.write(chunk)
+            os.replace(tmp_file, output_file)
             
             self.stdout.write(self.style.SUCCESS('✓ تم التصدير بنجاح!'))
             self.stdout.write(self.style.SUCCESS(f'✓ اسم الملف: {output_file}'))
@@ -0,0 +1,32 @@
+"""
+أمر Django لإنشاء الصور المصغرة للمنتجات الحالية (مرة واحدة بعد التحديث، أو بعد تغيير الحجم/الصيغة مع --all).
+"""
+from django.core.management.base import BaseCommand
+from inventory_app.models import Product
+from inventory_app.utils.thumbnails import generate_thumbnails, missing_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'إنشاء الصور المصغرة للمنتجات التي لها صور'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='إعادة إنشاء كل الصور المصغرة وليس الناقصة فقط')
+        parser.add_argument('--batch-size', type=int, default=200, help='عدد المنتجات في كل دفعة')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True) if options['all'] \
+            else missing_thumbnails()
+        product_ids = list(products.order_by('pk').values_list('pk', flat=True))
+        batch_size = max(1, options['batch_size'])
+
+        done = failed = 0
+        for start in range(0, len(product_ids), batch_size):
+            batch_done, batch_failed = generate_thumbnails(product_ids[start:start + batch_size])
+            done += batch_done
+            failed += batch_failed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  - {min(start + batch_size, len(product_ids))} من {len(product_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ تم إنشاء {done} صورة مصغرة'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠ تعذر إنشاء {failed} صورة (ملف مفقود أو تالف)'))
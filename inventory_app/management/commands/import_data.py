@@ -1,13 +1,18 @@
-import json
-from django.core.management.base import BaseCommand
-from django.core import serializers
+import os
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from inventory_app.models import Product, Location, Warehouse, AuditLog, Order
-from datetime import datetime
+from inventory_app.utils.backup_import import BackupImporter, SECTION_MODELS, clear_sections
+from inventory_app.utils.backup_parser import BackupParseError, iter_backup_events, section_for_model
+from inventory_app.utils.secure_backup import load_checkpoint, save_checkpoint
+
+
+IMPORT_CHUNK_SIZE = 1000
+# الأقسام التي تُحذف عند --clear
+CLEAR_SECTIONS = ['warehouses', 'locations', 'containers', 'products', 'audit_logs', 'orders', 'returns']
 
 
 class Command(BaseCommand):
-    help = 'استيراد البيانات من ملف JSON للنسخ الاحتياطي'
+    help = 'استيراد البيانات من ملف JSON للنسخ الاحتياطي (على دفعات مع إمكانية الاستئناف)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -26,102 +31,132 @@ class Command(BaseCommand):
             action='store_true',
             help='تخطي التأكيد'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='عدد السجلات في كل دفعة (كل دفعة في معاملة مستقلة)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help='مسار ملف نقطة الاستئناف (افتراضياً بجانب ملف الإدخال)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='متابعة استيراد سابق متوقف من آخر دفعة مكتملة'
+        )
 
     def handle(self, *args, **options):
         input_file = options['input']
         clear_data = options['clear']
         skip_confirmation = options['skip_confirmation']
+        chunk_size = max(1, options['chunk_size'])
+        checkpoint_path = options['checkpoint'] or f'{input_file}.checkpoint.json'
+
+        if not os.path.exists(input_file):
+            self.stdout.write(self.style.ERROR(f'✗ الملف غير موجود: {input_file}'))
+            return
+
+        # بصمة الملف للتأكد من أن الاستئناف على نفس الملف
+        stat = os.stat(input_file)
+        source_id = {'input': os.path.abspath(input_file), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        state = None
+        if options['resume']:
+            state = load_checkpoint(checkpoint_path)
+            if state and state.get('source') != source_id:
+                raise CommandError('ملف نقطة الاستئناف يخص ملفاً آخر أو تم تعديل الملف بعد بدء الاستيراد')
+            if state and state.get('completed'):
+                self.stdout.write(self.style.SUCCESS('✓ هذا الملف تم استيراده بالكامل مسبقاً'))
+                return
+        if state:
+            self.stdout.write(self.style.WARNING(
+                f"استئناف الاستيراد: القسم {state.get('section')} بعد {state.get('offset', 0)} سجل"
+            ))
+        else:
+            state = {'source': source_id, 'done_sections': [], 'section': None, 'offset': 0,
+                     'counts': {}, 'errors': 0, 'completed': False}
         
-        try:
-            # فتح الملف
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.stdout.write(self.style.SUCCESS('✓ تم قراءة الملف بنجاح'))
-            
-            # معلومات التصدير
-            if 'export_info' in data:
-                export_info = data['export_info']
-                self.stdout.write(self.style.SUCCESS(f"✓ تاريخ التصدير: {export_info.get('date', 'غير معروف')}"))
-            
-            # عرض الإحصائيات
-            self.stdout.write(self.style.WARNING('\n📊 محتوى النسخ الاحتياطي:'))
-            for key in ['warehouses', 'locations', 'products', 'orders', 'audit_logs']:
-                count = len(data.get(key, []))
-                self.stdout.write(f'  - {key}: {count}')
-            
-            # التحقق من حذف البيانات
-            if clear_data and not skip_confirmation:
+        # التحقق من حذف البيانات
+        if clear_data and not options['resume']:
+            if not skip_confirmation:
                 self.stdout.write(self.style.ERROR('\n⚠️ سيتم حذف جميع البيانات الموجودة!'))
                 confirm = input('هل أنت متأكد؟ (اكتب "نعم" للمتابعة): ')
                 if confirm != 'نعم':
                     self.stdout.write(self.style.WARNING('تم إلغاء العملية'))
                     return
-            
-            # بدء الاستيراد
+            self.stdout.write(self.style.WARNING('جاري حذف البيانات الموجودة...'))
             with transaction.atomic():
-                # حذف البيانات الموجودة إذا طُلب
-                if clear_data:
-                    self.stdout.write(self.style.WARNING('جاري حذف البيانات الموجودة...'))
-                    AuditLog.objects.all().delete()
-                    Order.objects.all().delete()
-                    Product.objects.all().delete()
-                    Location.objects.all().delete()
-                    Warehouse.objects.all().delete()
-                    
-                    self.stdout.write(self.style.SUCCESS('✓ تم الحذف'))
-                
-                # استيراد البيانات
-                self.stdout.write(self.style.WARNING('\nبدء الاستيراد...'))
-                
-                # استيراد المستودعات
-                if 'warehouses' in data and data['warehouses']:
-                    self.stdout.write('  - استيراد المستودعات...')
-                    objects = serializers.deserialize('json', json.dumps(data['warehouses']))
-                    for obj in objects:
-                        obj.save()
-                    self.stdout.write(self.style.SUCCESS(f'    ✓ تم استيراد {len(data["warehouses"])} مستودع'))
-                
-                # استيراد الأماكن
-                if 'locations' in data and data['locations']:
-                    self.stdout.write('  - استيراد الأماكن...')
-                    objects = serializers.deserialize('json', json.dumps(data['locations']))
-                    for obj in objects:
-                        obj.save()
-                    self.stdout.write(self.style.SUCCESS(f'    ✓ تم استيراد {len(data["locations"])} مكان'))
-                
-                # استيراد المنتجات
-                if 'products' in data and data['products']:
-                    self.stdout.write('  - استيراد المنتجات...')
-                    objects = serializers.deserialize('json', json.dumps(data['products']))
-                    for obj in objects:
-                        obj.save()
-                    self.stdout.write(self.style.SUCCESS(f'    ✓ تم استيراد {len(data["products"])} منتج'))
-                
-                # استيراد الطلبات
-                if 'orders' in data and data['orders']:
-                    self.stdout.write('  - استيراد الطلبات...')
-                    objects = serializers.deserialize('json', json.dumps(data['orders']))
-                    for obj in objects:
-                        obj.save()
-                    self.stdout.write(self.style.SUCCESS(f'    ✓ تم استيراد {len(data["orders"])} طلب'))
-                
-                # استيراد سجلات العمليات
-                if 'audit_logs' in data and data['audit_logs']:
-                    self.stdout.write('  - استيراد سجلات العمليات...')
-                    objects = serializers.deserialize('json', json.dumps(data['audit_logs']))
-                    for obj in objects:
-                        obj.save()
-                    self.stdout.write(self.style.SUCCESS(f'    ✓ تم استيراد {len(data["audit_logs"])} سجل'))
-                
-                # لا يوجد تقارير يومية بعد الإزالة
-            
-            self.stdout.write(self.style.SUCCESS('\n✓ تم الاستيراد بنجاح!'))
-            
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f'✗ الملف غير موجود: {input_file}'))
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR('✗ الملف غير صالح. تأكد أنه ملف JSON صحيح'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ حدث خطأ أثناء الاستيراد: {str(e)}'))
-            raise e
+                clear_sections(CLEAR_SECTIONS)
+            self.stdout.write(self.style.SUCCESS('✓ تم الحذف'))
+
+        importer = BackupImporter(chunk_size=chunk_size)
+        save_checkpoint(checkpoint_path, state)
+        self.stdout.write(self.style.WARNING('\nبدء الاستيراد...'))
+
+        def write_chunk(section, records, offset):
+            errors_before = len(importer.errors)
+            count_before = importer.counts.get(section, 0)
+            # كل دفعة في معاملة مستقلة: خطأ في دفعة لا يلغي ما سبقها
+            with transaction.atomic():
+                written = importer.import_section(section, records) - count_before
+                importer.finish()
+            for error in importer.errors[errors_before:]:
+                self.stdout.write(self.style.ERROR(f'    ✗ {error}'))
+            state['section'] = section
+            state['offset'] = offset + len(records)
+            state['counts'][section] = state['counts'].get(section, 0) + written
+            state['errors'] += len(importer.errors) - errors_before
+            save_checkpoint(checkpoint_path, state)
+            self.stdout.write(f"  - {section}: {state['offset']} سجل")
+
+        try:
+            with open(input_file, 'rb') as f:
+                current, offset, chunk = None, 0, []
+                for kind, section, value in iter_backup_events(f, input_file):
+                    if kind == 'info':
+                        if section == 'export_info' and isinstance(value, dict):
+                            self.stdout.write(self.style.SUCCESS(f"✓ تاريخ التصدير: {value.get('date', 'غير معروف')}"))
+                        continue
+                    if section is None and isinstance(value, dict):
+                        section = section_for_model(value.get('model'))
+                    if section not in SECTION_MODELS or section in state['done_sections']:
+                        continue
+                    if section != current:
+                        if chunk:
+                            write_chunk(current, chunk, offset)
+                        if current is not None and current not in state['done_sections']:
+                            state['done_sections'].append(current)
+                        current, chunk = section, []
+                        # عند الاستئناف نتخطى السجلات التي تم استيرادها في القسم المتوقف
+                        offset = state['offset'] if state['section'] == section else 0
+                        to_skip = offset
+                    if kind != 'record':
+                        continue
+                    if to_skip:
+                        to_skip -= 1
+                        continue
+                    chunk.append(value)
+                    if len(chunk) >= chunk_size:
+                        write_chunk(current, chunk, offset)
+                        offset += len(chunk)
+                        chunk = []
+                if chunk:
+                    write_chunk(current, chunk, offset)
+                if current is not None and current not in state['done_sections']:
+                    state['done_sections'].append(current)
+        except BackupParseError as e:
+            self.stdout.write(self.style.ERROR(f'✗ الملف غير صالح. تأكد أنه ملف JSON صحيح ({e})'))
+            self.stdout.write(self.style.WARNING('يمكن المتابعة لاحقاً باستخدام --resume'))
+            return
+
+        state['completed'] = True
+        save_checkpoint(checkpoint_path, state)
+
+        self.stdout.write(self.style.SUCCESS('\n✓ تم الاستيراد بنجاح!'))
+        for key, value in state['counts'].items():
+            self.stdout.write(f'  - {key}: {value}')
+        if state['errors']:
+            self.stdout.write(self.style.WARNING(f"⚠️ عدد السجلات التي لم تُستورد: {state['errors']}"))
@@ -0,0 +1,41 @@
+"""
+أمر Django لتطبيق سياسة الاحتفاظ على سجلات الصندوق الأسود (SecureBackup)
+يقلّص النسخ القديمة إلى آخر نسخة يومياً ثم شهرياً، على دفعات من المعرفات.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from inventory_app.utils.secure_backup import RETENTION_BATCH_SIZE, apply_retention, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'تقليص سجلات الصندوق الأسود القديمة حسب سياسة الاحتفاظ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-all-days', type=int, default=settings.SECURE_BACKUP_KEEP_ALL_DAYS,
+                            help='عدد الأيام التي تُحفظ فيها كل النسخ')
+        parser.add_argument('--daily-days', type=int, default=settings.SECURE_BACKUP_DAILY_DAYS,
+                            help='عدد الأيام التي تُحفظ فيها آخر نسخة يومياً (بعدها شهرياً)')
+        parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE, help='عدد المعرفات في كل دفعة')
+        parser.add_argument('--dry-run', action='store_true', help='عرض ما سيتم حذفه دون حذف')
+        parser.add_argument('--rebuild-counters', action='store_true', help='إعادة بناء عدادات لوحة التحكم')
+
+    def handle(self, *args, **options):
+        if options['rebuild_counters']:
+            rebuild_counters()
+            self.stdout.write(self.style.SUCCESS('✓ تمت إعادة بناء العدادات'))
+            return
+
+        def progress(tier, current_id, max_id, stats):
+            self.stdout.write(f'  - {tier}: حتى المعرف {current_id} من {max_id} ({stats[tier]} سجل)')
+
+        stats = apply_retention(
+            keep_all_days=options['keep_all_days'],
+            daily_days=options['daily_days'],
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
+            on_progress=progress if options['verbosity'] > 1 else None,
+        )
+
+        label = 'سيتم حذف' if options['dry_run'] else 'تم حذف'
+        self.stdout.write(self.style.SUCCESS(f"✓ {label} {stats['daily']} نسخة (تقليص يومي)"))
+        self.stdout.write(self.style.SUCCESS(f"✓ {label} {stats['monthly']} نسخة (تقليص شهري)"))
@@ -0,0 +1,24 @@
+"""
+أمر Django لإعادة بناء أسطر الطلبيات المفهرسة من products_data وإحصائيات الطلبيات التراكمية
+(الترحيلات تبنيها مرة واحدة؛ الأمر للإصلاح بعد تعديل الطلبيات يدوياً أو استيراد خارجي).
+"""
+from django.core.management.base import BaseCommand
+from inventory_app.utils.order_lines import ORDER_LINES_BATCH_SIZE, rebuild_order_lines
+from inventory_app.utils.order_stats import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء أسطر الطلبيات (سجل المنتجات والمستلمين) وإحصائياتها اليومية ولكل مستلم'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ORDER_LINES_BATCH_SIZE, help='عدد الطلبيات في كل دفعة')
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  - {done} من {total}')
+
+        written = rebuild_order_lines(batch_size=max(1, options['batch_size']), progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'✓ تم بناء {written} سطر'))
+        rebuild_order_stats()
+        self.stdout.write(self.style.SUCCESS('✓ تم بناء إحصائيات الطلبيات'))
@@ -0,0 +1,82 @@
+"""
+أمر Django لاسترجاع نسخة كاملة متبوعة بسلسلة نسخ تفاضلية بالترتيب.
+--fast يستخدم المسار السريع (COPY في PostgreSQL و executemany في SQLite) مع قراءة متدفقة للملفات.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from inventory_app.utils.backup_import import (
+    BackupImporter, IMPORT_ORDER, check_backup_chain, clear_sections, load_backup_file,
+)
+from inventory_app.utils.backup_parser import BackupParseError, iter_backup_events, read_export_info
+from inventory_app.utils.native_restore import NativeLoader
+
+
+class Command(BaseCommand):
+    help = 'استرجاع نسخة كاملة ثم تطبيق النسخ التفاضلية التالية لها بالترتيب'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='ملف النسخة الكاملة ثم ملفات النسخ التفاضلية بالترتيب')
+        parser.add_argument('--force', action='store_true', help='تجاهل أخطاء تسلسل السلسلة')
+        parser.add_argument('--avoid-duplicates', action='store_true', help='دمج المنتجات حسب رقم المنتج')
+        parser.add_argument('--fast', action='store_true',
+                            help='الاسترجاع السريع المباشر (COPY/executemany) دون سجلات الصندوق الأسود')
+        parser.add_argument('--clear', action='store_true', help='تفريغ الجداول قبل الاسترجاع')
+
+    def handle(self, *args, **options):
+        infos = []
+        for path in options['files']:
+            try:
+                with open(path, 'rb') as f:
+                    infos.append(read_export_info(f, path))
+            except (OSError, BackupParseError) as e:
+                raise CommandError(f'تعذر قراءة الملف {path}: {e}')
+
+        chain_errors = check_backup_chain(infos)
+        if chain_errors and not options['force']:
+            raise CommandError('سلسلة النسخ غير سليمة: ' + '، '.join(chain_errors))
+        for error in chain_errors:
+            self.stdout.write(self.style.WARNING(f'⚠️ {error}'))
+
+        try:
+            with transaction.atomic():
+                if options['clear']:
+                    clear_sections(IMPORT_ORDER)
+                if options['fast']:
+                    counts, errors = self._restore_fast(options)
+                else:
+                    counts, errors = self._restore(options)
+        except (BackupParseError, DatabaseError) as e:
+            raise CommandError(f'فشل الاسترجاع ولم يتم تغيير أي بيانات: {e}')
+
+        for section, count in counts.items():
+            self.stdout.write(f'  - {section}: {count}')
+        if errors:
+            self.stdout.write(self.style.WARNING(f'⚠️ عدد الأخطاء: {len(errors)}'))
+            for error in errors[:50]:
+                self.stdout.write(f'  - {error}')
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ تم الاسترجاع بنجاح'))
+
+    def _restore(self, options):
+        importer = BackupImporter(avoid_duplicates=options['avoid_duplicates'])
+        for path in options['files']:
+            self.stdout.write(f'  - تطبيق {path}')
+            data = load_backup_file(path)
+            if not isinstance(data, dict):
+                raise CommandError(f'الملف {path} ليس نسخة احتياطية صالحة')
+            # الحذف أولاً لأن المعرف المحذوف قد يُعاد استخدامه لسجل جديد في نفس النافذة
+            importer.apply_deletions(data.get('deleted'))
+            for section in IMPORT_ORDER:
+                if isinstance(data.get(section), list):
+                    importer.import_section(section, data[section])
+        importer.finish()
+        return importer.counts, importer.errors
+
+    def _restore_fast(self, options):
+        loader = NativeLoader()
+        for path in options['files']:
+            self.stdout.write(f'  - تطبيق {path}')
+            with open(path, 'rb') as f:
+                loader.load(iter_backup_events(f, path))
+        loader.finish()
+        return loader.counts, loader.errors
@@ -0,0 +1,55 @@
+"""
+أمر Django لتشغيل عمال المهام الخلفية (استيراد Excel، تصدير/استيراد النسخ الاحتياطي، PDF، حذف البيانات).
+كل عامل خيط مستقل يحجز المهام من جدول BackgroundJob وينفذها، فتبقى طلبات الويب قصيرة.
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from inventory_app.utils.jobs import default_worker_name, purge_finished_jobs, recover_stale_jobs, work
+
+
+class Command(BaseCommand):
+    help = 'تشغيل عمال المهام الخلفية'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.BACKGROUND_JOB_WORKERS,
+                            help='عدد العمال (خيوط) التي تنفذ المهام بالتوازي')
+        parser.add_argument('--once', action='store_true', help='تنفيذ المهام المنتظرة ثم الخروج')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='ثوانٍ الانتظار عند فراغ الطابور')
+        parser.add_argument('--purge-days', type=int, default=settings.BACKGROUND_JOBS_KEEP_DAYS,
+                            help='حذف المهام المنتهية وملفاتها الأقدم من هذا العدد من الأيام (0 للإبقاء)')
+
+    def handle(self, *args, **options):
+        recovered = recover_stale_jobs()
+        if recovered:
+            self.stdout.write(self.style.WARNING(f'⚠ {recovered} مهمة متوقفة سُجلت كفاشلة'))
+        if options['purge_days'] > 0:
+            purged = purge_finished_jobs(options['purge_days'])
+            if purged:
+                self.stdout.write(f'  - تم حذف {purged} مهمة قديمة')
+
+        stop_event = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            # إيقاف نظيف: العمال يكملون المهمة الحالية ثم يخرجون
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop_event.set())
+
+        processed = []
+
+        def run(index):
+            name = f'{default_worker_name()}#{index}'
+            processed.append(work(name, once=options['once'], poll_interval=options['poll_interval'],
+                                  stop_event=stop_event))
+
+        workers = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(max(1, options['workers']))]
+        self.stdout.write(f'تشغيل {len(workers)} عامل...')
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ تم تنفيذ {sum(processed)} مهمة'))
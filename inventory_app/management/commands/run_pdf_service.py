@@ -0,0 +1,39 @@
+"""
+أمر Django لتشغيل خدمة PDF: متصفحات Chromium دائمة يستخدمها تصدير PDF المنتجات والطلبيات
+بدلاً من تشغيل متصفح جديد في كل طلب داخل عمال الويب.
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from inventory_app.utils.pdf_service import PdfService
+
+
+class Command(BaseCommand):
+    help = 'تشغيل خدمة إنشاء PDF بمتصفحات دائمة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.PDF_SERVICE_ADDRESS,
+                            help='host:port أو مسار unix socket (افتراضياً PDF_SERVICE_ADDRESS)')
+        parser.add_argument('--browsers', type=int, default=settings.PDF_SERVICE_BROWSERS,
+                            help='عدد المتصفحات (الطلبات المتزامنة)')
+        parser.add_argument('--queue', type=int, default=settings.PDF_SERVICE_QUEUE,
+                            help='أقصى عدد طلبات منتظرة قبل رفض الطلبات الجديدة')
+
+    def handle(self, *args, **options):
+        if not options['address']:
+            raise CommandError('يجب تحديد العنوان (--address أو PDF_SERVICE_ADDRESS)')
+
+        service = PdfService(options['address'], browsers=options['browsers'], queue_size=options['queue']).start()
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ خدمة PDF تعمل على {service.address} ({options['browsers']} متصفح، طابور {options['queue']})"
+        ))
+
+        stop_event = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop_event.set())
+        while not stop_event.wait(1):
+            pass
+        service.stop()
+        self.stdout.write('تم إيقاف خدمة PDF')
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:08
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_counters(apps, schema_editor):
+    SecureBackup = apps.get_model('inventory_app', 'SecureBackup')
+    SecureBackupCounter = apps.get_model('inventory_app', 'SecureBackupCounter')
+    groups = (
+        SecureBackup.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'table_name', 'action')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    SecureBackupCounter.objects.bulk_create([
+        SecureBackupCounter(date=g['day'], table_name=g['table_name'], action=g['action'], count=g['n'])
+        for g in groups
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0033_securebackup_delete_aiinsightlog_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecureBackupCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('table_name', models.CharField(max_length=100)),
+                ('action', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('date', 'table_name', 'action')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
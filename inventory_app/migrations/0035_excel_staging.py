@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:28
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory_app', '0034_securebackupcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcelUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('headers', models.JSONField(default=list)),
+                ('total_rows', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExcelStagingRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('data', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='inventory_app.excelupload')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('upload', 'position')},
+            },
+        ),
+    ]
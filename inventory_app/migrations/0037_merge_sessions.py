@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory_app', '0036_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MergeSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('files', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MergeItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('product_number', models.CharField(blank=True, max_length=255)),
+                ('key', models.CharField(blank=True, max_length=255)),
+                ('name', models.TextField(blank=True)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='inventory_app.mergesession')),
+            ],
+            options={
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['session', 'key'], name='inventory_a_session_f3ae14_idx')],
+                'unique_together': {('session', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0037_merge_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergesession',
+            name='auto_fix',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mergesession',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='inventory_app.mergesession'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0038_merge_session_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='products/thumbs/'),
+        ),
+    ]
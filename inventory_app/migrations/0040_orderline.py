@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:01
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def order_items(products_data):
+    """(رقم المنتج، الاسم، الكمية) لكل منتج مسحوب في products_data (نسخة ثابتة لهذا الترحيل)"""
+    if isinstance(products_data, str):
+        try:
+            products_data = json.loads(products_data)
+        except ValueError:
+            return []
+    if not isinstance(products_data, list):
+        return []
+    items = []
+    for item in products_data:
+        if not isinstance(item, dict):
+            continue
+        number = str(item.get('product_number', '') or '').strip()
+        qty = item.get('quantity_taken')
+        if qty is None:
+            qty = item.get('quantity', 0)
+        try:
+            qty = int(qty or 0)
+        except (ValueError, TypeError):
+            continue
+        if number and qty > 0:
+            items.append((number, str(item.get('name', '') or '')[:200], qty))
+    return items
+
+
+def backfill_order_lines(apps, schema_editor):
+    Order = apps.get_model('inventory_app', 'Order')
+    OrderLine = apps.get_model('inventory_app', 'OrderLine')
+    batch = []
+    orders = Order.objects.order_by('pk').only('pk', 'products_data', 'recipient_name', 'created_at')
+    for order in orders.iterator(chunk_size=BATCH_SIZE):
+        batch.extend(
+            OrderLine(order_id=order.pk, product_number=number[:50], product_name=name, quantity=qty,
+                      recipient_name=order.recipient_name or None, created_at=order.created_at)
+            for number, name, qty in order_items(order.products_data)
+        )
+        if len(batch) >= BATCH_SIZE:
+            OrderLine.objects.bulk_create(batch)
+            batch = []
+    OrderLine.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0039_product_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_number', models.CharField(max_length=50)),
+                ('product_name', models.CharField(blank=True, default='', max_length=200)),
+                ('quantity', models.IntegerField(default=0)),
+                ('recipient_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory_app.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_number', 'created_at'], name='inventory_a_product_ce85ec_idx'), models.Index(fields=['recipient_name', 'created_at'], name='inventory_a_recipie_fcb23d_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_order_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_order_stats(apps, schema_editor):
+    Order = apps.get_model('inventory_app', 'Order')
+    OrderDailyStat = apps.get_model('inventory_app', 'OrderDailyStat')
+    OrderRecipientStat = apps.get_model('inventory_app', 'OrderRecipientStat')
+    days = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(n=Count('id'), qty=Coalesce(Sum('total_quantities'), 0))
+        .order_by()
+    )
+    OrderDailyStat.objects.bulk_create([
+        OrderDailyStat(date=d['day'], orders=d['n'], quantity=d['qty']) for d in days
+    ], batch_size=1000)
+    recipients = (
+        Order.objects.exclude(recipient_name__isnull=True)
+        .exclude(recipient_name='')
+        .values('recipient_name')
+        .annotate(n=Count('id'), qty=Coalesce(Sum('total_quantities'), 0))
+        .order_by()
+    )
+    OrderRecipientStat.objects.bulk_create([
+        OrderRecipientStat(recipient_name=r['recipient_name'], orders=r['n'], quantity=r['qty'])
+        for r in recipients
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0040_orderline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderRecipientStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_name', models.CharField(max_length=200, unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_order_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:18
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0041_order_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='excelupload',
+            name='preview_counts',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='excelupload',
+            name='preview_mapping',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ExcelPreviewRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('status', models.CharField(max_length=10)),
+                ('search_key', models.TextField(blank=True, default='')),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preview_rows', to='inventory_app.excelupload')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['upload', 'status', 'position'], name='inventory_a_upload__286926_idx')],
+                'unique_together': {('upload', 'position')},
+            },
+        ),
+    ]
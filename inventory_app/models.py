@@ -1,5 +1,7 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 class Warehouse(models.Model):
@@ -50,6 +52,8 @@ class Product(models.Model):
     location = models.ForeignKey(Location, on_delete=models.SET_NULL, blank=True, null=True, related_name='products')
 
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # نسخة مصغرة من الصورة للقوائم وملفات PDF (تُنشأ بعد الرفع، انظر utils/thumbnails.py)
+    thumbnail = models.ImageField(upload_to='products/thumbs/', blank=True, null=True)
     container = models.ForeignKey(Container, on_delete=models.SET_NULL, blank=True, null=True)
     barcode = models.CharField(max_length=100, blank=True, null=True)
     image_url = models.CharField(max_length=500, blank=True, null=True)
@@ -64,6 +68,15 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.product_number} - {self.name}"
 
+    @property
+    def thumbnail_url(self):
+        """رابط الصورة المصغرة، أو الأصلية إن لم تُنشأ بعد، أو الرابط الخارجي"""
+        if self.thumbnail:
+            return self.thumbnail.url
+        if self.image:
+            return self.image.url
+        return self.image_url or None
+
 
 
 class Order(models.Model):
@@ -79,6 +92,48 @@ class Order(models.Model):
     def __str__(self):
         return self.order_number
 
+class OrderLine(models.Model):
+    """
+    سطر منتج في طلبية (نسخة مفهرسة من products_data).
+    المستلم والتاريخ منسوخان من الطلبية حتى يُبحث في سجل المنتج والمستلم باستعلام تجميعي مفهرس.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product_number = models.CharField(max_length=50)
+    product_name = models.CharField(max_length=200, blank=True, default='')
+    quantity = models.IntegerField(default=0)
+    recipient_name = models.CharField(max_length=200, blank=True, null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product_number', 'created_at']),
+            models.Index(fields=['recipient_name', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.product_number} × {self.quantity}"
+
+class OrderDailyStat(models.Model):
+    """
+    إحصائيات السحب التراكمية لكل يوم (عدد الطلبيات ومجموع الكميات).
+    تُحدَّث مع إنشاء كل طلبية وحذفها، حتى لا تحتاج صفحة الطلبيات لتجميع الجدول كاملاً.
+    """
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} / {self.quantity}"
+
+class OrderRecipientStat(models.Model):
+    """إحصائيات السحب التراكمية لكل مستلم (تُحدَّث مثل OrderDailyStat)"""
+    recipient_name = models.CharField(max_length=200, unique=True)
+    orders = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.recipient_name}: {self.orders} / {self.quantity}"
+
 class ProductReturn(models.Model):
     return_number = models.CharField(unique=True, max_length=50)
     products_data = models.JSONField(default=dict)
@@ -174,6 +229,22 @@ class SecureBackup(models.Model):
     def __str__(self):
         return f"{self.table_name} #{self.record_id} ({self.action})"
 
+class SecureBackupCounter(models.Model):
+    """
+    عدادات تراكمية للصندوق الأسود (لكل يوم وجدول وعملية).
+    تُحدَّث مع كل نسخة جديدة ومع كل عملية تقليص، حتى لا تحتاج لوحة التحكم لعدّ الجدول كاملاً.
+    """
+    date = models.DateField()
+    table_name = models.CharField(max_length=100)
+    action = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('date', 'table_name', 'action'),)
+
+    def __str__(self):
+        return f"{self.date} {self.table_name} {self.action}: {self.count}"
+
 class UserActivityLog(models.Model):
     ACTION_TYPES = (
         ('login', 'تسجيل دخول'),
@@ -232,3 +303,129 @@ class UserActivityLog(models.Model):
         return f"{self.user.username} - {self.action}"
 
 
+class ExcelUpload(models.Model):
+    """
+    ملف Excel مرفوع ينتظر المعاينة والمعالجة.
+    تُخزَّن الصفوف في جدول ExcelStagingRow بدلاً من الجلسة، ويُحفظ في الجلسة معرف الرفع فقط.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
+    filename = models.CharField(max_length=255, blank=True)
+    headers = models.JSONField(default=list)
+    total_rows = models.IntegerField(default=0)
+    # تحديد الأعمدة الذي حُسبت له صفوف المعاينة المحفوظة (ExcelPreviewRow) وعدد كل حالة
+    preview_mapping = models.JSONField(blank=True, null=True)
+    preview_counts = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.total_rows})"
+
+class ExcelStagingRow(models.Model):
+    """صف واحد من ملف Excel مرفوع (position = ترتيب الصف بين صفوف البيانات غير الفارغة)"""
+    upload = models.ForeignKey(ExcelUpload, on_delete=models.CASCADE, related_name='rows')
+    position = models.IntegerField()
+    data = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        unique_together = (('upload', 'position'),)
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.upload_id} #{self.position}"
+
+class ExcelPreviewRow(models.Model):
+    """
+    صف معاينة محسوب لملف مرفوع (الحالة new / exists / error والرسالة).
+    يُحسب مرة واحدة لكل تحديد أعمدة، وكل صفحة معاينة تقرأ شريحتها فقط.
+    """
+    upload = models.ForeignKey(ExcelUpload, on_delete=models.CASCADE, related_name='preview_rows')
+    position = models.IntegerField()
+    status = models.CharField(max_length=10)
+    # رقم المنتج الأصلي والنهائي والموقع بأحرف كبيرة للبحث
+    search_key = models.TextField(blank=True, default='')
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        unique_together = (('upload', 'position'),)
+        indexes = [
+            models.Index(fields=['upload', 'status', 'position']),
+        ]
+
+    def __str__(self):
+        return f"{self.upload_id} #{self.position} ({self.status})"
+
+class BackgroundJob(models.Model):
+    """
+    مهمة خلفية (استيراد/تصدير/حذف طويل) تُنفذ خارج طلب HTTP بواسطة أمر run_jobs.
+    الواجهة تستعلم عن صف الحالة فقط (progress) بدلاً من انتظار الطلب الطويل.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('succeeded', 'اكتملت'),
+        ('failed', 'فشلت'),
+        ('cancelled', 'أُلغيت'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    params = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    progress = models.IntegerField(default=0)  # نسبة مئوية 0-100
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    result_file = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+class MergeSession(models.Model):
+    """
+    جلسة دمج ملفات: العناصر المستخرجة من الملفات المرفوعة محفوظة في جدول MergeItem
+    ويتصفحها المتصفح صفحة صفحة بدلاً من استلام القائمة كاملة.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
+    files = models.JSONField(default=list)  # [{name, count, error}]
+    # نتيجة الإصلاح (merge / rename) تُحفظ كجلسة فرعية من جلسة الرفع
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='results')
+    auto_fix = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"merge {self.id}"
+
+class MergeItem(models.Model):
+    """عنصر من ملف دمج (key = رقم المنتج بعد التطبيع لاكتشاف التكرار)"""
+    session = models.ForeignKey(MergeSession, on_delete=models.CASCADE, related_name='items')
+    position = models.IntegerField()
+    product_number = models.CharField(max_length=255, blank=True)
+    key = models.CharField(max_length=255, blank=True)
+    name = models.TextField(blank=True)
+    quantity = models.BigIntegerField(default=0)
+    source = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = (('session', 'position'),)
+        indexes = [
+            models.Index(fields=['session', 'key']),
+        ]
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.session_id} #{self.position}"
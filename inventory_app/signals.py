@@ -1,10 +1,11 @@
 import json
-import hashlib
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.serializers.json import DjangoJSONEncoder
 from django.forms.models import model_to_dict
 from .models import Product, Order, ProductReturn, Warehouse, Location, Container, SecureBackup
+from .utils.order_lines import create_order_lines, sync_order_lines
+from .utils.order_stats import record_order
+from .utils.secure_backup import bump_counter, canonical_json, compute_signature
 
 from django.db.models.fields.files import FieldFile
 
@@ -24,37 +25,72 @@ def get_model_data(instance):
                 
     return data
 
+# النماذج التي تُنسخ في الصندوق الأسود (نفس قائمة الإشارات أدناه)
+BACKED_UP_MODELS = (Product, Order, ProductReturn, Warehouse, Location, Container)
+
+
+def build_secure_backup(instance, action):
+    """تجهيز سجل نسخة احتياطية آمنة (بدون حفظ) مع توقيعه الرقمي"""
+    model_name = instance.__class__.__name__
+    record_id = instance.id
+    data = get_model_data(instance)
+    
+    # تحويل البيانات إلى JSON
+    json_data = canonical_json(data)
+    
+    # إنشاء توقيع رقمي (Hash) للبيانات لضمان عدم التلاعب
+    # (يُعاد حسابه لاحقاً بواسطة أمر verify_secure_backup)
+    hash_signature = compute_signature(model_name, record_id, action, json_data)
+    
+    return SecureBackup(
+        table_name=model_name,
+        record_id=record_id,
+        backup_data=json.loads(json_data),
+        action=action,
+        hash_signature=hash_signature
+    )
+
 def create_secure_backup(instance, action):
     """إنشاء نسخة احتياطية آمنة"""
     try:
         model_name = instance.__class__.__name__
-        record_id = instance.id
         
         # تجاهل نموذج النسخ الاحتياطي نفسه لتجنب الحلقة اللانهائية
         if model_name == 'SecureBackup' or model_name == 'Session' or model_name == 'AuditLog':
             return
 
-        data = get_model_data(instance)
-        
-        # تحويل البيانات إلى JSON
-        json_data = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False)
-        
-        # إنشاء توقيع رقمي (Hash) للبيانات لضمان عدم التلاعب
-        # نستخدم البيانات + الوقت الحالي + مفتاح سري (يمكن تعقيده أكثر)
-        hash_input = f"{model_name}:{record_id}:{action}:{json_data}"
-        hash_signature = hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
-        
-        SecureBackup.objects.create(
-            table_name=model_name,
-            record_id=record_id,
-            backup_data=json.loads(json_data),
-            action=action,
-            hash_signature=hash_signature
-        )
+        build_secure_backup(instance, action).save()
+        # تحديث عدادات لوحة التحكم تراكمياً
+        bump_counter(model_name, action)
     except Exception as e:
         # يجب ألا نوقف النظام إذا فشل النسخ الاحتياطي، لكن يجب تسجيل الخطأ
         print(f"Backup Error: {str(e)}")
 
+def create_secure_backups_bulk(instances, action, batch_size=1000):
+    """
+    نسخ احتياطية آمنة لدفعة من السجلات دفعة واحدة.
+    تُستخدم بعد bulk_create / bulk_update لأنها لا تُطلق إشارات post_save.
+    action: نص ثابت أو دالة تعيد العملية لكل سجل.
+    """
+    instances = [obj for obj in instances if isinstance(obj, BACKED_UP_MODELS)]
+    if not instances:
+        return 0
+    try:
+        counts = {}
+        backups = []
+        for obj in instances:
+            obj_action = action(obj) if callable(action) else action
+            backups.append(build_secure_backup(obj, obj_action))
+            key = (obj.__class__.__name__, obj_action)
+            counts[key] = counts.get(key, 0) + 1
+        SecureBackup.objects.bulk_create(backups, batch_size=batch_size)
+        for (model_name, obj_action), n in counts.items():
+            bump_counter(model_name, obj_action, delta=n)
+        return len(backups)
+    except Exception as e:
+        print(f"Backup Error: {str(e)}")
+        return 0
+
 @receiver(post_save, sender=Product)
 @receiver(post_save, sender=Order)
 @receiver(post_save, sender=ProductReturn)
@@ -73,3 +109,21 @@ def backup_on_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Container)
 def backup_on_delete(sender, instance, **kwargs):
     create_secure_backup(instance, 'delete')
+
+@receiver(post_save, sender=Order)
+def order_lines_on_save(sender, instance, created, **kwargs):
+    # أسطر الطلبية المفهرسة تتبع products_data لكل حفظ (الإنشاء، الاستعادة، الاستيراد سجلاً بسجل)
+    if created:
+        create_order_lines(instance)
+    else:
+        sync_order_lines([instance])
+
+@receiver(post_save, sender=Order)
+def order_stats_on_save(sender, instance, created, **kwargs):
+    # الطلبية لا تتغير بعد إنشائها: تُحتسب في إحصائيات اليوم والمستلم مرة واحدة عند الإنشاء
+    if created:
+        record_order(instance)
+
+@receiver(post_delete, sender=Order)
+def order_stats_on_delete(sender, instance, **kwargs):
+    record_order(instance, sign=-1)
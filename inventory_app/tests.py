@@ -1,4 +1,6 @@
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.utils import timezone
+from datetime import timedelta
 from django.contrib.auth.models import User
 from django.urls import reverse
 from inventory_app.models import Product, Order, Warehouse, Location
@@ -17,6 +19,16 @@ class SystemScenarioTest(TestCase):
         # Setup Warehouse
         self.warehouse = Warehouse.objects.create(name='Main Warehouse')
 
+        # ملفات ذاكرة التصدير في مجلد مؤقت
+        import tempfile
+        from django.test import override_settings
+        export_cache = tempfile.TemporaryDirectory()
+        self.addCleanup(export_cache.cleanup)
+        self.export_cache_dir = export_cache.name
+        cache_settings = override_settings(EXPORT_CACHE_DIR=export_cache.name)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
     def test_pages_connectivity(self):
         """Test that key pages load correctly (Connectivity Check)"""
         pages = [
@@ -88,6 +100,493 @@ class SystemScenarioTest(TestCase):
         self.assertEqual(p2.quantity, 20)
         print("Excel Import Logic Verified: Optional fields working correctly.")
 
+    def test_excel_upload_staged_outside_session(self):
+        """Test that uploads are streamed into the staging table and preview/process read from it"""
+        import io
+        from openpyxl import Workbook
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from inventory_app.models import ExcelUpload
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Model', 'Qty'])
+        for i in range(120):
+            ws.append([f'X{i}', i + 1])
+        ws.append([None, None])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+
+        upload = self.client.post(reverse('inventory_app:upload_excel_file'), {
+            'excel_file': SimpleUploadedFile('items.xlsx', buffer.getvalue()),
+        }).json()
+        self.assertEqual(upload['total_rows'], 120)
+        self.assertEqual(len(upload['data']), 50)
+        self.assertNotIn('excel_data', self.client.session)
+        self.assertEqual(ExcelUpload.objects.get().rows.count(), 120)
+
+        mapping = {'product_number': 0, 'total_quantity': 1}
+        preview = self.client.post(reverse('inventory_app:preview_excel_data'), json.dumps({
+            'upload_id': upload['upload_id'], 'column_mapping': mapping,
+        }), content_type='application/json').json()
+        self.assertEqual(preview['total_rows'], 120)
+        self.assertEqual(len(preview['preview']), 100)
+        result = self.client.post(reverse('inventory_app:process_excel_data'), json.dumps({
+            'upload_id': upload['upload_id'], 'column_mapping': mapping,
+        }), content_type='application/json').json()
+        self.assertEqual(result['results']['added'], 120)
+        self.assertEqual(Product.objects.get(product_number='X119').quantity, 120)
+        self.assertFalse(ExcelUpload.objects.exists())
+
+    def test_excel_preview_resolves_existence_in_batches(self):
+        """Test that the preview looks products up in chunked IN queries and pages/filters on the server"""
+        from inventory_app.utils import excel_preview
+        Product.objects.create(product_number='P3', name='P3', quantity=7)
+        rows = [[f'P{i}', i] for i in range(10)] + [[None, 5], ['MODEL', 'QTY']]
+        mapping = {'product_number': 0, 'total_quantity': 1}
+
+        with self.assertNumQueries(4):
+            entries = excel_preview.build_preview(rows, mapping)
+            excel_preview.resolve_existing([e['final_number'] for e in entries], chunk_size=4)
+        self.assertEqual(excel_preview.preview_counts(entries), {'new': 8, 'exists': 1, 'error': 2})
+        self.assertIn('7', entries[3]['message'])
+
+        errors = excel_preview.filter_preview(entries, status='error')
+        self.assertEqual([e['row'] for e in errors], [2, 12])
+        page_rows, page, pages, _ = excel_preview.paginate(entries, page=5, page_size=4)
+        self.assertEqual((page, pages, len(page_rows)), (3, 3, 3))
+
+    def test_excel_preview_is_stored_once_per_mapping(self):
+        """Test that a staged upload's preview is computed once and later pages read only their slice"""
+        from inventory_app.utils import excel_preview
+        from inventory_app.utils.excel_staging import StagedSheet, stage_rows
+        Product.objects.create(product_number='P3', name='P3', quantity=7)
+        rows = [[f'P{i}', i + 1, f'R{i}C1'] for i in range(10)] + [[None, 5, None]]
+        upload, _ = stage_rows(['Model', 'Qty', 'Loc'], rows)
+        mapping = {'product_number': 0, 'total_quantity': 1}
+        sheet = StagedSheet(upload)
+
+        counts = excel_preview.store_preview(sheet, mapping)
+        self.assertEqual(counts, {'new': 9, 'exists': 1, 'error': 1})
+
+        # الصفحات التالية: عدّ + شريحة، دون قراءة الصفوف المرحلية أو البحث عن المنتجات
+        with self.assertNumQueries(2):
+            self.assertEqual(excel_preview.store_preview(sheet, mapping), counts)
+            page_rows, filtered, page, pages, _ = excel_preview.stored_page(upload, page=3, page_size=4)
+        self.assertEqual((filtered, page, pages), (11, 3, 3))
+        self.assertEqual([e['row'] for e in page_rows], [10, 11, 12])
+
+        entries, filtered, *_ = excel_preview.stored_page(upload, status='exists')
+        self.assertEqual((filtered, entries[0]['final_number']), (1, 'P3'))
+        self.assertIn('7', entries[0]['message'])
+
+        # تغيير تحديد الأعمدة يعيد الحساب
+        excel_preview.store_preview(sheet, dict(mapping, location=2))
+        entries, filtered, *_ = excel_preview.stored_page(upload, search='r4c')
+        self.assertEqual((filtered, entries[0]['final_number']), (1, 'P4'))
+        self.assertEqual(upload.preview_rows.count(), 11)
+
+    def test_excel_bulk_import_conflicts_and_locations(self):
+        """Test the chunked Excel importer: conflict resolution, duplicate rows, locations and audit trail"""
+        from inventory_app.models import AuditLog, Location
+        from inventory_app.utils.excel_import import ExcelImporter, sheet_items
+        Product.objects.create(product_number='E1', name='E1', quantity=5)
+        Product.objects.filter(product_number='E1').update(created_at=timezone.now() - timedelta(days=2))
+        rows = [
+            ['E1', 3, 'R2-C3'],
+            ['N1', 4, 'R2C3'],
+            ['N1', 6, None],
+            ['N2', None, None],
+        ]
+        mapping = {'product_number': 0, 'total_quantity': 1, 'location': 2}
+
+        importer = ExcelImporter('update', user='admin', chunk_size=2)
+        results = importer.run(sheet_items(rows, mapping, importer))
+        self.assertEqual((results['added'], results['updated']), (1, 2))
+        self.assertEqual(len(results['errors']), 1)
+        self.assertEqual(Product.objects.get(product_number='E1').quantity, 8)
+        self.assertEqual(Product.objects.get(product_number='N1').quantity, 10)
+        location = Location.objects.get(row=2, column=3)
+        self.assertEqual(Product.objects.filter(location=location).count(), 2)
+        self.assertEqual(AuditLog.objects.filter(product_number='E1', action='updated').get().quantity_change, 3)
+
+        # نسخة الصندوق الأسود للمنتج المحدّث تحمل تاريخ إنشائه الأصلي
+        from django.utils.dateparse import parse_datetime
+        from inventory_app.models import SecureBackup
+        e1 = Product.objects.get(product_number='E1')
+        snapshot = SecureBackup.objects.filter(table_name='Product', record_id=e1.pk, action='update').latest('id')
+        self.assertLess(abs(parse_datetime(snapshot.backup_data['created_at']) - e1.created_at), timedelta(seconds=1))
+
+        importer = ExcelImporter('replace')
+        importer.run(sheet_items([['E1', 1, None]], mapping, importer))
+        self.assertEqual(Product.objects.get(product_number='E1').quantity, 1)
+        importer = ExcelImporter('skip')
+        self.assertEqual(importer.run(sheet_items([['E1', 9, None]], mapping, importer))['skipped'], 1)
+
+    def test_sheet_frame_parsing(self):
+        """Test the shared pandas parsing layer: quantity coercion, header rows and merge-file column mapping"""
+        import io
+        import pandas as pd
+        from openpyxl import Workbook
+        from inventory_app.utils import sheet_frame
+        quantities = sheet_frame.parse_quantities(pd.Series([5, ' 12 ', '2.9', 'abc', None, 0], dtype=object))
+        self.assertEqual(quantities.fillna(-1).tolist(), [5, 12, 2, -1, -1, 0])
+
+        parsed = sheet_frame.parse_mapped_rows(
+            [['MODEL', 'QTY', None], ['A1', 3, 'F1'], [None, None, None], ['B1', 'x', None]],
+            {'product_number': 0, 'total_quantity': 1, 'final_model': 2},
+        )
+        self.assertEqual(parsed.index.tolist(), [3, 5])
+        self.assertEqual(parsed['final_number'].tolist(), ['F1', 'B1'])
+        self.assertEqual(sheet_frame.invalid_mask(parsed).tolist(), [False, True])
+
+        wb = Workbook()
+        wb.active.append(['Final Model', 'Name', 'T.QTY'])
+        wb.active.append(['M1', None, '4'])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        self.assertEqual(sheet_frame.extract_products(buffer), [{'product_number': 'M1', 'name': 'M1', 'quantity': 4}])
+
+    def test_csv_upload_and_merge_fast_path(self):
+        """Test CSV/TSV intake: encoding and delimiter detection through upload, process and merge"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = 'رقم المنتج;الكمية;الاسم\nC1;4;منتج أول\n;;\nC2;7;\n'.encode('cp1256')
+        upload = self.client.post(reverse('inventory_app:upload_excel_file'), {
+            'excel_file': SimpleUploadedFile('items.csv', content),
+        }).json()
+        self.assertEqual(upload['headers'], ['رقم المنتج', 'الكمية', 'الاسم'])
+        self.assertEqual(upload['total_rows'], 2)
+        result = self.client.post(reverse('inventory_app:process_excel_data'), json.dumps({
+            'upload_id': upload['upload_id'], 'column_mapping': {'product_number': 0, 'total_quantity': 1, 'name': 2},
+        }), content_type='application/json').json()
+        self.assertEqual(result['results']['added'], 2)
+        self.assertEqual(Product.objects.get(product_number='C1').name, 'منتج أول')
+
+        merged = self.client.post(reverse('inventory_app:merge_files_upload'), {
+            'files': [SimpleUploadedFile('a.tsv', 'Model\tQty\nC1\t2\n'.encode('utf-8-sig'))],
+        }).json()
+        self.assertEqual(
+            [(it['product_number'], it['name'], it['quantity'], it['source']) for it in merged['items']],
+            [('C1', 'C1', 2, 'a.tsv')],
+        )
+
+    def test_merge_session_parallel_parse_and_paging(self):
+        """Test merge uploads: parallel parsing into a server-side session, duplicate paging, fixes and process"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from inventory_app.utils import merge_files
+        files = [
+            SimpleUploadedFile('a.csv', b'Model,Qty\nAB-1,2\nZZ9,1\n'),
+            SimpleUploadedFile('b.json', json.dumps([{'product_number': 'ab1', 'quantity': 3}]).encode()),
+            SimpleUploadedFile('c.json', b'{broken'),
+            SimpleUploadedFile('notes.pdf', b'%PDF'),
+        ]
+        with patch.object(merge_files, 'MERGE_PARALLEL_MIN_BYTES', 0):
+            upload = self.client.post(reverse('inventory_app:merge_files_upload'), {'files': files}).json()
+        self.assertEqual(upload['counts'], {'total': 3, 'unique': 2, 'duplicates': 1})
+        self.assertEqual([f['name'] for f in upload['files'] if f['error']], ['c.json'])
+        session_id = upload['session_id']
+
+        items_url = reverse('inventory_app:merge_files_items')
+        dup = self.client.get(items_url, {'session_id': session_id, 'mode': 'duplicates'}).json()
+        self.assertEqual([it['product_number'] for it in dup['items']], ['AB-1', 'ab1'])
+        page = self.client.get(items_url, {'session_id': session_id, 'page_size': 1, 'page': 2}).json()
+        self.assertEqual((page['pages'], page['items'][0]['product_number']), (3, 'ZZ9'))
+
+        processed = self.client.post(reverse('inventory_app:merge_files_process'), json.dumps({
+            'session_id': session_id, 'auto_fix': 'merge',
+        }), content_type='application/json').json()
+        self.assertEqual(sorted((it['product_number'], it['quantity']) for it in processed['items']), [('AB-1', 5), ('ZZ9', 1)])
+
+        export_url = reverse('inventory_app:merge_files_export')
+        exported = self.client.post(export_url, {'format': 'json', 'session_id': processed['session_id']})
+        self.assertEqual(json.loads(b''.join(exported.streaming_content))[0], {'product_number': 'AB-1', 'name': 'AB-1', 'quantity': 5})
+        renamed = self.client.post(reverse('inventory_app:merge_files_process'), json.dumps({
+            'session_id': session_id, 'auto_fix': 'rename',
+        }), content_type='application/json').json()
+        self.assertEqual(renamed['total'], 3)
+        workbook = self.client.post(export_url, {'format': 'excel', 'session_id': renamed['session_id']})
+        from openpyxl import load_workbook
+        import io
+        rows = list(load_workbook(io.BytesIO(b''.join(workbook.streaming_content))).active.values)
+        self.assertEqual(rows[-1], ('ab1-1', 'ab1', 3))
+
+        fixed = self.client.post(reverse('inventory_app:merge_files_item'), json.dumps({
+            'session_id': session_id, 'position': dup['items'][1]['position'], 'action': 'rename',
+        }), content_type='application/json').json()
+        self.assertEqual(fixed['counts']['duplicates'], 0)
+
+    def test_products_export_xlsx_and_csv(self):
+        """Test the write-only products export: one query for all rows, shared styles and the CSV variant"""
+        import io
+        from openpyxl import load_workbook
+        from inventory_app.utils.product_export import product_rows
+        location = Location.objects.create(warehouse=self.warehouse, row=2, column=5)
+        for i in range(5):
+            Product.objects.create(product_number=f'X{i}', name=f'N{i}', quantity=i, location=location if i % 2 else None)
+        with self.assertNumQueries(1):
+            rows = list(product_rows())
+        self.assertEqual(rows[1][5], 'R2C5')
+        self.assertEqual(rows[0][5], 'لا يوجد موقع')
+
+        response = self.client.get(reverse('inventory_app:export_products_excel'))
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 6)
+        self.assertEqual((sheet['B2'].value, sheet['B2'].style, sheet['A1'].font.b), ('X0', 'products_cell', True))
+
+        response = self.client.get(reverse('inventory_app:export_products_excel'), {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[2].startswith('2,X1,N1,,1,R2C5,'))
+
+    def test_background_jobs_enqueue_run_and_cancel(self):
+        """Test the background job queue: enqueue over the API, run in a worker, poll, download and cancel"""
+        import tempfile
+        from django.test import override_settings
+        from inventory_app.models import BackgroundJob
+        from inventory_app.utils import backup
+        from inventory_app.utils.jobs import claim_next_job, run_job
+        with tempfile.TemporaryDirectory() as jobs_dir, override_settings(BACKGROUND_JOBS_DIR=jobs_dir), \
+                patch.object(backup, 'BACKUP_STATE_PATH', f'{jobs_dir}/watermark.json'):
+            Product.objects.create(product_number='J1', name='J1', quantity=5)
+            bad = self.client.post(reverse('inventory_app:jobs_enqueue', args=['delete_data']), json.dumps({
+                'password': 'wrong', 'delete_products': True,
+            }), content_type='application/json')
+            self.assertEqual(bad.status_code, 400)
+
+            queued = self.client.post(reverse('inventory_app:jobs_enqueue', args=['backup_export']), {'format': 'json'})
+            self.assertEqual(queued.status_code, 202)
+            job_id = queued.json()['job']['id']
+            job = claim_next_job('test-worker')
+            self.assertEqual(str(job.pk), job_id)
+            self.assertIsNone(claim_next_job('other-worker'))
+            run_job(job)
+
+            status = self.client.get(reverse('inventory_app:job_status', args=[job_id])).json()['job']
+            self.assertEqual((status['status'], status['progress'], status['has_file']), ('succeeded', 100, True))
+            download = self.client.get(reverse('inventory_app:job_download', args=[job_id]))
+            content = b''.join(download.streaming_content)
+            self.assertIn(b'"J1"', content)
+
+            job_id = self.client.post(reverse('inventory_app:jobs_enqueue', args=['products_pdf'])).json()['job']['id']
+            cancelled = self.client.post(reverse('inventory_app:job_cancel', args=[job_id])).json()
+            self.assertEqual(cancelled['job']['status'], 'cancelled')
+            self.assertIsNone(claim_next_job('test-worker'))
+            self.assertEqual(BackgroundJob.objects.filter(status='succeeded').count(), 1)
+
+    def test_pdf_service_pool_and_fallback(self):
+        """Test the PDF service: reused renderer, busy rejection, and inline fallback when unreachable"""
+        import threading, time
+        from django.test import override_settings
+        from inventory_app.utils.pdf_service import PdfService, PdfServiceError, render_pdf, request_pdf
+
+        created = []
+
+        class FakeRenderer:
+            def __init__(self):
+                created.append(self)
+
+            def render(self, html, options):
+                return f'%PDF {html} {options.get("format")}'.encode()
+
+            def close(self):
+                pass
+
+        service = PdfService('127.0.0.1:0', browsers=1, renderer_factory=FakeRenderer).start()
+        self.addCleanup(service.stop)
+        host, port = service.address
+        with override_settings(PDF_SERVICE_ADDRESS=f'{host}:{port}'):
+            self.assertEqual(render_pdf('<p>1</p>', format='A4'), b'%PDF <p>1</p> A4')
+            self.assertEqual(render_pdf('<p>2</p>'), b'%PDF <p>2</p> None')
+        self.assertEqual(len(created), 1)
+
+        # متصفح مشغول وطابور ممتلئ: الطلب التالي يُرفض فوراً
+        started, release = threading.Event(), threading.Event()
+
+        class SlowRenderer(FakeRenderer):
+            def render(self, html, options):
+                started.set()
+                release.wait(10)
+                return super().render(html, options)
+
+        busy = PdfService('127.0.0.1:0', browsers=1, queue_size=1, renderer_factory=SlowRenderer).start()
+        self.addCleanup(busy.stop)
+        address = '%s:%s' % busy.address
+        waiting = [threading.Thread(target=request_pdf, args=(f'<p>{n}</p>', {}, address)) for n in (3, 4)]
+        waiting[0].start()
+        started.wait(5)
+        waiting[1].start()
+        while not busy.jobs.full():
+            time.sleep(0.01)
+        with self.assertRaisesMessage(PdfServiceError, 'busy'):
+            request_pdf('<p>5</p>', {}, address=address)
+        release.set()
+        for thread in waiting:
+            thread.join(5)
+
+        with override_settings(PDF_SERVICE_ADDRESS='127.0.0.1:1'), \
+                patch('inventory_app.utils.pdf_service.render_pdf_inline', return_value=b'%PDF inline') as inline:
+            self.assertEqual(render_pdf('<p>6</p>'), b'%PDF inline')
+            inline.assert_called_once()
+
+    def test_reportlab_pdf_engine(self):
+        """Test the browserless ReportLab engine for the products list and the order slip"""
+        import io
+        from django.test import override_settings
+        from pypdf import PdfReader
+        from inventory_app.utils.pdf_native import ar, pdf_engine
+        self.assertEqual(ar('قائمة 12'), '12 ﺔﻤﺋﺎﻗ')
+        self.assertEqual(pdf_engine('bogus'), 'chromium')
+        with override_settings(PDF_ENGINE='reportlab'):
+            self.assertEqual(pdf_engine(), 'reportlab')
+
+        location = Location.objects.create(warehouse=self.warehouse, row=2, column=4)
+        for i in range(120):
+            Product.objects.create(product_number=f'RL-{i:03}', name=f'منتج {i}', quantity=i, location=location)
+        response = self.client.get(reverse('inventory_app:export_products_pdf'), {'engine': 'reportlab'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        reader = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertGreater(len(reader.pages), 1)
+        self.assertIn('RL-119', reader.pages[-1].extract_text())
+
+        order = Order.objects.create(user=self.user, recipient_name='مستلم',
+                                     products_data=[{'product_number': 'RL-001', 'quantity_taken': 3}])
+        with override_settings(PDF_ENGINE='reportlab'):
+            response = self.client.get(reverse('inventory_app:export_order_pdf', args=[order.id]))
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn('RL-001', PdfReader(io.BytesIO(content)).pages[0].extract_text())
+
+    def test_products_pdf_rendered_in_chunks(self):
+        """Test the products PDF split into chunks, merged with pypdf, with progress and one reused browser"""
+        import io
+        from django.test import override_settings
+        from pypdf import PdfReader
+        from reportlab.pdfgen import canvas
+        from inventory_app.utils.pdf_chunks import iter_parts, render_products_pdf
+        self.assertEqual([(rows, first, last) for rows, first, last in iter_parts(range(5), 2)],
+                         [([0, 1], True, False), ([2, 3], False, False), ([4], False, True)])
+        self.assertEqual(list(iter_parts([], 2)), [([], True, True)])
+
+        Product.objects.bulk_create([Product(product_number=f'CH-{i:03}', name=f'<b>{i}</b>') for i in range(120)])
+        progress = []
+        with override_settings(PDF_CHUNK_ROWS=40, PDF_RENDER_WORKERS=1):
+            content = render_products_pdf('reportlab', progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        pages = PdfReader(io.BytesIO(content)).pages
+        self.assertIn('CH-000', pages[0].extract_text())
+        self.assertIn('CH-119', pages[-1].extract_text())
+
+        htmls = []
+
+        class FakeRenderer:
+            def render(self, html, options):
+                htmls.append(html)
+                buffer = io.BytesIO()
+                page = canvas.Canvas(buffer)
+                page.drawString(10, 10, f'part {len(htmls)}')
+                page.save()
+                return buffer.getvalue()
+
+            def close(self):
+                pass
+
+        with override_settings(PDF_CHUNK_ROWS=50, PDF_SERVICE_ADDRESS=''), \
+                patch('inventory_app.utils.pdf_service.ChromiumRenderer', FakeRenderer):
+            content = render_products_pdf('chromium')
+        self.assertEqual(len(PdfReader(io.BytesIO(content)).pages), 3)
+        self.assertIn('class="header"', htmls[0])
+        self.assertNotIn('class="header"', htmls[1])
+        self.assertIn('إجمالي المنتجات: 120', htmls[2])
+        self.assertIn('&lt;b&gt;', htmls[0])
+
+    def test_export_cache_versions_etag_and_eviction(self):
+        """Test that exports are served from the disk cache per data version, with ETag/304 and LRU eviction"""
+        import os
+        from inventory_app.utils import export_cache, product_export
+        product = Product.objects.create(product_number='C1', name='C1', quantity=1)
+        url = reverse('inventory_app:export_products_excel')
+        with patch.object(product_export, 'write_products_xlsx', wraps=product_export.write_products_xlsx) as build:
+            first = self.client.get(url)
+            second = self.client.get(url)
+            self.assertEqual(build.call_count, 1)
+        etag = first['ETag']
+        self.assertEqual(second['ETag'], etag)
+        self.assertIn('Last-Modified', first)
+        self.assertEqual(b''.join(second.streaming_content)[:2], b'PK')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        product.quantity = 2
+        product.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        self.assertNotEqual(self.client.get(url, {'format': 'csv'})['ETag'], etag)
+
+        order = Order.objects.create(user=self.user, products_data=[{'product_number': 'C1', 'quantity_taken': 1}])
+        order_url = reverse('inventory_app:export_order_pdf', args=[order.id])
+        first = self.client.get(order_url, {'engine': 'reportlab'})
+        Product.objects.create(product_number='C2', name='C2', quantity=1)
+        self.assertEqual(self.client.get(order_url, {'engine': 'reportlab'})['ETag'], first['ETag'])
+
+        files = sorted(os.scandir(self.export_cache_dir), key=lambda e: e.stat().st_atime)
+        self.assertEqual(len(files), 4)
+        newest = files[-1].stat().st_size
+        self.assertEqual(export_cache.evict(max_bytes=newest), 3)
+        self.assertEqual([e.name for e in os.scandir(self.export_cache_dir)], [files[-1].name])
+
+        # حذف الملف من طلب آخر (evict) قبل فتحه أو أثناء إرساله لا يفشل التنزيل
+        real_open = export_cache.ExportArtifact.open
+
+        def evicted_open(artifact):
+            export_cache.evict(max_bytes=0)
+            return real_open(artifact)
+
+        with patch.object(export_cache.ExportArtifact, 'open', evicted_open):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        export_cache.evict(max_bytes=0)
+        self.assertEqual(b''.join(response.streaming_content)[:2], b'PK')
+
+    def test_product_image_thumbnails(self):
+        """Test thumbnails created after upload, replaced on edit, backfilled by command and used by lists/PDFs"""
+        import io, os, tempfile
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+        from django.test import override_settings
+        from inventory_app.views import _order_pdf_html
+
+        def upload(name, size):
+            buffer = io.BytesIO()
+            Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+            return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        with override_settings(MEDIA_ROOT=media.name):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('inventory_app:product_add'), {
+                    'product_number': 'T1', 'name': 'T1', 'quantity': 1, 'image': upload('t1.jpg', (1200, 800)),
+                })
+            product = Product.objects.get(product_number='T1')
+            self.assertTrue(product.thumbnail.name.endswith('.webp'))
+            with Image.open(product.thumbnail.path) as thumb:
+                self.assertEqual(thumb.size, (160, 107))
+            self.assertIn(product.thumbnail.url, self.client.get(reverse('inventory_app:products_list')).content.decode())
+
+            old_thumbnail = product.thumbnail.path
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('inventory_app:product_edit', args=[product.id]), {
+                    'product_number': 'T1', 'name': 'T1', 'quantity': 1, 'image': upload('t2.jpg', (300, 600)),
+                })
+            product.refresh_from_db()
+            self.assertFalse(os.path.exists(old_thumbnail))
+            self.assertTrue(os.path.exists(product.thumbnail.path))
+
+            Product.objects.filter(pk=product.pk).update(thumbnail=None)
+            call_command('generate_thumbnails', stdout=io.StringIO())
+            product.refresh_from_db()
+            self.assertTrue(product.thumbnail)
+            order = Order.objects.create(user=self.user, products_data=[{'product_number': 'T1', 'quantity_taken': 1}])
+            self.assertIn('data:image/webp;base64,', _order_pdf_html(order, {'T1': product}))
+
     def test_strict_product_search(self):
         """Test Strict Product Number Search (No Partial Matching for Numbers)"""
         print("\n--- Testing Strict Product Search ---")
@@ -198,6 +697,86 @@ class SystemScenarioTest(TestCase):
         
         print("Orders List Filtering Verified: Found ' 502 ' with query '502', ignored '502-1'.")
 
+    def test_order_lines_written_and_rebuilt(self):
+        """Test indexed order lines from confirm_products, bulk backup import and rebuild"""
+        from inventory_app.models import OrderLine
+        from inventory_app.utils.backup_import import BackupImporter
+        from inventory_app.utils.order_lines import rebuild_order_lines
+        Product.objects.create(product_number='OL-1', name='Cable Drum', quantity=10)
+        Product.objects.create(product_number='OL-2', name='Switch', quantity=10)
+        response = self.client.post(
+            reverse('inventory_app:confirm_products'),
+            data=json.dumps({'products': [{'number': 'OL-1', 'quantity': 3}, {'number': 'OL-2', 'quantity': 2}],
+                             'recipient_name': 'Team A'}),
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        order = Order.objects.get(order_number=response.json()['order_number'])
+        self.assertEqual(
+            sorted(order.lines.values_list('product_number', 'quantity', 'recipient_name')),
+            [('OL-1', 3, 'Team A'), ('OL-2', 2, 'Team A')],
+        )
+
+        # الاستيراد المجمّع لا يمر بالإشارات
+        importer = BackupImporter(record_history=False)
+        importer.import_section('orders', [{
+            'model': 'inventory_app.order', 'pk': 900,
+            'fields': {'order_number': 'ORD-IMP',
+                       'products_data': [{'product_number': 'OL-1', 'name': 'Cable Drum', 'quantity_taken': 4}],
+                       'recipient_name': 'Team B', 'user': 'admin', 'created_at': '2026-01-05T10:00:00Z'},
+        }])
+        self.assertEqual(list(OrderLine.objects.filter(order_id=900).values_list('quantity', 'recipient_name')),
+                         [(4, 'Team B')])
+
+        # البحث بجزء من الاسم المحفوظ في السطر، لا باسم المنتج الحالي
+        Product.objects.filter(product_number='OL-1').update(name='Fiber Reel')
+        search = reverse('inventory_app:search_order_history')
+        stats = self.client.get(search, {'q': 'cable'}).json()['stats']
+        self.assertEqual(stats['total_withdrawn'], 7)
+        self.assertEqual({r['name']: r['count'] for r in stats['top_recipients']}, {'Team B': 4, 'Team A': 3})
+        self.assertIn({'date': '2026-01-05', 'qty': 4}, stats['timeline'])
+        self.assertEqual(self.client.get(search, {'q': 'fiber'}).json()['stats']['total_withdrawn'], 0)
+        self.assertEqual(self.client.get(search, {'q': 'ol-1'}).json()['stats']['total_withdrawn'], 7)
+
+        # رقم مخزّن بأحرف مختلطة يُطابق بأي حالة أحرف
+        Order.objects.create(order_number='ORD-MIX', products_data=[{'product_number': 'Ab12', 'quantity': 2}],
+                             recipient_name='Team C')
+        self.assertEqual(self.client.get(search, {'q': 'ab12'}).json()['stats']['total_withdrawn'], 2)
+        self.assertEqual(self.client.get(search, {'q': 'AB12'}).json()['stats']['total_withdrawn'], 2)
+
+        OrderLine.objects.all().delete()
+        self.assertEqual(rebuild_order_lines(batch_size=1), 4)
+
+    def test_order_rollups_on_create_and_delete(self):
+        """Test daily and per-recipient rollups updated with order creation and deletion"""
+        from inventory_app.models import OrderDailyStat, OrderRecipientStat
+        from inventory_app.utils.order_stats import rebuild_order_stats
+        first = Order.objects.create(order_number='R-1', products_data=[], total_quantities=5, recipient_name='Ali')
+        Order.objects.create(order_number='R-2', products_data=[], total_quantities=7, recipient_name='Ali')
+        Order.objects.create(order_number='R-3', products_data=[], total_quantities=1, recipient_name='Sara')
+        Order.objects.create(order_number='R-4', products_data=[], total_quantities=2)
+
+        recipients = self.client.get(reverse('inventory_app:get_all_recipients_stats')).json()['recipients']
+        self.assertEqual(recipients, [
+            {'recipient_name': 'Ali', 'count': 2, 'total_qty': 12},
+            {'recipient_name': 'Sara', 'count': 1, 'total_qty': 1},
+        ])
+        context = self.client.get(reverse('inventory_app:orders_list')).context
+        self.assertEqual((context['total_orders'], context['today_orders'], context['total_quantities_taken']),
+                         (4, 4, 15))
+        self.assertEqual(json.loads(context['daily_qtys']), [15])
+        self.assertEqual(json.loads(context['recipient_labels']), ['Ali', 'Sara'])
+
+        self.client.delete(reverse('inventory_app:delete_order', args=[first.pk]))
+        Order.objects.filter(order_number='R-3').delete()
+        self.assertEqual(list(OrderRecipientStat.objects.values_list('recipient_name', 'orders', 'quantity')),
+                         [('Ali', 1, 7)])
+        self.assertEqual(list(OrderDailyStat.objects.values_list('orders', 'quantity')), [(2, 9)])
+
+        incremental = list(OrderDailyStat.objects.values_list('date', 'orders', 'quantity'))
+        rebuild_order_stats()
+        self.assertEqual(list(OrderDailyStat.objects.values_list('date', 'orders', 'quantity')), incremental)
+
     @patch('playwright.sync_api.sync_playwright')
     def test_order_pdf_export(self, mock_playwright_func):
         """Test Order PDF Export (Mocking Playwright)"""
@@ -321,3 +900,457 @@ class SystemScenarioTest(TestCase):
         self.assertFalse(l5.products.exists())
         
         print("Row Compaction Verified: Gaps filled correctly.")
+
+
+class SecureBackupIntegrityTest(TestCase):
+    def test_verify_detects_tampering_and_gaps(self):
+        """Test that the verifier reports mismatches, informational id gaps and rows missing against the counters"""
+        from inventory_app.models import SecureBackup
+        from inventory_app.utils.secure_backup import verify_secure_backups
+
+        for i in range(5):
+            Product.objects.create(product_number=f'SB-{i}', name=f'SB {i}', quantity=i)
+        ids = list(SecureBackup.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(len(ids), 5)
+
+        report = verify_secure_backups(chunk_size=2)
+        self.assertTrue(report['completed'])
+        self.assertEqual(report['checked'], 5)
+        self.assertEqual(report['mismatches'], [])
+        self.assertEqual(report['gaps'], [])
+
+        # التلاعب بسجل وحذف آخر
+        SecureBackup.objects.filter(id=ids[1]).update(backup_data={'name': 'tampered'})
+        SecureBackup.objects.filter(id=ids[3]).delete()
+
+        report = verify_secure_backups(chunk_size=2)
+        self.assertEqual(report['checked'], 4)
+        self.assertEqual([m['id'] for m in report['mismatches']], [ids[1]])
+        self.assertEqual(report['gaps'], [[ids[3], ids[3]]])
+        self.assertEqual(report['missing'], 1)
+
+        # فجوة تسلسل عادية (سجل لم يُكتب أصلاً) تبقى للعلم فقط: العدادات تطابق الموجود
+        from inventory_app.utils.secure_backup import bump_counter
+        bump_counter('Product', 'create', delta=-1)
+        report = verify_secure_backups(chunk_size=2)
+        self.assertEqual(report['gaps'], [[ids[3], ids[3]]])
+        self.assertEqual(report['missing'], 0)
+
+        # الاستئناف من تقرير سابق يفحص السجلات الجديدة فقط
+        Product.objects.create(product_number='SB-NEW', name='new', quantity=1)
+        resumed = verify_secure_backups(report=report, chunk_size=2)
+        self.assertEqual(resumed['checked'], 5)
+
+    def test_secure_backup_export_streams_ndjson(self):
+        """Test that the secure backup export streams filtered NDJSON, optionally gzipped"""
+        import gzip
+        from inventory_app.models import SecureBackup
+
+        User.objects.create_superuser(username='sb_admin', password='password')
+        self.client.login(username='sb_admin', password='password')
+        session = self.client.session
+        session['secure_backup_access'] = True
+        session.save()
+
+        warehouse = Warehouse.objects.create(name='W')
+        Product.objects.create(product_number='EXP-1', name='E1')
+        Product.objects.create(product_number='EXP-2', name='E2')
+
+        url = reverse('inventory_app:export_secure_backup')
+        response = self.client.get(url, {'table': 'Product'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(json.loads(lines[0])['meta']['filters'], {'table': 'Product'})
+        records = [json.loads(line) for line in lines[1:]]
+        self.assertEqual(len(records), 2)
+        self.assertEqual({r['fields']['table_name'] for r in records}, {'Product'})
+
+        # روابط التصدير في اللوحة تحمل كل الفلاتر النشطة بما فيها البحث q
+        dashboard = self.client.get(reverse('inventory_app:secure_backup_dashboard'), {'q': 'abc', 'table': 'Product'})
+        self.assertContains(dashboard, f'{url}?q=abc&table=Product')
+        self.assertContains(dashboard, f'{url}?gzip=1&q=abc&table=Product')
+        product = Product.objects.get(product_number='EXP-1')
+        signature = SecureBackup.objects.get(table_name='Product', record_id=product.id).hash_signature
+        response = self.client.get(url, {'q': signature, 'table': 'Product'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['fields']['record_id'] for line in lines[1:]], [product.id])
+
+        response = self.client.get(url, {'gzip': '1'})
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines) - 1, SecureBackup.objects.count())
+        self.assertIn(warehouse.id, [json.loads(line)['fields']['record_id'] for line in lines[1:]])
+
+    def test_retention_thins_old_versions_and_keeps_counters(self):
+        """Test tiered retention (all / daily / monthly) and incremental dashboard counters"""
+        import tempfile, os
+        from datetime import datetime as dt
+        from inventory_app.models import SecureBackup
+        from inventory_app.utils import secure_backup
+
+        product = Product.objects.create(product_number='RET-1', name='v0')
+        for i in range(1, 9):
+            product.name = f'v{i}'
+            product.save()
+        ids = list(SecureBackup.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(secure_backup.dashboard_stats()[0]['total'], 9)
+
+        now = timezone.make_aware(dt(2026, 6, 15, 12, 0))
+        stamps = [
+            now - timedelta(days=100, hours=3),  # نفس اليوم: تبقى الأحدث فقط
+            now - timedelta(days=100, hours=2),
+            now - timedelta(days=100, hours=1),
+            dt(2025, 1, 5, 12, 0),             # نفس الشهر: تبقى الأحدث فقط
+            dt(2025, 1, 20, 12, 0),
+            now - timedelta(days=1),            # ضمن فترة الاحتفاظ الكامل
+            now - timedelta(days=1),
+            now - timedelta(hours=1),
+            now - timedelta(minutes=1),
+        ]
+        for backup_id, stamp in zip(ids, stamps):
+            if timezone.is_naive(stamp):
+                stamp = timezone.make_aware(stamp)
+            SecureBackup.objects.filter(id=backup_id).update(timestamp=stamp)
+        secure_backup.rebuild_counters()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.object(secure_backup, 'RETENTION_STATE_PATH', os.path.join(tmp, 'state.json')):
+                stats = secure_backup.apply_retention(keep_all_days=30, daily_days=365, batch_size=3, now=now)
+                self.assertEqual(stats['daily'], 2)
+                self.assertEqual(stats['monthly'], 1)
+                remaining = list(SecureBackup.objects.order_by('id').values_list('id', flat=True))
+                self.assertEqual(remaining, [ids[2], ids[4]] + ids[5:])
+
+                counters, tables = secure_backup.dashboard_stats()
+                self.assertEqual(counters['total'], SecureBackup.objects.count())
+                self.assertEqual(tables, ['Product'])
+
+                # فجوات التقليص لا تُعدّ تلاعباً
+                report = secure_backup.verify_secure_backups()
+                self.assertEqual(report['gaps'], [])
+                self.assertEqual(report['mismatches'], [])
+                self.assertEqual(report['missing'], 0)
+
+
+class BackupExportTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from inventory_app.utils import backup
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        state_patch = patch.object(backup, 'BACKUP_STATE_PATH', f'{tmpdir.name}/watermark.json')
+        state_patch.start()
+        self.addCleanup(state_patch.stop)
+        self.user = User.objects.create_superuser(username='admin', password='password')
+        self.client = Client()
+        self.client.login(username='admin', password='password')
+        warehouse = Warehouse.objects.create(name='Main')
+        location = Location.objects.create(warehouse=warehouse, row=1, column=1)
+        for i in range(3):
+            Product.objects.create(product_number=f'BK-{i}', name=f'BK {i}', quantity=i, location=location)
+        Order.objects.create(order_number='ORD-BK', products_data=[{'product_number': 'BK-1', 'quantity_taken': 1}])
+
+    def test_create_backup_records_watermark_after_file_is_in_place(self):
+        """Test that create_backup advances the watermark only once the backup file has been moved into place"""
+        import os, tempfile
+        from django.core.management import call_command
+        from inventory_app.management.commands import create_backup
+        from inventory_app.utils.backup import load_watermark
+
+        real_replace = os.replace
+
+        def failing_replace(src, dst):
+            # فشل نقل ملف النسخة فقط (حفظ العلامة يستخدم os.replace أيضاً)
+            if os.path.basename(dst).startswith('backup_'):
+                raise OSError('disk full')
+            return real_replace(src, dst)
+
+        with tempfile.TemporaryDirectory() as out:
+            with patch.object(create_backup.os, 'replace', side_effect=failing_replace):
+                with self.assertRaises(OSError):
+                    call_command('create_backup', output_dir=out, stdout=MagicMock())
+            self.assertIsNone(load_watermark())
+
+            call_command('create_backup', output_dir=out, stdout=MagicMock())
+            self.assertEqual(len([n for n in os.listdir(out) if n.endswith('.json')]), 1)
+            self.assertIsNotNone(load_watermark())
+
+    def test_export_backup_streams_json_with_manifest(self):
+        """Test that the streaming JSON backup is valid, complete and carries a matching manifest"""
+        import hashlib
+        response = self.client.post(reverse('inventory_app:export_backup'))
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(len(data['products']), 3)
+        self.assertEqual(data['backup_stats']['products_count'], 3)
+        self.assertEqual(data['backup_stats']['orders_count'], 1)
+        lines = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in data['products'])
+        self.assertEqual(data['manifest']['products']['sha256'], hashlib.sha256(lines.encode('utf-8')).hexdigest())
+
+    def test_export_backup_zip_contains_ndjson_per_table(self):
+        """Test the zip export: one NDJSON member per table plus manifest.json"""
+        import io, zipfile
+        response = self.client.post(reverse('inventory_app:export_backup'), {'format': 'zip'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        manifest = json.loads(archive.read('manifest.json'))
+        products = archive.read('products.ndjson').decode('utf-8').splitlines()
+        self.assertEqual(len(products), 3)
+        self.assertEqual(manifest['manifest']['products']['count'], 3)
+        self.assertEqual(json.loads(products[0])['model'], 'inventory_app.product')
+
+    def test_import_backup_round_trip_bulk(self):
+        """Test that an exported backup re-imports in bulk, preserving timestamps and recording history"""
+        from inventory_app.models import SecureBackup
+        response = self.client.post(reverse('inventory_app:export_backup'))
+        payload = b''.join(response.streaming_content).decode('utf-8')
+        created_at = Product.objects.get(product_number='BK-1').created_at
+        Product.objects.filter(product_number='BK-1').update(name='changed')
+        Product.objects.filter(product_number='BK-2').delete()
+        history_before = SecureBackup.objects.filter(table_name='Product').count()
+
+        response = self.client.post(reverse('inventory_app:import_backup'), {
+            'backup_json': payload,
+            'avoid_duplicates': 'true',
+            'selected_sections': json.dumps(['products']),
+        })
+        result = response.json()
+
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['imported']['products'], 3)
+        self.assertEqual(Product.objects.count(), 3)
+        product = Product.objects.get(product_number='BK-1')
+        self.assertEqual(product.name, 'BK 1')
+        self.assertEqual(product.created_at, created_at.replace(microsecond=created_at.microsecond // 1000 * 1000))
+        self.assertEqual(SecureBackup.objects.filter(table_name='Product').count(), history_before + 3)
+        new_product = Product.objects.create(product_number='BK-NEW', name='new', quantity=1)
+        self.assertGreater(new_product.pk, product.pk)
+
+    def test_export_backup_requires_admin_and_explicit_watermark(self):
+        """Test export auth, that a plain GET does not advance the watermark, and the overlap for open transactions"""
+        from django.test import override_settings
+        from inventory_app.models import SecureBackup
+        from inventory_app.utils.backup import current_watermark, load_watermark, save_watermark
+        url = reverse('inventory_app:export_backup')
+        self.assertEqual(Client().get(url).status_code, 302)
+        self.assertIsNone(load_watermark())
+
+        b''.join(self.client.get(url).streaming_content)
+        self.assertIsNone(load_watermark())
+        b''.join(self.client.post(url).streaming_content)
+        self.assertIsNotNone(load_watermark())
+
+        # تغيير سُجل بمعرف أقدم من العلامة (معاملة لم تكن مودعة وقت أخذها) يظهر بفضل هامش التداخل
+        hour_ago = timezone.now() - timedelta(hours=1)
+        SecureBackup.objects.update(timestamp=hour_ago)
+        Product.objects.update(updated_at=hour_ago)
+        product = Product.objects.get(product_number='BK-1')
+        product.name = 'late commit'
+        product.save()
+        Product.objects.filter(pk=product.pk).update(updated_at=hour_ago)
+        save_watermark(current_watermark())
+        self.assertGreaterEqual(load_watermark()['secure_backup_id'], SecureBackup.objects.latest('id').id)
+        for overlap, expected in ((300, ['BK-1']), (0, [])):
+            with override_settings(BACKUP_WATERMARK_OVERLAP_SECONDS=overlap):
+                diff = json.loads(b''.join(self.client.get(url, {'type': 'differential'}).streaming_content))
+            self.assertEqual([p['fields']['product_number'] for p in diff['products']], expected)
+            save_watermark(diff['export_info']['base_watermark'])
+
+    @override_settings(BACKUP_WATERMARK_OVERLAP_SECONDS=0)
+    def test_differential_backup_chain_restore(self):
+        """Test that a differential backup carries only changes since the last backup and restores as a chain"""
+        import io, os, tempfile
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        full = json.loads(b''.join(self.client.post(reverse('inventory_app:export_backup')).streaming_content))
+        self.assertEqual(full['export_info']['backup_type'], 'full')
+
+        location = Location.objects.first()
+        Product.objects.create(product_number='BK-NEW', name='new', quantity=5, location=location)
+        Product.objects.filter(product_number='BK-0').delete()
+        diff = json.loads(b''.join(self.client.post(
+            reverse('inventory_app:export_backup'), {'type': 'differential'}
+        ).streaming_content))
+        self.assertEqual(diff['export_info']['base_watermark'], full['export_info']['watermark'])
+        self.assertEqual([p['fields']['product_number'] for p in diff['products']], ['BK-NEW'])
+        self.assertEqual(len(diff['deleted']), 1)
+        self.assertEqual(diff['locations'], [])
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        paths = []
+        for name, payload in (('full.json', full), ('diff.json', diff)):
+            paths.append(os.path.join(tmpdir.name, name))
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+        Product.objects.all().delete()
+        call_command('restore_backup', *paths, stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Product.objects.values_list('product_number', flat=True)), ['BK-1', 'BK-2', 'BK-NEW']
+        )
+        with self.assertRaises(CommandError):
+            call_command('restore_backup', paths[1], stdout=io.StringIO())
+
+    def test_inspect_backup_streams_zip_and_json(self):
+        """Test that inspect_backup reports counts and duplicates for zip-NDJSON and JSON exports"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        for params, name in (({'format': 'zip'}, 'backup.zip'), ({'gzip': '1'}, 'backup.json.gz')):
+            content = b''.join(self.client.post(reverse('inventory_app:export_backup'), params).streaming_content)
+            result = self.client.post(reverse('inventory_app:inspect_backup'), {
+                'backup_file': SimpleUploadedFile(name, content),
+            }).json()
+            self.assertTrue(result['success'], result)
+            sections = {s['name']: s for s in result['sections']}
+            self.assertEqual(sections['products']['count'], 3)
+            self.assertFalse(result['has_errors'])
+            self.assertEqual(len(result['product_duplicates']), 3)
+            self.assertTrue(result['parse_meta']['streaming'])
+
+    def test_backup_parser_encodings_and_comments(self):
+        """Test encoding detection from the prefix and tolerance for comments and trailing commas"""
+        from inventory_app.utils.backup_parser import load_backup
+        payload = '{"export_info": {"version": "2.2"}, // تعليق\n "products": [{"model": "inventory_app.product", "pk": 1, "fields": {"name": "منتج"}},], }'
+        for encoding in ('utf-8', 'utf-8-sig', 'utf-16', 'cp1256'):
+            data, meta = load_backup(payload.encode(encoding))
+            self.assertEqual(data['products'][0]['fields']['name'], 'منتج', encoding)
+            self.assertEqual(data['export_info']['version'], '2.2')
+        self.assertEqual(meta['encoding'], 'cp1256')
+
+    def test_fast_restore_native_path(self):
+        """Test the native restore path: clears, bulk-loads, repairs dangling references and keeps timestamps"""
+        import io, os, tempfile
+        from django.core.management import call_command
+        from inventory_app.models import AuditLog, OrderDailyStat, OrderLine, OrderRecipientStat, UserActivityLog
+        from inventory_app.utils.native_restore import copy_line, copy_value
+        product = Product.objects.get(product_number='BK-1')
+        AuditLog.objects.create(action='add', product=product, product_number='BK-1', quantity_change=1, notes='n', user='admin')
+        payload = json.loads(b''.join(self.client.post(reverse('inventory_app:export_backup')).streaming_content))
+        payload['products'][0]['fields']['container'] = 999
+        payload['orders'][0]['fields'].update(recipient_name='Ali', total_quantities=1)
+        payload['user_activity_logs'] = [{
+            'model': 'inventory_app.useractivitylog', 'pk': 50,
+            'fields': {'user': 777, 'action': 'login', 'description': 'd', 'created_at': '2020-01-01T00:00:00Z'},
+        }]
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'full.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+
+        call_command('restore_backup', path, '--fast', '--clear', stdout=io.StringIO())
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertIsNone(Product.objects.order_by('pk').first().container_id)
+        self.assertEqual(AuditLog.objects.get().product_id, product.pk)
+        log = UserActivityLog.objects.get(pk=50)
+        self.assertEqual(log.user.username, 'imported_user_777')
+        self.assertEqual(log.created_at.year, 2020)
+        self.assertEqual(Product.objects.get(product_number='BK-1').created_at, product.created_at.replace(
+            microsecond=product.created_at.microsecond // 1000 * 1000))
+        # الكتابة المباشرة لا تمر بالإشارات: أسطر الطلبيات تُعاد بناؤها في finish()
+        self.assertEqual(list(OrderLine.objects.values_list('product_number', 'quantity')), [('BK-1', 1)])
+        self.assertEqual(list(OrderDailyStat.objects.values_list('orders', 'quantity')), [(1, 1)])
+        self.assertEqual(list(OrderRecipientStat.objects.values_list('recipient_name', 'orders')), [('Ali', 1)])
+        self.assertGreater(Product.objects.create(product_number='BK-X', name='x').pk, 3)
+        self.assertEqual(copy_line(['a"b', None, '']), '"a""b",,""\n')
+        self.assertEqual(copy_value(Product._meta.get_field('colors'), ['أحمر']), '["أحمر"]')
+
+    def test_fast_restore_chain_merges_updated_rows(self):
+        """Test that a fast chain restore checks table emptiness per file, so updated rows merge instead of COPY"""
+        import io, os, tempfile
+        from django.core.management import call_command
+        from inventory_app.utils.native_restore import NativeLoader
+        full = json.loads(b''.join(self.client.post(reverse('inventory_app:export_backup')).streaming_content))
+        product = Product.objects.get(product_number='BK-1')
+        product.name = 'updated'
+        product.save()
+        diff = json.loads(b''.join(self.client.post(
+            reverse('inventory_app:export_backup'), {'type': 'differential'}
+        ).streaming_content))
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        paths = []
+        for name, payload in (('full.json', full), ('diff.json', diff)):
+            paths.append(os.path.join(tmpdir.name, name))
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+
+        # على PostgreSQL: was_empty=True يعني COPY مباشر، و False يعني جدول مرحلي + ON CONFLICT
+        modes = []
+        write = NativeLoader._write
+
+        def spy(loader, section, rows):
+            write(loader, section, rows)
+            if section == 'products':
+                modes.append(loader._plan(section).was_empty)
+
+        with patch.object(NativeLoader, '_write', spy):
+            call_command('restore_backup', *paths, '--fast', '--clear', stdout=io.StringIO())
+        self.assertEqual(modes, [True, False])
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(product_number='BK-1').name, 'updated')
+
+    def test_export_import_data_commands_resume(self):
+        """Test chunked export_data/import_data including containers, orders and resuming from a checkpoint"""
+        import io, os, tempfile
+        from django.core.management import call_command
+        from inventory_app.models import Container
+        from inventory_app.utils.secure_backup import load_checkpoint, save_checkpoint
+        container = Container.objects.create(name='C1')
+        Product.objects.filter(product_number='BK-2').update(container=container)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'data.json')
+        call_command('export_data', '--output', path, '--chunk-size', '2', stdout=io.StringIO())
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(len(data['containers']), 1)
+        self.assertEqual(len(data['orders']), 1)
+
+        Product.objects.all().delete()
+        Container.objects.all().delete()
+        call_command('import_data', '--input', path, '--chunk-size', '2', stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(product_number='BK-2').container.name, 'C1')
+        checkpoint = load_checkpoint(f'{path}.checkpoint.json')
+        self.assertTrue(checkpoint['completed'])
+        self.assertEqual(checkpoint['counts']['products'], 3)
+
+        # محاكاة توقف بعد أول دفعة من المنتجات ثم الاستئناف
+        Product.objects.filter(product_number='BK-2').delete()
+        checkpoint.update({'completed': False, 'section': 'products', 'offset': 2,
+                           'done_sections': ['warehouses', 'locations', 'containers'], 'counts': {}})
+        save_checkpoint(f'{path}.checkpoint.json', checkpoint)
+        out = io.StringIO()
+        call_command('import_data', '--input', path, '--chunk-size', '2', '--resume', stdout=out)
+        self.assertTrue(Product.objects.filter(product_number='BK-2').exists())
+        self.assertEqual(load_checkpoint(f'{path}.checkpoint.json')['counts']['products'], 1)
+
+
+class ExcelImportTransactionTest(TransactionTestCase):
+    """الاستيراد خارج ATOMIC_REQUESTS: كل دفعة تُثبّت في معاملتها (TransactionTestCase بلا معاملة خارجية)"""
+
+    def test_process_excel_commits_each_chunk(self):
+        from django.db import connection
+        from inventory_app.models import ExcelUpload
+        from inventory_app.utils import excel_import
+        from inventory_app.utils.excel_staging import stage_rows
+        user = User.objects.create_superuser(username='admin', password='password')
+        self.client.login(username='admin', password='password')
+        upload, _ = stage_rows(['Model', 'Qty'], [[f'T{i}', i + 1] for i in range(5)], user=user)
+
+        in_atomic = []
+        import_chunk = excel_import.ExcelImporter._import_chunk
+
+        def spy(importer, chunk):
+            in_atomic.append(connection.in_atomic_block)
+            return import_chunk(importer, chunk)
+
+        # دفعات من صفين: 3 دفعات لخمسة صفوف
+        with patch.object(excel_import.ExcelImporter.__init__, '__defaults__', ('skip', '', 2)), \
+                patch.object(excel_import.ExcelImporter, '_import_chunk', spy):
+            result = self.client.post(reverse('inventory_app:process_excel_data'), json.dumps({
+                'upload_id': str(upload.pk), 'column_mapping': {'product_number': 0, 'total_quantity': 1},
+            }), content_type='application/json').json()
+        self.assertEqual(result['results']['added'], 5)
+        self.assertEqual(in_atomic, [False, False, False])
+        self.assertFalse(ExcelUpload.objects.exists())
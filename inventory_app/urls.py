@@ -73,6 +73,8 @@ urlpatterns = [
     # دمج ملفات المنتجات (Excel/JSON)
     path('merge-files/', views.merge_files_page, name='merge_files_page'),
     path('api/merge-files/upload/', views.merge_files_upload, name='merge_files_upload'),
+    path('api/merge-files/items/', views.merge_files_items, name='merge_files_items'),
+    path('api/merge-files/item/', views.merge_files_item, name='merge_files_item'),
     path('api/merge-files/process/', views.merge_files_process, name='merge_files_process'),
     path('api/merge-files/export/', views.merge_files_export, name='merge_files_export'),
     
@@ -118,10 +120,18 @@ urlpatterns = [
     path('secure-backup/login/', views.secure_backup_login, name='secure_backup_login'),
     path('secure-backup/', views.secure_backup_dashboard, name='secure_backup_dashboard'),
     path('api/secure-backup/export/', views.export_secure_backup, name='export_secure_backup'),
+    path('api/secure-backup/verify/', views.verify_secure_backup_api, name='verify_secure_backup'),
     path('api/secure-backup/<int:backup_id>/', views.get_secure_backup_detail, name='get_secure_backup_detail'),
 
     # أدوات الجودة والتحليل
     path('data-quality/', views.data_quality, name='data_quality'),
     path('inventory-insights/', views.inventory_insights, name='inventory_insights'),
 
+    # المهام الخلفية (أمر run_jobs)
+    path('api/jobs/', views.jobs_list, name='jobs_list'),
+    path('api/jobs/<str:kind>/enqueue/', views.jobs_enqueue, name='jobs_enqueue'),
+    path('api/jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('api/jobs/<uuid:job_id>/cancel/', views.job_cancel, name='job_cancel'),
+    path('api/jobs/<uuid:job_id>/download/', views.job_download, name='job_download'),
+
 ]
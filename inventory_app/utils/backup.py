@@ -0,0 +1,284 @@
+"""
+كاتب النسخ الاحتياطي المتدفق: يمر على كل نموذج بدفعات (iterator) ويُخرج البيانات تدريجياً
+بصيغة JSON (متوافقة مع import_backup) أو ملف ZIP يحتوي ملف NDJSON لكل جدول،
+مع بيان (manifest) بالأعداد والتوقيعات (SHA-256) يُحسب في نفس المرور.
+
+النسخ التفاضلية: كل نسخة تحمل علامة مائية (watermark) = آخر معرف في الصندوق الأسود + الوقت،
+والنسخة التفاضلية تصدّر فقط ما أُنشئ أو عُدّل أو حُذف بعد علامة النسخة السابقة.
+معاملة مفتوحة وقت أخذ العلامة قد تُودع لاحقاً سجلات بمعرفات وأوقات أقدم من العلامة، لذلك تعيد
+النسخة التفاضلية أيضاً ما سُجل خلال هامش تداخل (BACKUP_WATERMARK_OVERLAP_SECONDS) قبل العلامة؛
+الاستيراد upsert فالتكرار آمن.
+"""
+import hashlib
+import json
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.db.models import Max, Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import (
+    AuditLog, Container, Location, Order, Product, ProductReturn, SecureBackup, UserActivityLog, UserProfile,
+    Warehouse,
+)
+from .secure_backup import load_checkpoint, save_checkpoint
+from .streaming import ITERATOR_CHUNK_SIZE, buffered, dumps_line
+
+
+BACKUP_VERSION = '2.2'
+BACKUP_STATE_PATH = os.path.join(settings.BASE_DIR, 'logs', 'backup_watermark.json')
+BACKUP_WATERMARK_OVERLAP_SECONDS = 300
+
+
+def _user_profiles():
+    # نستثني ملفات المسؤولين (superuser) لتجنب التكرار عند الاستيراد
+    return UserProfile.objects.exclude(user__is_superuser=True)
+
+
+# الأقسام بترتيب الاعتماديات (المستودعات قبل الأماكن قبل المنتجات ...)
+BACKUP_SECTIONS = [
+    ('warehouses', lambda: Warehouse.objects.all()),
+    ('locations', lambda: Location.objects.all()),
+    ('containers', lambda: Container.objects.all()),
+    ('products', lambda: Product.objects.all()),
+    ('audit_logs', lambda: AuditLog.objects.all()),
+    ('orders', lambda: Order.objects.all()),
+    ('returns', lambda: ProductReturn.objects.all()),
+    ('user_profiles', _user_profiles),
+    ('user_activity_logs', lambda: UserActivityLog.objects.all()),
+]
+
+
+def iter_serialized(queryset, chunk_size=ITERATOR_CHUNK_SIZE):
+    """
+    تسلسل سجلات الاستعلام بصيغة Django serializer ({model, pk, fields}) دفعة بدفعة،
+    بحيث لا يوجد في الذاكرة أكثر من chunk_size كائن في أي لحظة.
+    """
+    batch = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield from serializers.serialize('python', batch)
+            batch = []
+    if batch:
+        yield from serializers.serialize('python', batch)
+
+
+class SectionDigest:
+    """عدّاد وتوقيع SHA-256 لقسم واحد (يُحسب على أسطر NDJSON للسجلات)"""
+
+    def __init__(self):
+        self.count = 0
+        self._sha = hashlib.sha256()
+
+    def update(self, line):
+        self.count += 1
+        self._sha.update(line.encode('utf-8'))
+
+    def as_dict(self):
+        return {'count': self.count, 'sha256': self._sha.hexdigest()}
+
+
+def iter_section_lines(source, digest):
+    """أسطر NDJSON لقسم واحد (استعلام أو سجلات جاهزة) مع تحديث العدّاد والتوقيع"""
+    records = iter_serialized(source) if isinstance(source, QuerySet) else source
+    for record in records:
+        line = dumps_line(record)
+        digest.update(line)
+        yield line
+
+
+def export_info(description=None, **extra):
+    info = {
+        'date': datetime.now().isoformat(),
+        'version': BACKUP_VERSION,
+        'description': description or 'نسخ احتياطي شامل كامل من نظام إدارة المستودع - يشمل جميع البيانات والعمليات والأنشطة',
+    }
+    info.update(extra)
+    return info
+
+
+# ---------- النسخ التفاضلية ----------
+
+# الجداول التي يسجّل الصندوق الأسود إنشاءها وتعديلها وحذفها
+TRACKED_SECTIONS = {
+    'warehouses': Warehouse,
+    'locations': Location,
+    'containers': Container,
+    'products': Product,
+    'orders': Order,
+    'returns': ProductReturn,
+}
+
+
+def current_watermark():
+    """العلامة المائية الحالية: آخر معرف في الصندوق الأسود ووقت أخذ العلامة"""
+    last_id = SecureBackup.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    return {'secure_backup_id': last_id, 'timestamp': timezone.now().isoformat()}
+
+
+def load_watermark(path=None):
+    """علامة آخر نسخة احتياطية مسجلة (أو None إن لم توجد)"""
+    state = load_checkpoint(path or BACKUP_STATE_PATH)
+    return state.get('watermark') if state else None
+
+
+def save_watermark(watermark, backup_type='full', path=None):
+    save_checkpoint(path or BACKUP_STATE_PATH, {'watermark': watermark, 'backup_type': backup_type})
+
+
+def watermark_overlap():
+    return timedelta(seconds=max(0, getattr(
+        settings, 'BACKUP_WATERMARK_OVERLAP_SECONDS', BACKUP_WATERMARK_OVERLAP_SECONDS
+    )))
+
+
+def _changed_ids(model, window):
+    return SecureBackup.objects.filter(
+        window, table_name=model.__name__, action__in=['create', 'update'],
+    ).values('record_id')
+
+
+def differential_sections(since):
+    """
+    أقسام النسخة التفاضلية منذ العلامة since (مع هامش التداخل):
+    - الجداول المتتبعة: السجلات التي لها نسخة إنشاء/تعديل في الصندوق الأسود بعد العلامة
+      (والمنتجات أيضاً حسب updated_at لأن بعض التحديثات تتم عبر update() دون إشارات)
+    - السجلات والملفات الشخصية: حسب وقت الإنشاء (وآخر نشاط للملفات الشخصية)
+    - deleted: السجلات المحذوفة من الجداول المتتبعة بعد العلامة
+    """
+    since_id = since.get('secure_backup_id') or 0
+    since_time = parse_datetime(since['timestamp']) - watermark_overlap()
+    # المعرفات بعد العلامة، أو ما سُجل خلال هامش التداخل (معاملات لم تكن مودعة وقت العلامة)
+    window = Q(id__gt=since_id) | Q(timestamp__gt=since_time)
+
+    def tracked(model, extra=None):
+        condition = Q(pk__in=_changed_ids(model, window))
+        if extra is not None:
+            condition |= extra
+        return lambda: model.objects.filter(condition)
+
+    def deleted():
+        rows = SecureBackup.objects.filter(window, action='delete').order_by('id')
+        labels = {model.__name__: model._meta.label_lower for model in TRACKED_SECTIONS.values()}
+        for table_name, record_id in rows.values_list('table_name', 'record_id').iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            if table_name in labels:
+                yield {'model': labels[table_name], 'pk': record_id}
+
+    return [
+        ('deleted', deleted),
+        ('warehouses', tracked(Warehouse)),
+        ('locations', tracked(Location)),
+        ('containers', tracked(Container)),
+        ('products', tracked(Product, Q(updated_at__gt=since_time))),
+        ('audit_logs', lambda: AuditLog.objects.filter(created_at__gt=since_time)),
+        ('orders', tracked(Order)),
+        ('returns', tracked(ProductReturn)),
+        ('user_profiles', lambda: _user_profiles().filter(
+            Q(created_at__gt=since_time) | Q(last_activity__gt=since_time)
+        )),
+        ('user_activity_logs', lambda: UserActivityLog.objects.filter(created_at__gt=since_time)),
+    ]
+
+
+def backup_plan(differential=False, since=None):
+    """
+    تجهيز أقسام النسخة ومعلوماتها: (sections, info, watermark).
+    تُؤخذ العلامة قبل قراءة البيانات، فأي تغيير أثناء التصدير يظهر أيضاً في النسخة التالية
+    (والاستيراد upsert لذا التكرار آمن).
+    """
+    watermark = current_watermark()
+    if differential:
+        since = since or load_watermark()
+        if not since:
+            raise ValueError('لا توجد نسخة سابقة لبناء نسخة تفاضلية عليها، يجب أخذ نسخة كاملة أولاً')
+        info = export_info(
+            description='نسخ احتياطي تفاضلي - التغييرات منذ النسخة السابقة',
+            backup_type='differential', base_watermark=since, watermark=watermark,
+        )
+        return differential_sections(since), info, watermark
+    return BACKUP_SECTIONS, export_info(backup_type='full', watermark=watermark), watermark
+
+
+def record_on_completion(stream, watermark, backup_type='full', path=None):
+    """تمرير التدفق كما هو، وتسجيل العلامة كعلامة آخر نسخة فقط بعد اكتمال كتابة النسخة"""
+    yield from stream
+    save_watermark(watermark, backup_type, path)
+
+
+def _backup_stats(manifest):
+    return {f'{name}_count': entry['count'] for name, entry in manifest.items()}
+
+
+def stream_json_backup(sections=None, info=None):
+    """
+    نسخة احتياطية بصيغة JSON واحدة تُكتب تدريجياً:
+    {"export_info": ..., "<section>": [...], ..., "backup_stats": ..., "manifest": ...}
+    يُكتب كل سجل في سطر مستقل، والبيان في النهاية بعد اكتمال المرور.
+    """
+    sections = sections if sections is not None else BACKUP_SECTIONS
+    manifest = {}
+    yield '{"export_info": ' + json.dumps(info or export_info(), ensure_ascii=False)
+    for name, queryset_factory in sections:
+        digest = SectionDigest()
+        yield f',\n"{name}": [\n'
+        first = True
+        for line in iter_section_lines(queryset_factory(), digest):
+            if not first:
+                yield ',\n'
+            first = False
+            yield line[:-1]
+        yield '\n]'
+        manifest[name] = digest.as_dict()
+    yield ',\n"backup_stats": ' + json.dumps(_backup_stats(manifest))
+    yield ',\n"manifest": ' + json.dumps(manifest) + '}\n'
+
+
+class _ZipStreamBuffer:
+    """ملف وهمي غير قابل للتقديم (non-seekable) يجمع ما يكتبه zipfile لإرساله فوراً"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b''.join(chunks)
+
+
+def stream_zip_backup(sections=None, info=None):
+    """
+    نسخة احتياطية بصيغة ZIP: ملف <section>.ndjson لكل قسم و manifest.json في النهاية.
+    zipfile يكتب على مخزن غير قابل للتقديم لذلك تُرسل البيانات أثناء الكتابة.
+    """
+    sections = sections if sections is not None else BACKUP_SECTIONS
+    manifest = {}
+    sink = _ZipStreamBuffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, queryset_factory in sections:
+            digest = SectionDigest()
+            with zf.open(f'{name}.ndjson', mode='w', force_zip64=True) as member:
+                for chunk in buffered(iter_section_lines(queryset_factory(), digest)):
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            manifest[name] = digest.as_dict()
+            yield sink.drain()
+        zf.writestr('manifest.json', json.dumps({
+            'export_info': info or export_info(),
+            'format': 'zip-ndjson',
+            'backup_stats': _backup_stats(manifest),
+            'manifest': manifest,
+        }, ensure_ascii=False, indent=2))
+    yield sink.drain()
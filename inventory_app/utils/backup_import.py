@@ -0,0 +1,419 @@
+"""
+محرك استيراد النسخ الاحتياطي بالجملة (bulk upsert).
+يحل المراجع (Foreign Keys) والتكرارات باستعلامات مجمّعة لكل دفعة، ثم يكتب كل دفعة
+عبر bulk_create مع update_conflicts بدلاً من save() لكل سجل، ويكتب سجلات الصندوق الأسود دفعة واحدة.
+"""
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, models, transaction
+
+from ..models import (
+    AuditLog, Container, Location, Order, OrderDailyStat, OrderLine, OrderRecipientStat, Product, ProductReturn,
+    UserActivityLog, UserProfile, Warehouse,
+)
+from ..signals import create_secure_backups_bulk
+from .backup_parser import load_backup
+from .order_lines import sync_order_lines
+from .order_stats import rebuild_order_stats
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+# ترتيب الاستيراد حسب العلاقات
+SECTION_MODELS = {
+    'warehouses': Warehouse,
+    'locations': Location,
+    'containers': Container,
+    'products': Product,
+    'user_profiles': UserProfile,
+    'audit_logs': AuditLog,
+    'orders': Order,
+    'returns': ProductReturn,
+    'user_activity_logs': UserActivityLog,
+}
+IMPORT_ORDER = list(SECTION_MODELS.keys())
+MODEL_SECTIONS = {model._meta.label_lower: section for section, model in SECTION_MODELS.items()}
+
+# المستخدم المسؤول المحمي من التعديل أثناء الاستيراد
+PROTECTED_USERNAME = 'ammar'
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def reset_sequences(model_list):
+    """إعادة ضبط تسلسل المعرفات بعد إدراج سجلات بمعرفات صريحة (PostgreSQL)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), model_list)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def clear_sections(sections):
+    """تفريغ جداول الأقسام بسرعة (TRUNCATE في PostgreSQL) مع حماية ملفات المسؤولين"""
+    tables = [
+        SECTION_MODELS[s]._meta.db_table for s in reversed(IMPORT_ORDER)
+        if s in sections and s != 'user_profiles'
+    ]
+    if 'orders' in sections:
+        # أسطر الطلبيات تشير إلى الطلبيات فتُفرغ معها (وقبلها)
+        tables.insert(tables.index(Order._meta.db_table), OrderLine._meta.db_table)
+        tables += [OrderDailyStat._meta.db_table, OrderRecipientStat._meta.db_table]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sql_flush(no_style(), tables):
+            cursor.execute(sql)
+    if 'user_profiles' in sections:
+        UserProfile.objects.exclude(user__username=PROTECTED_USERNAME).exclude(user__is_superuser=True).delete()
+
+
+class BackupImporter:
+    """
+    استيراد أقسام النسخة الاحتياطية على دفعات.
+    counts: عدد السجلات المستوردة لكل قسم، errors: رسائل الأخطاء بصيغة "section[index]: message".
+    """
+
+    def __init__(self, avoid_duplicates=False, chunk_size=IMPORT_CHUNK_SIZE, record_history=True):
+        self.avoid_duplicates = avoid_duplicates
+        self.chunk_size = chunk_size
+        self.record_history = record_history
+        self.counts = {}
+        self.errors = []
+        self._touched_models = set()
+        self._system_user = None
+
+    # ---------- أدوات مساعدة ----------
+
+    def system_user(self):
+        if self._system_user is None:
+            self._system_user, _ = User.objects.get_or_create(
+                username='system', defaults={'email': 'system@local', 'is_active': False}
+            )
+        return self._system_user
+
+    def _deserialize(self, section, offset, records):
+        """تحويل السجلات إلى كائنات غير محفوظة مع الاحتفاظ بفهرس كل سجل لرسائل الأخطاء"""
+        instances = []
+        for idx, record in enumerate(records, start=offset):
+            try:
+                for obj in serializers.deserialize('python', [record], ignorenonexistent=True):
+                    instances.append((idx, obj.object))
+            except Exception as e:
+                self.errors.append(f'{section}[{idx}]: {str(e)}')
+        return instances
+
+    def _resolve_foreign_keys(self, section, instances):
+        """
+        التحقق من وجود كل المراجع باستعلام واحد لكل علاقة:
+        المرجع المفقود يُفرغ إن كان الحقل يقبل NULL، وإلا يُستبعد السجل مع خطأ.
+        """
+        model = SECTION_MODELS[section]
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.ForeignKey):
+                continue
+            wanted = {getattr(obj, field.attname) for _, obj in instances} - {None}
+            if not wanted:
+                continue
+            existing = set(
+                field.related_model._base_manager.filter(pk__in=wanted).values_list('pk', flat=True)
+            )
+            missing = wanted - existing
+            if not missing:
+                continue
+            kept = []
+            for idx, obj in instances:
+                if getattr(obj, field.attname) in missing:
+                    if field.null:
+                        setattr(obj, field.attname, None)
+                    else:
+                        self.errors.append(
+                            f'{section}[{idx}]: المرجع {field.name}={getattr(obj, field.attname)} غير موجود'
+                        )
+                        continue
+                kept.append((idx, obj))
+            instances = kept
+        return instances
+
+    # ---------- معالجة خاصة لكل قسم ----------
+
+    def _prepare_products(self, instances):
+        if not self.avoid_duplicates:
+            return instances
+        numbers = {obj.product_number for _, obj in instances if obj.product_number}
+        existing = dict(
+            Product.objects.filter(product_number__in=numbers).values_list('product_number', 'pk')
+        )
+        for _, obj in instances:
+            if obj.product_number in existing:
+                obj.pk = existing[obj.product_number]
+        return instances
+
+    def _prepare_user_profiles(self, instances):
+        instances = [(idx, obj) for idx, obj in instances if obj.user_id]
+        user_ids = {obj.user_id for _, obj in instances if obj.user_id}
+        usernames = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'username'))
+        missing = user_ids - set(usernames)
+        if missing:
+            # إنشاء مستخدمين غير مفعّلين للحفاظ على تكامل البيانات
+            taken = set(
+                User.objects.filter(username__in=[f'imported_user_{uid}' for uid in missing])
+                .values_list('username', flat=True)
+            )
+            new_users = [
+                User(pk=uid, username=f'imported_user_{uid}', is_active=False)
+                for uid in missing if f'imported_user_{uid}' not in taken
+            ]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(new_users)
+                usernames.update({u.pk: u.username for u in new_users})
+                self._touched_models.add(User)
+            except DatabaseError:
+                pass
+            for _, obj in instances:
+                if obj.user_id not in usernames:
+                    # إذا تعذر إنشاء المستخدم بنفس المعرف نستخدم مستخدم النظام
+                    obj.user_id = self.system_user().pk
+        # حماية: لا نعدّل ملف المسؤول المحمي بمعلومات قديمة من النسخة الاحتياطية
+        return [(idx, obj) for idx, obj in instances if usernames.get(obj.user_id) != PROTECTED_USERNAME]
+
+    def _after_orders(self, objs):
+        # الكتابة المجمّعة لا تمر بـ confirm_products: أسطر الطلبيات تُبنى من products_data المستوردة
+        sync_order_lines(objs)
+
+    def _prepare_user_activity_logs(self, instances):
+        user_ids = {obj.user_id for _, obj in instances if obj.user_id}
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        for _, obj in instances:
+            if obj.user_id not in existing:
+                # ربط السجل بمستخدم النظام بدلاً من المستخدم المفقود
+                obj.user_id = self.system_user().pk
+        return instances
+
+    # ---------- الكتابة ----------
+
+    def _write_chunk(self, section, instances):
+        model = SECTION_MODELS[section]
+        # عند تكرار نفس المعرف داخل الدفعة يُعتمد آخر ظهور (كما في الحفظ المتسلسل)
+        by_pk = {}
+        without_pk = []
+        for idx, obj in instances:
+            if obj.pk is None:
+                without_pk.append(obj)
+            else:
+                by_pk[obj.pk] = obj
+        objs = list(by_pk.values()) + without_pk
+        existing_pks = set(model._base_manager.filter(pk__in=list(by_pk)).values_list('pk', flat=True))
+
+        # bulk_create يستبدل حقول auto_now بالوقت الحالي؛ نحتفظ بالقيم الأصلية لإرجاعها
+        auto_fields = [
+            f for f in model._meta.concrete_fields
+            if isinstance(f, models.DateField) and (f.auto_now or f.auto_now_add)
+        ]
+        original_times = {id(obj): [getattr(obj, f.attname) for f in auto_fields] for obj in objs}
+        update_fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=['pk'],
+                    update_fields=update_fields,
+                )
+                restore = []
+                for obj in objs:
+                    values = original_times[id(obj)]
+                    if obj.pk is not None and any(v is not None for v in values):
+                        for f, value in zip(auto_fields, values):
+                            if value is not None:
+                                setattr(obj, f.attname, value)
+                        restore.append(obj)
+                if restore and auto_fields:
+                    model.objects.bulk_update(restore, [f.name for f in auto_fields], batch_size=self.chunk_size)
+        except DatabaseError:
+            # تعارض في قيد فريد آخر (مثل رقم المنتج): نعود للحفظ سجلاً بسجل لتحديد السجل المسبب
+            return self._write_one_by_one(section, instances)
+
+        self._touched_models.add(model)
+        self._after_write(section, objs)
+        if self.record_history:
+            create_secure_backups_bulk(objs, lambda obj: 'update' if obj.pk in existing_pks else 'create')
+        return len(instances)
+
+    def _write_one_by_one(self, section, instances):
+        model = SECTION_MODELS[section]
+        written = []
+        for idx, obj in instances:
+            try:
+                with transaction.atomic():
+                    # raw=True يحافظ على القيم كما هي (مثل created_at) كما يفعل loaddata
+                    models.Model.save_base(obj, raw=True)
+                written.append(obj)
+            except Exception as e:
+                self.errors.append(f'{section}[{idx}]: {str(e)}')
+        if written:
+            self._touched_models.add(model)
+        return len(written)
+
+    def _after_write(self, section, objs):
+        after = getattr(self, f'_after_{section}', None)
+        if after:
+            after(objs)
+
+    # ---------- الواجهة العامة ----------
+
+    def import_section(self, section, records):
+        """استيراد قسم كامل على دفعات"""
+        if section not in SECTION_MODELS or not isinstance(records, list):
+            return 0
+        self.counts.setdefault(section, 0)
+        prepare = getattr(self, f'_prepare_{section}', None)
+        for offset, chunk in chunked(records, self.chunk_size):
+            instances = self._deserialize(section, offset, chunk)
+            if prepare:
+                instances = prepare(instances)
+            instances = self._resolve_foreign_keys(section, instances)
+            if instances:
+                self.counts[section] += self._write_chunk(section, instances)
+        return self.counts[section]
+
+    def apply_deletions(self, records):
+        """
+        تطبيق قسم deleted من نسخة تفاضلية ({model, pk}) بحذف مجمّع لكل جدول،
+        من الأبناء إلى الآباء. يجب تطبيقه قبل الأقسام لأن المعرف قد يُعاد استخدامه بعد الحذف.
+        """
+        by_section = {}
+        for idx, record in enumerate(records or []):
+            section = MODEL_SECTIONS.get(record.get('model')) if isinstance(record, dict) else None
+            if section is None or record.get('pk') is None:
+                self.errors.append(f'deleted[{idx}]: سجل حذف غير صالح')
+                continue
+            by_section.setdefault(section, set()).add(record['pk'])
+        self.counts.setdefault('deleted', 0)
+        for section in reversed(IMPORT_ORDER):
+            pks = list(by_section.get(section, ()))
+            for _, chunk in chunked(pks, self.chunk_size):
+                deleted, _ = SECTION_MODELS[section].objects.filter(pk__in=chunk).delete()
+                self.counts['deleted'] += deleted
+        return self.counts['deleted']
+
+    def finish(self):
+        """إعادة ضبط تسلسل المعرفات للجداول التي تم الاستيراد إليها، وإعادة بناء إحصائيات الطلبيات"""
+        if self._touched_models:
+            reset_sequences(list(self._touched_models))
+        if Order in self._touched_models:
+            rebuild_order_stats()
+
+
+def import_backup_payload(data, selected_sections=None, clear_existing=False, avoid_duplicates=False, progress=None):
+    """
+    استيراد نسخة احتياطية محمّلة (قاموس أقسام أو مصفوفة سجلات) بنفس قواعد واجهة الاستيراد:
+    التحقق من البنية، إضافة الأقسام المعتمد عليها، التفريغ الاختياري، ثم الاستيراد في معاملة واحدة.
+    progress(done, total, message) اختياري (للمهام الخلفية). يعيد قاموس استجابة JSON.
+    """
+    # قسم المحذوفات في النسخ التفاضلية ليس سجلات كاملة، يُطبق قبل الأقسام
+    deletions = data.pop('deleted', None) if isinstance(data, dict) else None
+    if isinstance(data, list):
+        grouped = {}
+        for item in data:
+            if isinstance(item, dict):
+                section = MODEL_SECTIONS.get(item.get('model') or '')
+                if section:
+                    grouped.setdefault(section, []).append(item)
+        data = {'export_info': {'description': 'array_payload_transformed'}, **grouped}
+
+    # إذا لم تُحدّد أقسام، نستخدم الافتراضي: كل ما هو موجود في الملف
+    selected_sections = set(selected_sections or ()) or {k for k, v in data.items() if isinstance(v, list)}
+
+    # تحقق بنية الأقسام قبل الاستيراد
+    schema_errors = []
+    for section in selected_sections:
+        if section in data:
+            if not isinstance(data[section], list):
+                schema_errors.append(f"القسم '{section}' يجب أن يكون مصفوفة")
+                continue
+            for idx, item in enumerate(data[section]):
+                if not isinstance(item, dict):
+                    schema_errors.append(f"{section}[{idx}]: العنصر ليس كائناً JSON")
+                    break
+                for k in ['model', 'pk', 'fields']:
+                    if k not in item:
+                        schema_errors.append(f"{section}[{idx}]: المكوّن '{k}' مفقود")
+                        break
+    if schema_errors:
+        return {'success': False, 'error': 'أخطاء في بنية الملف', 'details': schema_errors}
+
+    # إضافة التبعيات اللازمة تلقائياً لتجنب أخطاء المراجع
+    # المنتجات تحتاج الأماكن والمستودعات، والأماكن تحتاج مستودعات، والسجلات تحتاج المنتجات
+    if 'products' in selected_sections:
+        selected_sections.update(['locations', 'warehouses'])
+    if 'locations' in selected_sections:
+        selected_sections.add('warehouses')
+    if 'audit_logs' in selected_sections:
+        selected_sections.update(['products', 'locations', 'warehouses'])
+
+    import_counts = {s: 0 for s in selected_sections}
+    importer = BackupImporter(avoid_duplicates=avoid_duplicates)
+    sections = [s for s in IMPORT_ORDER if s in selected_sections and s in data]
+    with transaction.atomic():
+        if clear_existing:
+            # حذف بحسب الأقسام المختارة، مع مراعاة العلاقات (مع حماية الحساب المسؤول)
+            for section in reversed(IMPORT_ORDER):
+                if section not in selected_sections:
+                    continue
+                if section == 'user_profiles':
+                    UserProfile.objects.exclude(user__username=PROTECTED_USERNAME).exclude(user__is_superuser=True).delete()
+                elif section != 'containers':
+                    SECTION_MODELS[section].objects.all().delete()
+
+        if deletions:
+            importer.apply_deletions(deletions)
+        # استيراد البيانات بالترتيب الصحيح (حسب العلاقات) على دفعات bulk
+        for done, section in enumerate(sections):
+            if progress:
+                progress(done, len(sections), f'استيراد {section}')
+            importer.import_section(section, data[section])
+        importer.finish()
+
+    import_counts.update(importer.counts)
+    if importer.errors:
+        return {
+            'success': False,
+            'error': 'حدثت أخطاء أثناء الاستيراد',
+            'details': importer.errors[:50],
+            'imported': import_counts,
+        }
+    return {'success': True, 'message': 'تم الاستيراد بنجاح', 'imported': import_counts}
+
+
+def load_backup_file(path):
+    """
+    قراءة ملف نسخة احتياطية من القرص: JSON أو JSON مضغوط (.gz) أو ZIP بصيغة NDJSON لكل قسم.
+    يعيد قاموساً بنفس بنية JSON (export_info + الأقسام).
+    """
+    with open(path, 'rb') as f:
+        return load_backup(f, path)[0]
+
+
+def check_backup_chain(infos):
+    """
+    التحقق من تسلسل سلسلة النسخ: الأولى كاملة، وكل نسخة تفاضلية مبنية على علامة النسخة التي قبلها.
+    يعيد قائمة رسائل الأخطاء (فارغة إذا كانت السلسلة سليمة).
+    """
+    errors = []
+    previous = None
+    for position, info in enumerate(infos):
+        backup_type = info.get('backup_type', 'full')
+        if position == 0:
+            if backup_type != 'full':
+                errors.append('يجب أن تبدأ السلسلة بنسخة كاملة')
+        elif backup_type != 'differential':
+            errors.append(f'النسخة رقم {position + 1} ليست تفاضلية')
+        elif not previous or (info.get('base_watermark') or {}).get('secure_backup_id') != previous.get('secure_backup_id'):
+            errors.append(f'النسخة رقم {position + 1} غير مبنية على النسخة التي قبلها')
+        previous = info.get('watermark')
+    return errors
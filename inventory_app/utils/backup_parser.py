@@ -0,0 +1,456 @@
+"""
+قارئ النسخ الاحتياطية المتدفق (Streaming) بذاكرة ثابتة تقريباً.
+يكتشف الترميز مرة واحدة من بداية الملف، ثم يقرأ JSON قسماً قسماً وسجلاً سجلاً
+(وكذلك ملفات ZIP وأعضاء NDJSON وملفات gzip) دون تحميل الملف كاملاً في الذاكرة.
+
+الأحداث الناتجة من iter_backup_events على شكل (kind, section, value):
+- ('info', key, value): قيمة عليا ليست مصفوفة (مثل export_info)
+- ('section', name, None): بداية قسم
+- ('record', name, item): سجل داخل القسم (name = None إذا كان الملف مصفوفة سجلات مباشرة)
+"""
+import codecs
+import gzip
+import io
+import json
+import os
+import zipfile
+from collections import Counter
+
+from ..models import Product
+
+
+READ_CHUNK_BYTES = 64 * 1024
+# الملفات الأصغر من هذا الحد يمكن إعادة قراءتها بالمحلل المتسامح (تعليقات، فواصل زائدة...)
+LEGACY_PARSE_MAX_BYTES = 25 * 1024 * 1024
+DUPLICATE_CHECK_BATCH = 1000
+
+RECORD_KEYS = ('model', 'pk', 'fields')
+# قسم المحذوفات في النسخ التفاضلية لا يحتوي حقولاً
+DELETED_KEYS = ('model', 'pk')
+
+_decoder = json.JSONDecoder()
+
+
+class BackupParseError(ValueError):
+    pass
+
+
+def detect_encoding(prefix):
+    """اكتشاف الترميز من بداية الملف: علامة BOM ثم نمط البايتات الصفرية ثم UTF-8 وإلا cp1256"""
+    boms = (
+        (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+    )
+    for bom, encoding in boms:
+        if prefix.startswith(bom):
+            return encoding
+    if len(prefix) >= 4:
+        if prefix[1:4] == b'\x00\x00\x00':
+            return 'utf-32-le'
+        if prefix[:3] == b'\x00\x00\x00':
+            return 'utf-32-be'
+    if len(prefix) >= 2:
+        if prefix[1:2] == b'\x00':
+            return 'utf-16-le'
+        if prefix[:1] == b'\x00':
+            return 'utf-16-be'
+    try:
+        # final=False حتى لا يُعتبر حرف مقطوع في نهاية المقطع خطأ
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1256'
+
+
+def _iter_text(stream, meta, chunk_size=READ_CHUNK_BYTES):
+    """فك ترميز التدفق الثنائي تدريجياً بعد اكتشاف الترميز من أول مقطع"""
+    prefix = stream.read(chunk_size)
+    encoding = detect_encoding(prefix)
+    meta['encoding'] = encoding
+    decoder = codecs.getincrementaldecoder(encoding)('strict')
+    data = prefix
+    try:
+        while data:
+            text = decoder.decode(data)
+            if text:
+                yield text
+            data = stream.read(chunk_size)
+        tail = decoder.decode(b'', final=True)
+    except UnicodeDecodeError as e:
+        raise BackupParseError(f'ترميز غير صالح ({encoding}): {e}') from e
+    if tail:
+        yield tail
+
+
+class _TextScanner:
+    """مؤشر على نص متدفق: يتخطى المسافات والتعليقات ويفك قيمة JSON كاملة واحدة في كل مرة"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_chars=0):
+        if self.eof:
+            return False
+        if self.pos > READ_CHUNK_BYTES:
+            # التخلص مما تمت قراءته للحفاظ على ثبات الذاكرة
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        added = []
+        size = 0
+        for text in self._chunks:
+            added.append(text)
+            size += len(text)
+            if size >= min_chars:
+                break
+        if not added:
+            self.eof = True
+            return False
+        self.buf += ''.join(added)
+        return True
+
+    def peek(self):
+        """أول حرف مهم تالٍ (أو '' عند نهاية الملف)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n\ufeff':
+                self.pos += 1
+            if self.pos >= len(self.buf):
+                if not self._fill():
+                    return ''
+                continue
+            if self.buf[self.pos] != '/':
+                return self.buf[self.pos]
+            if self.pos + 1 >= len(self.buf) and self._fill():
+                continue
+            # تعليقات // و /* */ بين العناصر (كما يسمح المحلل المتسامح)
+            marker = self.buf[self.pos + 1:self.pos + 2]
+            if marker == '/':
+                terminator = '\n'
+            elif marker == '*':
+                terminator = '*/'
+            else:
+                return '/'
+            end = self.buf.find(terminator, self.pos + 2)
+            if end == -1:
+                if not self._fill():
+                    self.pos = len(self.buf)
+                continue
+            self.pos = end + len(terminator)
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise BackupParseError(f"متوقع '{char}' ووجد '{found or 'نهاية الملف'}'")
+        self.pos += 1
+
+    def value(self):
+        """فك قيمة JSON واحدة؛ يقرأ المزيد عند الحاجة (القيمة لا تُقبل إذا انتهت عند حد المخزن)"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise BackupParseError(f'JSON غير صالح: {e.msg}') from e
+            self._fill(max(READ_CHUNK_BYTES, len(self.buf) - self.pos))
+
+
+def _iter_array(scanner, section):
+    scanner.expect('[')
+    while True:
+        if scanner.peek() == ']':
+            scanner.pos += 1
+            return
+        yield ('record', section, scanner.value())
+        found = scanner.peek()
+        if found == ',':
+            scanner.pos += 1
+        elif found != ']':
+            raise BackupParseError(f"متوقع ',' أو ']' في القسم {section or ''}")
+
+
+def _iter_json_events(chunks):
+    scanner = _TextScanner(chunks)
+    first = scanner.peek()
+    if first == '[':
+        yield from _iter_array(scanner, None)
+        return
+    if first != '{':
+        raise BackupParseError('الملف لا يبدأ بكائن أو مصفوفة JSON')
+    scanner.pos += 1
+    while True:
+        if scanner.peek() == '}':
+            scanner.pos += 1
+            return
+        key = scanner.value()
+        if not isinstance(key, str):
+            raise BackupParseError('مفتاح غير صالح في الملف')
+        scanner.expect(':')
+        if scanner.peek() == '[':
+            yield ('section', key, None)
+            yield from _iter_array(scanner, key)
+        else:
+            yield ('info', key, scanner.value())
+        found = scanner.peek()
+        if found == ',':
+            scanner.pos += 1
+        elif found != '}':
+            raise BackupParseError(f"متوقع ',' أو '}}' بعد القسم {key}")
+
+
+def _iter_ndjson(chunks, section):
+    pending = ''
+    for text in chunks:
+        lines = (pending + text).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield ('record', section, _loads_line(line))
+    if pending.strip():
+        yield ('record', section, _loads_line(pending))
+
+
+def _loads_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise BackupParseError(f'سطر NDJSON غير صالح: {e}') from e
+
+
+def _open_binary(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def iter_backup_events(source, filename='', meta=None):
+    """
+    أحداث الملف (انظر أعلى الملف). source: bytes أو ملف ثنائي قابل للتقديم (مثل UploadedFile).
+    يُملأ meta بمصدر الملف والترميز المكتشف.
+    """
+    meta = meta if meta is not None else {}
+    meta.update({'source': 'raw', 'encoding': None, 'fixes': [], 'streaming': True})
+    stream = _open_binary(source)
+    head = stream.read(4)
+    stream.seek(0)
+
+    if head.startswith(b'PK') or (filename or '').lower().endswith('.zip'):
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile as e:
+            raise BackupParseError(f'ملف ZIP غير صالح: {e}') from e
+        with archive:
+            names = archive.namelist()
+            ndjson_members = [n for n in names if n.lower().endswith('.ndjson')]
+            if ndjson_members:
+                # صيغة export_backup?format=zip: ملف NDJSON لكل قسم + manifest.json
+                meta['source'] = 'zip-ndjson'
+                if 'manifest.json' in names:
+                    manifest = json.loads(archive.read('manifest.json'))
+                    yield ('info', 'export_info', manifest.get('export_info', {}))
+                for name in ndjson_members:
+                    section = os.path.basename(name)[:-len('.ndjson')]
+                    yield ('section', section, None)
+                    with archive.open(name) as member:
+                        yield from _iter_ndjson(_iter_text(member, meta), section)
+                return
+            json_members = [n for n in names if n.lower().endswith('.json')]
+            if not json_members:
+                raise BackupParseError('لا يوجد ملف JSON داخل ملف ZIP')
+            meta['source'] = 'zip'
+            with archive.open(json_members[0]) as member:
+                yield from _iter_json_events(_iter_text(member, meta))
+            return
+
+    if head.startswith(b'\x1f\x8b'):
+        meta['source'] = 'gzip'
+        stream = gzip.GzipFile(fileobj=stream)
+    try:
+        yield from _iter_json_events(_iter_text(stream, meta))
+    except (OSError, EOFError) as e:
+        # ملف gzip تالف
+        raise BackupParseError(str(e)) from e
+
+
+def events_from_data(data):
+    """تحويل بيانات محمّلة مسبقاً (من المحلل المتسامح) إلى نفس أحداث القراءة المتدفقة"""
+    if isinstance(data, list):
+        for item in data:
+            yield ('record', None, item)
+        return
+    for key, value in data.items():
+        if isinstance(value, list):
+            yield ('section', key, None)
+            for item in value:
+                yield ('record', key, item)
+        else:
+            yield ('info', key, value)
+
+
+def load_backup(source, filename=''):
+    """قراءة الملف كاملاً إلى dict (أو list للملفات التي هي مصفوفة سجلات) مع معلومات القراءة"""
+    meta = {}
+    data = {}
+    for kind, section, value in iter_backup_events(source, filename, meta):
+        if kind == 'info':
+            data[section] = value
+        elif kind == 'section':
+            data[section] = []
+        elif section is None:
+            if not isinstance(data, list):
+                data = []
+            data.append(value)
+        else:
+            data[section].append(value)
+    return data, meta
+
+
+def read_export_info(source, filename=''):
+    """قراءة export_info فقط (يتوقف عند أول قسم دون قراءة بقية الملف)"""
+    for kind, key, value in iter_backup_events(source, filename):
+        if kind != 'info':
+            break
+        if key == 'export_info' and isinstance(value, dict):
+            return value
+    return {}
+
+
+def read_limited(source, limit=LEGACY_PARSE_MAX_BYTES):
+    """قراءة المصدر كاملاً فقط إذا لم يتجاوز الحد (للمحلل المتسامح)، وإلا None"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source) if len(source) <= limit else None
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    if size > limit:
+        return None
+    source.seek(0)
+    return source.read()
+
+
+def section_for_model(model_label):
+    """اسم القسم المقابل لنموذج Django (للملفات التي هي مصفوفة سجلات)"""
+    name = (model_label or '').split('.')[-1]
+    if not name:
+        return None
+    return {
+        'userprofile': 'user_profiles',
+        'useractivitylog': 'user_activity_logs',
+        'auditlog': 'audit_logs',
+    }.get(name, name + 's')
+
+
+class BackupInspector:
+    """
+    تحليل الملف أثناء قراءته: العدد والنماذج وأخطاء البنية وعينة لكل قسم،
+    وأرقام المنتجات المكررة (داخل الملف أو الموجودة مسبقاً) بفحص قاعدة البيانات على دفعات.
+    """
+
+    MAX_ERRORS_PER_SECTION = 100
+    SAMPLE_SIZE = 3
+
+    def __init__(self):
+        self.export_info = {}
+        self.sections = {}
+        self._list_payload = False
+        self._product_numbers = Counter()
+        self._pending_numbers = []
+        self._existing_names = {}
+
+    def feed(self, kind, section, value):
+        if kind == 'info':
+            if section == 'export_info' and isinstance(value, dict):
+                self.export_info = value
+        elif kind == 'section':
+            self._section(section)
+        elif section is None:
+            self._list_payload = True
+            section = section_for_model(value.get('model') if isinstance(value, dict) else None)
+            if section:
+                self._record(section, value)
+        else:
+            self._record(section, value)
+
+    def _section(self, name):
+        if name not in self.sections:
+            self.sections[name] = {
+                'name': name, 'count': 0, 'models': {}, 'schema_ok': True, 'errors': [], 'sample': [],
+            }
+        return self.sections[name]
+
+    def _error(self, info, message):
+        info['schema_ok'] = False
+        if len(info['errors']) < self.MAX_ERRORS_PER_SECTION:
+            info['errors'].append(message)
+
+    def _record(self, section, item):
+        info = self._section(section)
+        idx = info['count']
+        info['count'] += 1
+        if idx < self.SAMPLE_SIZE:
+            info['sample'].append(item)
+        if not isinstance(item, dict):
+            self._error(info, f'{section}[{idx}]: العنصر ليس كائناً JSON')
+            return
+        for req in (DELETED_KEYS if section == 'deleted' else RECORD_KEYS):
+            if req not in item:
+                self._error(info, f"{section}[{idx}]: المكوّن '{req}' مفقود")
+                break
+        model = item.get('model')
+        if isinstance(model, str):
+            info['models'][model] = info['models'].get(model, 0) + 1
+        if section == 'products' and isinstance(item.get('fields'), dict):
+            product_number = item['fields'].get('product_number')
+            if product_number:
+                self._note_product_number(product_number)
+
+    def _note_product_number(self, product_number):
+        self._product_numbers[product_number] += 1
+        if self._product_numbers[product_number] == 1:
+            self._pending_numbers.append(product_number)
+            if len(self._pending_numbers) >= DUPLICATE_CHECK_BATCH:
+                self._check_existing()
+
+    def _check_existing(self):
+        if self._pending_numbers:
+            self._existing_names.update(
+                Product.objects.filter(product_number__in=self._pending_numbers).values_list('product_number', 'name')
+            )
+            self._pending_numbers = []
+
+    def product_duplicates(self):
+        self._check_existing()
+        return [
+            {
+                'product_number': pn,
+                'count_in_backup': count,
+                'existing': pn in self._existing_names,
+                'existing_name': self._existing_names.get(pn),
+            }
+            for pn, count in self._product_numbers.items()
+            if pn in self._existing_names or count > 1
+        ]
+
+    def report(self):
+        export_info = self.export_info
+        if self._list_payload and not export_info:
+            export_info = {'description': 'array_payload_transformed'}
+        sections = list(self.sections.values())
+        schema_errors = [error for info in sections for error in info['errors']]
+        try:
+            product_duplicates = self.product_duplicates()
+        except Exception:
+            product_duplicates = []
+        return {
+            'export_info': export_info,
+            'sections': sections,
+            'schema_errors': schema_errors,
+            'product_duplicates': product_duplicates,
+        }
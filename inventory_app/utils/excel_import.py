@@ -0,0 +1,263 @@
+"""
+محرك إضافة منتجات Excel بالجملة.
+لكل دفعة من الصفوف: تُحل المواقع والمنتجات الموجودة باستعلامات مجمّعة، ويُطبق قرار التعارض
+(skip / update / replace) في الذاكرة، ثم تُكتب الدفعة عبر bulk_create / bulk_update مع سجلات
+الصندوق الأسود وسجل العمليات (AuditLog) دفعة واحدة. كل دفعة في معاملة قصيرة مستقلة.
+"""
+import re
+
+from django.db import DatabaseError, transaction
+
+from ..models import AuditLog, Location, Product, Warehouse
+from ..signals import create_secure_backups_bulk
+from .sheet_frame import frame_records, invalid_mask, iter_mapped_frames, parse_mapped_rows
+
+
+EXCEL_IMPORT_CHUNK_SIZE = 1000
+CONFLICT_RESOLUTIONS = ('skip', 'update', 'replace')
+PRODUCT_UPDATE_FIELDS = ['quantity', 'location', 'name', 'category', 'updated_at']
+
+
+def parse_location_code(value):
+    """
+    تحليل نص الموقع: ('grid', صف, عمود) لصيغ مثل R1C5 أو R1-C5 أو R1 C5،
+    أو ('id', معرف) إن كانت القيمة رقمية فقط، أو None.
+    """
+    if not value:
+        return None
+    s = str(value).strip().upper().replace('-', ' ').replace('_', ' ')
+    s = re.sub(r'\s+', '', s)
+    match = re.match(r'R(\d+)C(\d+)', s)
+    if match:
+        return ('grid', int(match.group(1)), int(match.group(2)))
+    if s.isdigit():
+        return ('id', int(s))
+    return None
+
+
+class ExcelImporter:
+    """
+    إضافة صفوف Excel (بعد التحليل) إلى المنتجات على دفعات.
+    results بنفس صيغة استجابة process_excel_data: added / updated / skipped / errors.
+    """
+
+    def __init__(self, conflict_resolution='skip', user='', chunk_size=EXCEL_IMPORT_CHUNK_SIZE):
+        self.conflict_resolution = conflict_resolution if conflict_resolution in CONFLICT_RESOLUTIONS else 'skip'
+        self.user = user
+        self.chunk_size = chunk_size
+        self.results = {'added': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+        self._locations = {}
+        self._warehouse = None
+        self._warehouse_loaded = False
+
+    def reject(self, row_idx, message, skipped=False):
+        self.results['errors'].append(f'الصف {row_idx}: {message}')
+        if skipped:
+            self.results['skipped'] += 1
+
+    def run(self, items):
+        """items: (رقم الصف، قاموس فيه final_number و total_quantity و location و name و category)"""
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        return self.results
+
+    # ---------- المواقع ----------
+
+    def _default_warehouse(self):
+        if not self._warehouse_loaded:
+            self._warehouse = Warehouse.objects.first()
+            self._warehouse_loaded = True
+        return self._warehouse
+
+    def _resolve_locations(self, chunk):
+        """تحويل نصوص المواقع الجديدة في الدفعة إلى كائنات Location (مع إنشاء مواقع الشبكة المفقودة)"""
+        codes = {item['location'] for _, item in chunk if item.get('location')} - self._locations.keys()
+        if not codes:
+            return
+        parsed = {code: parse_location_code(code) for code in codes}
+        grid = {code: p[1:] for code, p in parsed.items() if p and p[0] == 'grid'}
+        ids = {code: p[1] for code, p in parsed.items() if p and p[0] == 'id'}
+
+        by_position = {}
+        warehouse = self._default_warehouse() if grid else None
+        if warehouse:
+            positions = set(grid.values())
+            by_position = {
+                (loc.row, loc.column): loc
+                for loc in Location.objects.filter(
+                    warehouse=warehouse,
+                    row__in={r for r, _ in positions},
+                    column__in={c for _, c in positions},
+                )
+            }
+            missing = [
+                Location(warehouse=warehouse, row=r, column=c)
+                for r, c in sorted(positions - by_position.keys())
+            ]
+            if missing:
+                with transaction.atomic():
+                    Location.objects.bulk_create(missing, ignore_conflicts=True)
+                created = Location.objects.filter(
+                    warehouse=warehouse,
+                    row__in={loc.row for loc in missing},
+                    column__in={loc.column for loc in missing},
+                )
+                wanted = {(loc.row, loc.column) for loc in missing}
+                new_locations = [loc for loc in created if (loc.row, loc.column) in wanted]
+                by_position.update({(loc.row, loc.column): loc for loc in new_locations})
+                create_secure_backups_bulk(new_locations, 'create')
+        by_id = Location.objects.in_bulk(list(set(ids.values()))) if ids else {}
+
+        for code in codes:
+            if code in grid:
+                self._locations[code] = by_position.get(grid[code])
+            elif code in ids:
+                self._locations[code] = by_id.get(ids[code])
+            else:
+                self._locations[code] = None
+
+    # ---------- المنتجات ----------
+
+    def _import_chunk(self, chunk):
+        try:
+            self._resolve_locations(chunk)
+            with transaction.atomic():
+                counts = self._write_products(chunk)
+        except DatabaseError as e:
+            for row_idx, _ in chunk:
+                self.reject(row_idx, str(e))
+            return
+        for key, value in counts.items():
+            self.results[key] += value
+
+    def _write_products(self, chunk):
+        counts = {'added': 0, 'updated': 0, 'skipped': 0}
+        numbers = list({item['final_number'] for _, item in chunk})
+        existing = Product.objects.in_bulk(numbers, field_name='product_number')
+        created = {}
+        updated = {}
+        quantity_before = {}
+
+        # تطبيق الصفوف بالترتيب؛ تكرار الرقم داخل الملف يُعامل كمنتج موجود (كما في الحفظ المتسلسل)
+        for row_idx, item in chunk:
+            number = item['final_number']
+            quantity = item['total_quantity']
+            location = self._locations.get(item.get('location'))
+            product = created.get(number) or existing.get(number)
+            if product is None:
+                created[number] = Product(
+                    product_number=number,
+                    name=(item.get('name') or number),
+                    category=(item.get('category') or None),
+                    quantity=quantity,
+                    location=location,
+                )
+                counts['added'] += 1
+                continue
+            if self.conflict_resolution == 'skip':
+                counts['skipped'] += 1
+                continue
+            if number not in created and number not in updated:
+                quantity_before[number] = product.quantity
+                updated[number] = product
+            if self.conflict_resolution == 'update':
+                product.quantity += quantity
+            else:
+                product.quantity = quantity
+            if location:
+                product.location = location
+            if item.get('name'):
+                product.name = item['name']
+            if item.get('category'):
+                product.category = item['category']
+            counts['updated'] += 1
+
+        new_products = list(created.values())
+        changed = list(updated.values())
+        if new_products:
+            Product.objects.bulk_create(new_products)
+        if changed:
+            # upsert على رقم المنتج بدلاً من bulk_update (تعبير CASE لكل صف بطيء جداً مع الدفعات الكبيرة)
+            created_at = {product.product_number: product.created_at for product in changed}
+            Product.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=['product_number'],
+                update_fields=PRODUCT_UPDATE_FIELDS,
+            )
+            # bulk_create يضع created_at جديداً على الكائنات (auto_now_add) بينما يبقى المخزن كما هو،
+            # فنعيده حتى تطابق نسخ الصندوق الأسود الصف الفعلي
+            for product in changed:
+                product.created_at = created_at[product.product_number]
+
+        create_secure_backups_bulk(new_products, 'create')
+        create_secure_backups_bulk(changed, 'update')
+        AuditLog.objects.bulk_create(
+            [
+                AuditLog(
+                    action='added',
+                    product=product,
+                    product_number=product.product_number,
+                    quantity_before=0,
+                    quantity_after=product.quantity,
+                    quantity_change=product.quantity,
+                    notes=f'تم إضافة منتج جديد من Excel: {product.name}',
+                    user=self.user,
+                )
+                for product in new_products
+            ] + [
+                AuditLog(
+                    action='updated',
+                    product=product,
+                    product_number=product.product_number,
+                    quantity_before=quantity_before[product.product_number],
+                    quantity_after=product.quantity,
+                    quantity_change=product.quantity - quantity_before[product.product_number],
+                    notes='تم تحديث المنتج من Excel',
+                    user=self.user,
+                )
+                for product in changed
+            ],
+            batch_size=self.chunk_size,
+        )
+        return counts
+
+
+def sheet_items(rows, column_mapping, importer):
+    """صفوف الورقة بعد التحليل (sheet_frame)؛ الصفوف الناقصة تُسجل كأخطاء في importer"""
+    for parsed in iter_mapped_frames(rows, column_mapping):
+        invalid = invalid_mask(parsed)
+        for row_idx in parsed.index[invalid]:
+            importer.reject(row_idx, 'بيانات ناقصة (رقم المنتج أو الإجمالي)')
+        valid = parsed[~invalid]
+        yield from zip(valid.index.tolist(), frame_records(valid))
+
+
+def preview_items(edited_data, source_rows, column_mapping, importer):
+    """صفوف المعاينة المعدلة؛ الاسم والفئة من الصفوف الأصلية (source_rows حسب الموقع)"""
+    positions = sorted(source_rows)
+    source = parse_mapped_rows([source_rows[p] for p in positions], column_mapping, [p + 2 for p in positions])
+    names = source['name'].to_dict()
+    categories = source['category'].to_dict()
+    for item in edited_data:
+        row_idx = item.get('row')
+        # تخطي الصفوف التي ما زالت تحتوي على أخطاء
+        if item.get('status') == 'error':
+            importer.reject(row_idx, item.get('message', ''), skipped=True)
+            continue
+        try:
+            yield row_idx, {
+                'final_number': item['final_number'],
+                'total_quantity': int(item['total_quantity']),
+                'location': item.get('location') or None,
+                'name': names.get(row_idx),
+                'category': categories.get(row_idx),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            importer.reject(row_idx, str(e))
@@ -0,0 +1,169 @@
+"""
+محرك معاينة ملفات Excel قبل الإضافة.
+تُحلل الصفوف بطبقة sheet_frame (pandas) على دفعات، ثم يُحسم وجود كل أرقام المنتجات النهائية
+باستعلامات IN مجمّعة (دفعة لكل LOOKUP_CHUNK_SIZE رقم) بدلاً من استعلام لكل صف،
+وتُعاد النتيجة للمتصفح صفحة صفحة.
+للملفات المرحلية تُحسب المعاينة مرة واحدة لكل تحديد أعمدة وتُحفظ في ExcelPreviewRow (store_preview)،
+فتقرأ كل صفحة شريحتها فقط (stored_page) دون إعادة قراءة الملف أو إعادة حسم الوجود.
+"""
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from ..models import ExcelPreviewRow, Product
+from .sheet_frame import frame_records, iter_mapped_frames
+
+
+LOOKUP_CHUNK_SIZE = 900  # أقل من حد المتغيرات في SQLite
+PREVIEW_PAGE_SIZE = 100
+PREVIEW_MAX_PAGE_SIZE = 1000
+PREVIEW_STATUSES = ('new', 'exists', 'error')
+
+
+def resolve_existing(product_numbers, chunk_size=LOOKUP_CHUNK_SIZE):
+    """{رقم المنتج: الكمية الحالية} للأرقام الموجودة، باستعلام IN لكل دفعة"""
+    numbers = list(dict.fromkeys(n for n in product_numbers if n))
+    existing = {}
+    for start in range(0, len(numbers), chunk_size):
+        existing.update(
+            Product.objects.filter(product_number__in=numbers[start:start + chunk_size])
+            .values_list('product_number', 'quantity')
+        )
+    return existing
+
+
+def build_preview(rows, column_mapping):
+    """قائمة المعاينة لكل الصفوف مع الحالة (new / exists / error)"""
+    frames = list(iter_mapped_frames(rows, column_mapping))
+    if not frames:
+        return []
+    return _frame_preview(pd.concat(frames), column_mapping)
+
+
+def _frame_preview(parsed, column_mapping):
+    """صفوف المعاينة لإطار واحد من الصفوف المحللة"""
+    no_number = parsed['final_number'].isna()
+    no_quantity = parsed['total_quantity'].isna()
+    error = no_number | no_quantity
+
+    # حسم الوجود لكل الأرقام دفعة واحدة
+    existing = resolve_existing(parsed.loc[~error, 'final_number'].unique())
+    current = parsed['final_number'].map(existing).astype('Int64')
+    exists = ~error & current.notna()
+
+    preview = pd.DataFrame({
+        'row': parsed.index,
+        'original_number': parsed['original_number'].where(
+            ~error | (parsed['original_number'].fillna('') != ''), 'فارغ'
+        ),
+        'final_number': parsed['final_number'].fillna('فارغ'),
+        'total_quantity': parsed['total_quantity'].fillna(0),
+        'location': parsed['location'].fillna(''),
+        'status': np.select([error, exists], ['error', 'exists'], 'new'),
+        'message': np.select(
+            [no_number & no_quantity, no_number, no_quantity, exists],
+            [
+                '⚠️ رقم المنتج فارغ | الإجمالي فارغ',
+                '⚠️ رقم المنتج فارغ',
+                '⚠️ الإجمالي فارغ',
+                'موجود مسبقاً (الكمية الحالية: ' + current.astype(str) + ')',
+            ],
+            'منتج جديد',
+        ),
+    }, index=parsed.index)
+    if column_mapping.get('name') is not None:
+        preview['name'] = parsed['name'].fillna('')
+    if column_mapping.get('category') is not None:
+        preview['category'] = parsed['category'].fillna('')
+    return frame_records(preview)
+
+
+def store_preview(sheet, column_mapping):
+    """
+    حساب معاينة ملف مرحلي (StagedSheet) وحفظها (إن لم تكن محفوظة لنفس تحديد الأعمدة)؛ يعيد عدد كل حالة.
+    تُحسب على دفعات sheet_frame فلا تبقى كل صفوف المعاينة في الذاكرة.
+    """
+    upload = sheet.upload
+    if upload.preview_mapping == column_mapping:
+        return upload.preview_counts
+    counts = dict.fromkeys(PREVIEW_STATUSES, 0)
+    with transaction.atomic():
+        ExcelPreviewRow.objects.filter(upload=upload).delete()
+        for parsed in iter_mapped_frames(sheet.iter_rows(), column_mapping):
+            entries = _frame_preview(parsed, column_mapping)
+            for entry in entries:
+                counts[entry['status']] += 1
+            ExcelPreviewRow.objects.bulk_create([
+                ExcelPreviewRow(
+                    upload=upload,
+                    position=entry['row'] - 2,
+                    status=entry['status'],
+                    search_key=' '.join(
+                        str(entry[key]) for key in ('original_number', 'final_number', 'location')
+                    ).upper(),
+                    data=entry,
+                )
+                for entry in entries
+            ], batch_size=1000)
+        upload.preview_mapping = column_mapping
+        upload.preview_counts = counts
+        upload.save(update_fields=['preview_mapping', 'preview_counts'])
+    return counts
+
+
+def stored_page(upload, status=None, search='', page=1, page_size=PREVIEW_PAGE_SIZE):
+    """(صفوف الصفحة، عدد الصفوف بعد التصفية، رقم الصفحة، عدد الصفحات، حجم الصفحة) من المعاينة المحفوظة"""
+    rows = ExcelPreviewRow.objects.filter(upload=upload)
+    if status in PREVIEW_STATUSES:
+        rows = rows.filter(status=status)
+    search = (search or '').strip().upper()
+    if search:
+        rows = rows.filter(search_key__contains=search)
+    filtered = rows.count()
+    page, pages, page_size = _page_bounds(filtered, page, page_size)
+    start = (page - 1) * page_size
+    entries = list(rows.order_by('position').values_list('data', flat=True)[start:start + page_size])
+    return entries, filtered, page, pages, page_size
+
+
+def preview_counts(entries):
+    counts = dict.fromkeys(PREVIEW_STATUSES, 0)
+    for entry in entries:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    return counts
+
+
+def filter_preview(entries, status=None, search=''):
+    """تصفية المعاينة حسب الحالة و/أو نص ضمن رقم المنتج أو الموقع"""
+    if status in PREVIEW_STATUSES:
+        entries = [e for e in entries if e['status'] == status]
+    search = (search or '').strip().upper()
+    if search:
+        entries = [
+            e for e in entries
+            if search in str(e['original_number']).upper()
+            or search in str(e['final_number']).upper()
+            or search in str(e['location']).upper()
+        ]
+    return entries
+
+
+def paginate(entries, page=1, page_size=PREVIEW_PAGE_SIZE):
+    """(صفوف الصفحة، رقم الصفحة بعد التصحيح، عدد الصفحات، حجم الصفحة)"""
+    page, pages, page_size = _page_bounds(len(entries), page, page_size)
+    start = (page - 1) * page_size
+    return entries[start:start + page_size], page, pages, page_size
+
+
+def _page_bounds(total, page, page_size):
+    """(رقم الصفحة بعد التصحيح، عدد الصفحات، حجم الصفحة)"""
+    try:
+        page_size = min(max(int(page_size), 1), PREVIEW_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        page_size = PREVIEW_PAGE_SIZE
+    pages = max((total + page_size - 1) // page_size, 1)
+    try:
+        page = min(max(int(page), 1), pages)
+    except (TypeError, ValueError):
+        page = 1
+    return page, pages, page_size
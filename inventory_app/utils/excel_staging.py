@@ -0,0 +1,147 @@
+"""
+مخزن مرحلي (staging) لملفات Excel المرفوعة.
+تُقرأ الورقة بوضع read_only في openpyxl (أو ملف CSV/TSV بوحدة csv) على دفعات (sheet_frame) وتُكتب في جدول ExcelStagingRow على دفعات،
+ويُحفظ في الجلسة معرف الرفع فقط؛ المعاينة والمعالجة تقرأ الصفوف من الجدول على صفحات.
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import ExcelStagingRow, ExcelUpload
+from .sheet_frame import frame_rows, iter_file_frames
+
+
+STAGING_BATCH_SIZE = 2000
+STAGING_PAGE_SIZE = 2000
+STAGING_TTL_HOURS = 24
+SESSION_KEY = 'excel_upload_id'
+
+
+def purge_stale_uploads(hours=STAGING_TTL_HOURS):
+    """حذف الملفات المرحلية القديمة التي لم تُعالج"""
+    ExcelUpload.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()
+
+
+def discard_user_uploads(user):
+    """حذف ملفات المستخدم المرحلية السابقة (ملف واحد نشط لكل مستخدم كما في الجلسة سابقاً)"""
+    ExcelUpload.objects.filter(user=user).delete()
+
+
+def iter_sheet_rows(upload, filename=None):
+    """
+    قراءة الورقة النشطة (أو ملف CSV/TSV) عبر sheet_frame: (headers, مولّد الصفوف غير الفارغة كقوائم).
+    يجب استهلاك المولّد قبل إغلاق الملف.
+    """
+    headers, frames = iter_file_frames(upload, filename)
+
+    def data_rows():
+        for frame in frames:
+            yield from frame_rows(frame)
+
+    return headers, data_rows()
+
+
+@transaction.atomic
+def stage_rows(headers, rows, user=None, filename='', batch_size=STAGING_BATCH_SIZE):
+    """كتابة الصفوف في المخزن المرحلي على دفعات، مع الاحتفاظ بأول 50 صفاً لعرضها فوراً"""
+    upload = ExcelUpload.objects.create(user=user, filename=filename, headers=headers)
+    batch = []
+    first_rows = []
+    position = 0
+    for position, row in enumerate(rows, start=1):
+        if len(first_rows) < 50:
+            first_rows.append(row)
+        batch.append(ExcelStagingRow(upload=upload, position=position - 1, data=row))
+        if len(batch) >= batch_size:
+            ExcelStagingRow.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ExcelStagingRow.objects.bulk_create(batch)
+    upload.total_rows = position
+    upload.save(update_fields=['total_rows'])
+    return upload, first_rows
+
+
+class StagedSheet:
+    """ورقة محفوظة في المخزن المرحلي؛ الصفوف تُقرأ على صفحات بدلاً من تحميلها كاملة"""
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.headers = upload.headers
+        self.total_rows = upload.total_rows
+
+    def page(self, offset=0, limit=STAGING_PAGE_SIZE):
+        return list(
+            self.upload.rows.filter(position__gte=offset, position__lt=offset + limit)
+            .order_by('position').values_list('data', flat=True)
+        )
+
+    def iter_rows(self, page_size=STAGING_PAGE_SIZE):
+        """كل الصفوف بالترتيب، صفحة بعد صفحة (نطاقات position على الفهرس الفريد)"""
+        offset = 0
+        while offset < self.total_rows:
+            rows = self.page(offset, page_size)
+            if not rows:
+                break
+            yield from rows
+            offset += page_size
+
+    def rows_at(self, positions):
+        """صفوف محددة بمواقعها في استعلام واحد: {position: row}"""
+        return dict(self.upload.rows.filter(position__in=list(positions)).values_list('position', 'data'))
+
+    def discard(self):
+        self.upload.delete()
+
+
+class SessionSheet:
+    """ورقة مخزنة في الجلسة بالصيغة القديمة {'headers', 'data'} (للتوافق)"""
+
+    def __init__(self, excel_data):
+        self.headers = excel_data['headers']
+        self._rows = excel_data['data']
+        self.total_rows = len(self._rows)
+
+    def page(self, offset=0, limit=STAGING_PAGE_SIZE):
+        return self._rows[offset:offset + limit]
+
+    def iter_rows(self, page_size=STAGING_PAGE_SIZE):
+        return iter(self._rows)
+
+    def rows_at(self, positions):
+        return {p: self._rows[p] for p in positions if 0 <= p < self.total_rows}
+
+    def discard(self):
+        pass
+
+
+def get_staged_sheet(upload_id, user):
+    """ورقة المخزن المرحلي حسب المعرف لهذا المستخدم (أو None)؛ تُستخدم أيضاً خارج الطلب (المهام الخلفية)"""
+    try:
+        upload_id = uuid.UUID(str(upload_id)) if upload_id else None
+    except ValueError:
+        upload_id = None
+    if not upload_id:
+        return None
+    upload = ExcelUpload.objects.filter(pk=upload_id, user=user).first()
+    return StagedSheet(upload) if upload else None
+
+
+def get_sheet(request, upload_id=None):
+    """الورقة الحالية للمستخدم: من المخزن المرحلي حسب المعرف، أو من الجلسة بالصيغة القديمة"""
+    sheet = get_staged_sheet(upload_id or request.session.get(SESSION_KEY), request.user)
+    if sheet:
+        return sheet
+    excel_data = request.session.get('excel_data')
+    if excel_data:
+        return SessionSheet(excel_data)
+    return None
+
+
+def discard_sheet(request, sheet):
+    sheet.discard()
+    for key in (SESSION_KEY, 'excel_data'):
+        if key in request.session:
+            del request.session[key]
@@ -0,0 +1,176 @@
+"""
+ذاكرة تخزين مؤقت على القرص لملفات التصدير (PDF / Excel / CSV).
+- الملف يُحدد بنوع التصدير ومعاملاته وختم إصدار البيانات: أي تغيير في البيانات يغير الختم فيُنشأ ملف جديد،
+  والتنزيل المتكرر لنفس الإصدار يُرسل من القرص مباشرة.
+- ختم المنتجات: آخر سجل في الصندوق الأسود (كل حفظ/حذف للمنتجات والمواقع، بما فيها مسارات bulk)
+  مع عدد المنتجات وآخر معرف وآخر updated_at (لتحديثات update() التي لا تمر بالإشارات).
+- الطلبية لا تتغير بعد إنشائها؛ ختمها معرفها مع آخر تعديل لمنتجاتها (السعر والصورة في الملف من المنتج).
+- الحجم الكلي محدود بـ EXPORT_CACHE_MAX_BYTES ويُحذف الأقدم استخداماً أولاً (LRU حسب وقت آخر وصول atime).
+- الاستجابة تحمل ETag (مفتاح الملف) و Last-Modified (وقت إنشائه)، والطلب الشرطي يحصل على 304.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from ..models import Product, SecureBackup
+
+
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+EXPORT_CACHE_WRITE_CHUNK = 1024 * 1024
+
+_evict_lock = threading.Lock()
+
+
+def cache_root():
+    return Path(getattr(settings, 'EXPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'export_cache'))
+
+
+def cache_enabled():
+    return getattr(settings, 'EXPORT_CACHE_MAX_BYTES', EXPORT_CACHE_MAX_BYTES) > 0
+
+
+# ---------- أختام الإصدار ----------
+
+def products_version():
+    """ختم بيانات المنتجات والمواقع الحالية (استعلامان تجميعيان)"""
+    latest_backup = SecureBackup.objects.aggregate(last=Max('id'))['last']
+    stats = Product.objects.aggregate(n=Count('id'), last_id=Max('id'), last_update=Max('updated_at'))
+    last_update = stats['last_update'].isoformat() if stats['last_update'] else ''
+    return f"{latest_backup or 0}:{stats['n']}:{stats['last_id'] or 0}:{last_update}"
+
+
+def order_version(order, products):
+    """ختم الطلبية: ثابت ما لم تتغير منتجاتها المعروضة (السعر / الصورة)"""
+    stamps = sorted(p.updated_at.isoformat() for p in products if p.updated_at)
+    return f"{order.pk}:{order.order_number}:{len(stamps)}:{stamps[-1] if stamps else ''}"
+
+
+# ---------- الملفات ----------
+
+class ExportArtifact:
+    """ملف تصدير واحد في الذاكرة المؤقتة (قد لا يكون موجوداً بعد)"""
+
+    def __init__(self, kind, params, version, suffix):
+        payload = json.dumps({'kind': kind, 'params': params, 'version': version}, sort_keys=True, default=str)
+        self.key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        self.path = cache_root() / f'{kind}-{self.key[:40]}{suffix}'
+        self.etag = f'"{self.key[:40]}"'
+
+    def open(self):
+        """
+        فتح الملف للقراءة وتحديث وقت آخر استخدام (atime) مع إبقاء وقت الإنشاء (mtime) لـ Last-Modified.
+        يعيد (الملف المفتوح، mtime) أو None إن لم يكن موجوداً. الملف المفتوح يبقى صالحاً
+        حتى لو حذفه evict من طلب آخر بعد ذلك.
+        """
+        try:
+            handle = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        mtime = os.fstat(handle.fileno()).st_mtime
+        try:
+            os.utime(self.path, (time.time(), mtime))
+        except FileNotFoundError:
+            pass
+        return handle, int(mtime)
+
+    def store(self, content):
+        """حفظ الناتج في الذاكرة المؤقتة (انظر _write)"""
+        self._write(content)[0].close()
+
+    def _write(self, content):
+        """
+        حفظ الناتج (bytes، ملف مفتوح، أو مكرر كتل str/bytes) بكتابة ذرية:
+        ملف مؤقت في نفس المجلد ثم os.replace، فلا يرى طلب آخر ملفاً ناقصاً.
+        يعيد (الملف المفتوح للقراءة، mtime)؛ يُفتح قبل النقل فلا يضيع إن حذفه evict من طلب آخر.
+        """
+        root = cache_root()
+        root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if isinstance(content, (bytes, bytearray)):
+                    out.write(content)
+                elif hasattr(content, 'read'):
+                    for chunk in iter(lambda: content.read(EXPORT_CACHE_WRITE_CHUNK), b''):
+                        out.write(chunk)
+                else:
+                    for chunk in content:
+                        out.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            handle = open(tmp_path, 'rb')
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            if hasattr(content, 'close'):
+                content.close()
+        evict(keep=self.path)
+        return handle, int(os.fstat(handle.fileno()).st_mtime)
+
+    def response(self, request, build, filename, content_type):
+        """
+        استجابة التنزيل: 304 إن طابق ETag/Last-Modified لدى المتصفح، وإلا الملف من القرص
+        (يُنشأ بـ build() عند أول طلب لهذا الإصدار).
+        """
+        if not cache_enabled():
+            content = build()
+            if isinstance(content, (bytes, bytearray)):
+                response = HttpResponse(content, content_type=content_type)
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+            return FileResponse(content, as_attachment=True, filename=filename, content_type=content_type)
+
+        # الملف يُفتح قبل أي فحص آخر: طلب آخر قد يحذفه (evict) في أي لحظة
+        handle, last_modified = self.open() or self._write(build())
+        response = get_conditional_response(request, etag=self.etag, last_modified=last_modified)
+        if response is None:
+            response = FileResponse(handle, as_attachment=True, filename=filename, content_type=content_type)
+        else:
+            handle.close()
+        response['ETag'] = self.etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # المتصفح يحتفظ بالنسخة لكن يتحقق منها في كل مرة (البيانات قد تتغير)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def evict(max_bytes=None, keep=None):
+    """حذف الأقدم استخداماً حتى يصبح حجم المجلد ضمن الحد (الملف keep لا يُحذف)"""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'EXPORT_CACHE_MAX_BYTES', EXPORT_CACHE_MAX_BYTES)
+    with _evict_lock:
+        entries = []
+        for path in cache_root().glob('*'):
+            if path.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
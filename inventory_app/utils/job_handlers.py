@@ -0,0 +1,204 @@
+"""
+أنواع المهام الخلفية المسجلة: استيراد Excel، تصدير واستيراد النسخ الاحتياطي، PDF المنتجات، الصور المصغرة، وحذف البيانات.
+لكل نوع دالة from_request تتحقق من طلب الإضافة (بنفس قواعد الواجهة المباشرة) ودالة تنفيذ تعمل في العامل.
+"""
+import json
+from datetime import datetime
+
+from django.db import transaction
+
+from .jobs import JobError, job_handler
+
+
+# ---------- استيراد Excel ----------
+
+def _excel_import_request(request):
+    from .excel_staging import get_staged_sheet
+
+    data = json.loads(request.body) if request.content_type == 'application/json' else request.POST.dict()
+    column_mapping = data.get('column_mapping') or {}
+    if isinstance(column_mapping, str):
+        column_mapping = json.loads(column_mapping)
+    for field in ('product_number', 'total_quantity'):
+        if column_mapping.get(field) is None:
+            raise JobError(f'يجب تحديد عمود {field}')
+    if not get_staged_sheet(data.get('upload_id'), request.user):
+        raise JobError('لم يتم العثور على بيانات Excel')
+    return {
+        'upload_id': str(data['upload_id']),
+        'column_mapping': column_mapping,
+        'conflict_resolution': data.get('conflict_resolution', 'skip'),
+    }, {}
+
+
+@job_handler('excel_import', from_request=_excel_import_request)
+def run_excel_import(ctx):
+    from .excel_import import ExcelImporter, sheet_items
+    from .excel_staging import get_staged_sheet
+
+    sheet = get_staged_sheet(ctx.params.get('upload_id'), ctx.user)
+    if not sheet:
+        raise JobError('لم يتم العثور على بيانات Excel')
+    importer = ExcelImporter(
+        ctx.params.get('conflict_resolution', 'skip'),
+        user=ctx.user.username if ctx.user else 'system',
+    )
+
+    def tracked(rows):
+        for done, row in enumerate(rows, start=1):
+            ctx.progress(done, sheet.total_rows, f'الصف {done} من {sheet.total_rows}')
+            yield row
+
+    results = importer.run(sheet_items(tracked(sheet.iter_rows()), ctx.params['column_mapping'], importer))
+    sheet.discard()
+    return {'results': results}
+
+
+# ---------- النسخ الاحتياطي ----------
+
+def _backup_export_request(request):
+    params = request.POST
+    return {
+        'format': 'zip' if params.get('format') == 'zip' else 'json',
+        'gzip': params.get('gzip') in ('1', 'true'),
+        'differential': params.get('type') == 'differential',
+    }, {}
+
+
+@job_handler('backup_export', from_request=_backup_export_request)
+def run_backup_export(ctx):
+    from .backup import backup_plan, save_watermark, stream_json_backup, stream_zip_backup
+    from .streaming import buffered, gzip_stream
+
+    differential = bool(ctx.params.get('differential'))
+    label = 'diff' if differential else 'full'
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    try:
+        sections, info, watermark = backup_plan(differential=differential)
+    except ValueError as e:
+        raise JobError(str(e))
+    if ctx.params.get('format') == 'zip':
+        stream = stream_zip_backup(sections, info)
+        filename = f'backup_{label}_{timestamp}.zip'
+    else:
+        stream = buffered(stream_json_backup(sections, info))
+        filename = f'backup_{label}_{timestamp}.json'
+        if ctx.params.get('gzip'):
+            stream = gzip_stream(stream)
+            filename += '.gz'
+
+    written = 0
+    with open(ctx.output_path(filename), 'wb') as out:
+        for chunk in stream:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out.write(chunk)
+            written += len(chunk)
+            ctx.progress(message=f'تمت كتابة {written // 1024} KB')
+    # العلامة تتقدم فقط بعد إغلاق الملف بنجاح
+    save_watermark(watermark, 'differential' if differential else 'full')
+    return {'filename': filename, 'size': written}
+
+
+def _backup_import_request(request):
+    uploaded = request.FILES.get('backup_file')
+    if not uploaded:
+        raise JobError('لم يتم إرسال ملف')
+    try:
+        selected_sections = json.loads(request.POST.get('selected_sections') or '[]')
+    except ValueError:
+        selected_sections = []
+    return {
+        'clear_existing': request.POST.get('clear_existing', 'false') == 'true',
+        'avoid_duplicates': request.POST.get('avoid_duplicates', 'false') == 'true',
+        'selected_sections': selected_sections if isinstance(selected_sections, list) else [],
+    }, {'backup_file': uploaded}
+
+
+@job_handler('backup_import', from_request=_backup_import_request)
+def run_backup_import(ctx):
+    from ..views import _load_backup_data
+    from .backup_import import import_backup_payload
+
+    ctx.progress(message='قراءة الملف', force=True)
+    with open(ctx.params['backup_file'], 'rb') as f:
+        data, parse_meta = _load_backup_data(f, ctx.params.get('backup_file_name') or ctx.params['backup_file'])
+    if data is None:
+        message = parse_meta.get('message') if isinstance(parse_meta, dict) else ''
+        raise JobError('الملف غير صالح (JSON)' + (f' - {message}' if message else ''))
+    # الاستيراد يتم في معاملة واحدة؛ تحديثات التقدم داخلها تظهر للواجهة بعد اكتمالها في PostgreSQL
+    return import_backup_payload(
+        data,
+        selected_sections=ctx.params.get('selected_sections'),
+        clear_existing=ctx.params.get('clear_existing', False),
+        avoid_duplicates=ctx.params.get('avoid_duplicates', False),
+        progress=ctx.progress,
+    )
+
+
+# ---------- PDF والصور المصغرة وحذف البيانات ----------
+
+def _products_pdf_request(request):
+    from .pdf_native import pdf_engine
+
+    return {'engine': pdf_engine(request.POST.get('engine'))}, {}
+
+
+@job_handler('products_pdf', from_request=_products_pdf_request)
+def run_products_pdf(ctx):
+    from ..views import _render_products_pdf
+
+    ctx.progress(message='إنشاء PDF', force=True)
+    pdf_bytes = _render_products_pdf(
+        ctx.params.get('engine'),
+        progress=lambda done, total: ctx.progress(done, total, f'الجزء {done} من {total}'),
+    )
+    with open(ctx.output_path('products_list.pdf'), 'wb') as out:
+        out.write(pdf_bytes)
+    return {'filename': 'products_list.pdf', 'size': len(pdf_bytes)}
+
+
+@job_handler('thumbnails')
+def run_thumbnails(ctx):
+    from .thumbnails import generate_thumbnails, missing_thumbnails
+
+    # بدون product_ids: كل المنتجات التي تنقصها صورة مصغرة
+    product_ids = ctx.params.get('product_ids')
+    if product_ids is None:
+        product_ids = list(missing_thumbnails().values_list('pk', flat=True))
+    done, failed = generate_thumbnails(product_ids)
+    return {'message': f'تم إنشاء {done} صورة مصغرة' + (f' (فشل {failed})' if failed else '')}
+
+
+DELETE_OPTIONS = (
+    'delete_products', 'delete_locations', 'delete_warehouses', 'delete_audit_logs',
+    'delete_orders', 'delete_returns', 'delete_user_profiles', 'delete_user_activity_logs',
+)
+
+
+def _delete_data_request(request):
+    from ..views import DELETE_DATA_PASSWORD
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise JobError('البيانات غير صالحة')
+    password = str(data.get('password', '') or '').strip()
+    if not password:
+        raise JobError('يجب إدخال كلمة مرور الحذف')
+    if password != DELETE_DATA_PASSWORD:
+        raise JobError('كلمة مرور غير صحيحة')
+    options = {name: bool(data.get(name)) for name in DELETE_OPTIONS}
+    if not any(options.values()):
+        raise JobError('لم يتم تحديد أي بيانات للحذف')
+    return options, {}
+
+
+@job_handler('delete_data', from_request=_delete_data_request)
+def run_delete_data(ctx):
+    from ..views import _delete_selected_data
+
+    ctx.progress(message='حذف البيانات', force=True)
+    with transaction.atomic():
+        deleted_items = _delete_selected_data(ctx.params)
+    return {'message': f'تم حذف: {", ".join(deleted_items)}'}
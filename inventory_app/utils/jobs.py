@@ -0,0 +1,249 @@
+"""
+نظام المهام الخلفية المحلي.
+- جدول BackgroundJob هو الطابور: enqueue() يضيف صفاً، والعامل (أمر run_jobs) يحجز المهمة بتحديث شرطي
+  (status='queued' -> 'running') فلا ينفذها عاملان معاً، دون الحاجة إلى Redis أو Celery.
+- كل نوع مهمة يُسجل بـ @job_handler(kind) ويستقبل JobContext لتحديث التقدم ومعرفة طلب الإلغاء
+  وحفظ ملف الناتج في مجلد المهمة (BACKGROUND_JOBS_DIR/<job_id>/).
+"""
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.utils import timezone
+
+from ..models import BackgroundJob
+
+
+JOB_PROGRESS_INTERVAL = 1.0  # أقل فاصل (ثوانٍ) بين تحديثين لصف الحالة
+JOB_STALE_MINUTES = 10  # مهمة قيد التنفيذ بدون نبض لهذه المدة تعتبر متوقفة
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+JOB_HANDLERS = {}
+JOB_REQUEST_PARSERS = {}
+
+
+class JobCancelled(Exception):
+    """يُرفع داخل المهمة عند طلب الإلغاء"""
+
+
+class JobError(Exception):
+    """خطأ متوقع في المهمة؛ تُعرض رسالته للمستخدم بدون تتبع الأخطاء"""
+
+
+def job_handler(kind, from_request=None):
+    """
+    تسجيل دالة تنفيذ لنوع مهمة: handler(ctx) تعيد قاموس النتيجة (أو None).
+    from_request(request) -> (params, files): التحقق من طلب الإضافة وتجهيز معاملات المهمة
+    (يرفع JobError برسالة للمستخدم عند خطأ المدخلات).
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        if from_request:
+            JOB_REQUEST_PARSERS[kind] = from_request
+        return func
+    return register
+
+
+def jobs_root():
+    return Path(getattr(settings, 'BACKGROUND_JOBS_DIR', Path(settings.BASE_DIR) / 'job_files'))
+
+
+def job_dir(job):
+    path = jobs_root() / str(job.pk)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def enqueue(kind, params=None, user=None, files=None):
+    """
+    إضافة مهمة إلى الطابور. files: {اسم المعامل: ملف مرفوع} تُحفظ في مجلد المهمة
+    ويُضاف مسارها إلى params بنفس الاسم.
+    """
+    if kind not in JOB_HANDLERS:
+        raise JobError(f'نوع مهمة غير معروف: {kind}')
+    job = BackgroundJob(kind=kind, params=dict(params or {}), user=user if getattr(user, 'pk', None) else None)
+    for name, uploaded in (files or {}).items():
+        path = job_dir(job) / os.path.basename(getattr(uploaded, 'name', name) or name)
+        with open(path, 'wb') as out:
+            for chunk in uploaded.chunks():
+                out.write(chunk)
+        job.params[name] = str(path)
+        job.params.setdefault(f'{name}_name', getattr(uploaded, 'name', ''))
+    job.save()
+    return job
+
+
+def enqueue_from_request(kind, request):
+    """إضافة مهمة من طلب HTTP بعد التحقق من مدخلاتها بدالة from_request المسجلة للنوع"""
+    if kind not in JOB_HANDLERS:
+        raise JobError(f'نوع مهمة غير معروف: {kind}')
+    parser = JOB_REQUEST_PARSERS.get(kind)
+    params, files = parser(request) if parser else ({}, {})
+    return enqueue(kind, params, user=request.user, files=files)
+
+
+def request_cancel(job):
+    """طلب إلغاء مهمة: المهمة المنتظرة تُلغى فوراً، والجارية تتوقف عند أول نقطة فحص"""
+    if job.status == 'queued':
+        updated = BackgroundJob.objects.filter(pk=job.pk, status='queued').update(
+            status='cancelled', cancel_requested=True, finished_at=timezone.now()
+        )
+        if updated:
+            return True
+    if job.status in FINISHED_STATUSES:
+        return False
+    BackgroundJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+    return True
+
+
+def job_payload(job):
+    """تمثيل المهمة لواجهة الاستعلام (صف الحالة فقط)"""
+    return {
+        'id': str(job.pk),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.progress_message,
+        'result': job.result,
+        'error': job.error,
+        'has_file': bool(job.result_file),
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobContext:
+    """ما تستخدمه دالة المهمة: المعاملات، التقدم، الإلغاء، وملف الناتج"""
+
+    def __init__(self, job):
+        self.job = job
+        self.params = job.params
+        self._last_update = 0.0
+        self._cancelled = False
+
+    @property
+    def user(self):
+        return self.job.user
+
+    def progress(self, done=None, total=None, message=None, force=False):
+        """
+        تحديث التقدم (بحد أقصى مرة كل JOB_PROGRESS_INTERVAL ثانية) وفحص طلب الإلغاء.
+        يرفع JobCancelled إن طُلب الإلغاء.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_update < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+        fields = {'heartbeat_at': timezone.now()}
+        if done is not None and total:
+            fields['progress'] = max(0, min(99, int(done * 100 / total)))
+        if message is not None:
+            fields['progress_message'] = str(message)[:255]
+        try:
+            BackgroundJob.objects.filter(pk=self.job.pk).update(**fields)
+            self._cancelled = BackgroundJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists()
+        except DatabaseError:
+            # قد تكون قاعدة البيانات مقفلة مؤقتاً (SQLite)؛ التقدم ليس ضرورياً لنجاح المهمة
+            pass
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancelled:
+            raise JobCancelled()
+
+    def output_path(self, filename):
+        """مسار ملف الناتج داخل مجلد المهمة (يُسجل كملف التنزيل)"""
+        path = job_dir(self.job) / os.path.basename(filename)
+        self.job.result_file = str(path)
+        return path
+
+
+def claim_next_job(worker_name):
+    """حجز أقدم مهمة منتظرة لهذا العامل؛ التحديث الشرطي يضمن أن عاملاً واحداً فقط يحجزها"""
+    for job_id in BackgroundJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = BackgroundJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', worker=worker_name, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    """تنفيذ مهمة محجوزة وتسجيل حالتها النهائية"""
+    ctx = JobContext(job)
+    fields = {}
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            raise JobError(f'نوع مهمة غير معروف: {job.kind}')
+        result = handler(ctx)
+        fields.update(status='succeeded', progress=100, result=result or {})
+    except JobCancelled:
+        fields.update(status='cancelled', progress_message='تم الإلغاء')
+    except JobError as e:
+        fields.update(status='failed', error=str(e))
+    except Exception as e:
+        fields.update(status='failed', error=f'{e}\n{traceback.format_exc()}')
+    fields['finished_at'] = timezone.now()
+    fields['result_file'] = ctx.job.result_file if fields['status'] == 'succeeded' else ''
+    BackgroundJob.objects.filter(pk=job.pk).update(**fields)
+    job.refresh_from_db()
+    return job
+
+
+def recover_stale_jobs(minutes=JOB_STALE_MINUTES):
+    """المهام الجارية التي توقف نبضها (توقف العامل) تُسجل كفاشلة"""
+    return BackgroundJob.objects.filter(
+        status='running', heartbeat_at__lt=timezone.now() - timedelta(minutes=minutes)
+    ).update(status='failed', error='توقف العامل أثناء تنفيذ المهمة', finished_at=timezone.now())
+
+
+def purge_finished_jobs(days):
+    """حذف المهام المنتهية الأقدم من days يوماً مع ملفاتها"""
+    old = BackgroundJob.objects.filter(
+        status__in=FINISHED_STATUSES, finished_at__lt=timezone.now() - timedelta(days=days)
+    )
+    count = 0
+    for job_id in list(old.values_list('pk', flat=True)):
+        shutil.rmtree(jobs_root() / str(job_id), ignore_errors=True)
+        count += 1
+    old.delete()
+    return count
+
+
+def default_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(worker_name=None, once=False, poll_interval=2.0, stop_event=None):
+    """
+    حلقة العامل: حجز مهمة وتنفيذها ثم التالية. once=True يُنهي عند فراغ الطابور.
+    تُغلق اتصالات قاعدة البيانات بعد كل مهمة (الخيوط لا تمر بدورة طلب Django).
+    """
+    worker_name = worker_name or default_worker_name()
+    processed = 0
+    try:
+        while not (stop_event and stop_event.is_set()):
+            close_old_connections()
+            job = claim_next_job(worker_name)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+            processed += 1
+    finally:
+        connections.close_all()
+    return processed
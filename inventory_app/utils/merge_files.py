@@ -0,0 +1,317 @@
+"""
+جلسات دمج الملفات.
+- تُحلل الملفات المرفوعة بالتوازي في مجمع عمليات (ملف لكل مهمة) عبر sheet_frame.parse_merge_file،
+  فيصبح زمن الدمج قريباً من زمن أبطأ ملف بدلاً من مجموع الملفات.
+- تُحفظ العناصر في جدول MergeItem مع رقم المنتج بعد التطبيع (key)، ويُحسب التكرار في قاعدة البيانات،
+  ويتصفح المتصفح العناصر صفحة صفحة بمعرف الجلسة.
+- الإصلاح (دمج الكميات أو إعادة التسمية) يُحفظ كجلسة فرعية، والتصدير يقرأ من الجلسة مباشرة
+  (JSON متدفق، و XLSX بمصنف write_only) فلا تمر القائمة عبر المتصفح.
+"""
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import MergeItem, MergeSession
+from .sheet_frame import MERGE_FILE_EXTENSIONS, parse_merge_file
+from .streaming import ITERATOR_CHUNK_SIZE, buffered
+
+
+MERGE_PAGE_SIZE = 100
+MERGE_MAX_PAGE_SIZE = 1000
+MERGE_INSERT_BATCH = 2000
+MERGE_SESSION_TTL_HOURS = 24
+MERGE_PARALLEL_MIN_BYTES = 512 * 1024  # الملفات الصغيرة أسرع بدون تكلفة إرسالها لعملية أخرى
+MERGE_MODES = ('all', 'unique', 'duplicates')
+AUTO_FIX_MODES = ('merge', 'rename')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def normalize_product_number(raw):
+    """مفتاح اكتشاف التكرار: الأحرف اللاتينية والأرقام فقط بأحرف كبيرة"""
+    if raw is None:
+        return ''
+    return re.sub(r'[^A-Za-z0-9]', '', str(raw).strip()).upper()
+
+
+# ---------- التحليل المتوازي ----------
+
+def _parse_pool():
+    """
+    مجمع عمليات مشترك (يُنشأ عند أول استخدام). spawn بدلاً من fork: العمليات الجديدة لا ترث
+    اتصالات قاعدة البيانات ولا خيوط الخادم.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'MERGE_PARSE_WORKERS', None) or min(4, os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _upload_source(upload):
+    """مسار الملف المؤقت إن كان الرفع على القرص، وإلا محتواه (bytes) لإرساله إلى العملية"""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload.read()
+
+
+def parse_uploads(uploads):
+    """
+    تحليل ملفات الدمج المرفوعة: [(filename, items, error)] بنفس ترتيب الرفع.
+    الملفات غير المدعومة تُتجاهل. عند تعذر مجمع العمليات يُحلل كل ملف في الطلب نفسه.
+    """
+    uploads = [u for u in uploads if u.name.lower().endswith(MERGE_FILE_EXTENSIONS)]
+    sources = [(_upload_source(u), u.name) for u in uploads]
+    parallel = len(sources) > 1 and sum(u.size or 0 for u in uploads) >= MERGE_PARALLEL_MIN_BYTES
+    if parallel:
+        try:
+            futures = [_parse_pool().submit(parse_merge_file, source, name) for source, name in sources]
+            return [future.result() for future in futures]
+        except (BrokenProcessPool, OSError):
+            _reset_pool()
+    return [parse_merge_file(source, name) for source, name in sources]
+
+
+# ---------- الجلسات ----------
+
+def purge_stale_sessions(hours=MERGE_SESSION_TTL_HOURS):
+    MergeSession.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()
+
+
+def _store_items(session, items, batch_size=MERGE_INSERT_BATCH):
+    """كتابة العناصر ({product_number, name, quantity, source}) في الجلسة على دفعات"""
+    batch = []
+    for position, item in enumerate(items):
+        product_number = str(item.get('product_number') or '')
+        batch.append(MergeItem(
+            session=session,
+            position=position,
+            product_number=product_number[:255],
+            key=normalize_product_number(product_number)[:255],
+            name=str(item.get('name') or ''),
+            quantity=int(item.get('quantity') or 0),
+            source=str(item.get('source') or '')[:255],
+        ))
+        if len(batch) >= batch_size:
+            MergeItem.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        MergeItem.objects.bulk_create(batch)
+
+
+@transaction.atomic
+def create_merge_session(user, parsed, batch_size=MERGE_INSERT_BATCH):
+    """حفظ نتيجة التحليل في جلسة دمج جديدة (جلسة واحدة نشطة لكل مستخدم)"""
+    purge_stale_sessions()
+    MergeSession.objects.filter(user=user, parent__isnull=True).delete()
+    session = MergeSession.objects.create(
+        user=user,
+        files=[{'name': name, 'count': len(items), 'error': error} for name, items, error in parsed],
+    )
+    _store_items(
+        session,
+        (dict(item, source=name) for name, items, _ in parsed for item in items),
+        batch_size,
+    )
+    return session
+
+
+def get_merge_session(session_id, user):
+    """جلسة الدمج حسب المعرف لهذا المستخدم (أو None)"""
+    try:
+        session_id = uuid.UUID(str(session_id)) if session_id else None
+    except ValueError:
+        session_id = None
+    if not session_id:
+        return None
+    return MergeSession.objects.filter(pk=session_id, user=user).first()
+
+
+def duplicate_keys(session):
+    """استعلام المفاتيح المتكررة (أكثر من عنصر) في الجلسة"""
+    return (
+        session.items.exclude(key='').values('key')
+        .annotate(n=Count('id')).filter(n__gt=1).values('key')
+    )
+
+
+def session_counts(session):
+    items = session.items.all()
+    return {
+        'total': items.count(),
+        'unique': items.exclude(key='').values('key').distinct().count(),
+        'duplicates': duplicate_keys(session).count(),
+    }
+
+
+def item_payload(item, group_sizes):
+    return {
+        'position': item.position,
+        'product_number': item.product_number,
+        'name': item.name,
+        'quantity': item.quantity,
+        'source': item.source,
+        'duplicate': group_sizes.get(item.key, 0) > 1,
+    }
+
+
+def items_page(session, mode='all', search='', keep_order=True, page=1, page_size=MERGE_PAGE_SIZE):
+    """صفحة من عناصر الجلسة بعد التصفية: (items, page, pages, page_size, filtered_count)"""
+    items = session.items.all()
+    search = (search or '').strip()
+    if search:
+        items = items.filter(Q(name__icontains=search) | Q(product_number__icontains=search))
+    if mode == 'duplicates':
+        items = items.filter(key__in=duplicate_keys(session))
+    elif mode == 'unique':
+        items = items.exclude(key__in=duplicate_keys(session))
+    items = items.order_by('position' if keep_order else 'product_number')
+
+    try:
+        page_size = min(max(int(page_size), 1), MERGE_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        page_size = MERGE_PAGE_SIZE
+    filtered = items.count()
+    pages = max((filtered + page_size - 1) // page_size, 1)
+    try:
+        page = min(max(int(page), 1), pages)
+    except (TypeError, ValueError):
+        page = 1
+    rows = list(items[(page - 1) * page_size:page * page_size])
+
+    # حجم مجموعة التكرار لمفاتيح هذه الصفحة فقط
+    keys = {item.key for item in rows if item.key}
+    group_sizes = dict(
+        session.items.filter(key__in=keys).values('key').annotate(n=Count('id')).values_list('key', 'n')
+    ) if keys else {}
+    return [item_payload(item, group_sizes) for item in rows], page, pages, page_size, filtered
+
+
+def delete_item(session, position):
+    return session.items.filter(position=position).delete()[0] > 0
+
+
+def rename_item(session, position):
+    """تعديل تلقائي لعنصر متكرر: رقم جديد <الرقم>-FIX-<n> غير مستخدم في الجلسة"""
+    item = session.items.filter(position=position).first()
+    if not item:
+        return None
+    base = item.product_number or 'ITEM'
+    n = 1
+    while True:
+        candidate = f'{base}-FIX-{n}'
+        if not session.items.filter(key=normalize_product_number(candidate)).exists():
+            break
+        n += 1
+    item.product_number = candidate[:255]
+    item.key = normalize_product_number(candidate)[:255]
+    item.save(update_fields=['product_number', 'key'])
+    return item
+
+
+# ---------- الإصلاح والتصدير ----------
+
+def iter_session_items(session, chunk_size=ITERATOR_CHUNK_SIZE):
+    """عناصر الجلسة بالترتيب كقواميس {product_number, name, quantity}"""
+    return session.items.order_by('position').values('product_number', 'name', 'quantity').iterator(
+        chunk_size=chunk_size
+    )
+
+
+def consolidate_items(items, auto_fix='merge'):
+    """
+    توحيد العناصر حسب رقم المنتج بعد التطبيع (أول ظهور يحدد الرقم والاسم):
+    merge يجمع كميات المتكرر، و rename يبقي المتكرر بأرقام <الرقم>-<n> في آخر القائمة.
+    """
+    consolidated = {}
+    variants = []
+    for it in items:
+        key = normalize_product_number(it.get('product_number'))
+        if not key:
+            continue
+        quantity = int(it.get('quantity') or 0)
+        if key not in consolidated:
+            consolidated[key] = {
+                'product_number': it.get('product_number') or '',
+                'name': it.get('name') or it.get('product_number') or '',
+                'quantity': quantity,
+            }
+        elif auto_fix == 'merge':
+            consolidated[key]['quantity'] += quantity
+        elif auto_fix == 'rename':
+            variants.append(it)
+    yield from consolidated.values()
+    for idx, it in enumerate(variants, start=1):
+        base = str(it.get('product_number') or '')
+        yield {
+            'product_number': f'{base}-{idx}',
+            'name': it.get('name') or base,
+            'quantity': int(it.get('quantity') or 0),
+        }
+
+
+@transaction.atomic
+def consolidate_session(session, auto_fix='merge'):
+    """تنفيذ الإصلاح على جلسة الرفع وحفظ النتيجة كجلسة فرعية (تحل محل نتيجة سابقة)"""
+    auto_fix = auto_fix if auto_fix in AUTO_FIX_MODES else 'merge'
+    session.results.all().delete()
+    result = MergeSession.objects.create(user=session.user, parent=session, auto_fix=auto_fix, files=session.files)
+    _store_items(result, consolidate_items(iter_session_items(session), auto_fix))
+    return result
+
+
+def export_rows(items):
+    for it in items:
+        yield [it.get('product_number') or '', it.get('name') or '', int(it.get('quantity') or 0)]
+
+
+def stream_json_export(items):
+    """قائمة JSON تُكتب تدريجياً (كتل bytes)"""
+    def chunks():
+        yield '['
+        for index, (product_number, name, quantity) in enumerate(export_rows(items)):
+            record = {'product_number': product_number, 'name': name, 'quantity': quantity}
+            yield (',' if index else '') + json.dumps(record, ensure_ascii=False)
+        yield ']'
+    return buffered(chunks())
+
+
+def write_xlsx_export(items):
+    """
+    ملف XLSX بمصنف write_only (الصفوف تُكتب مباشرة دون بناء الورقة في الذاكرة)
+    في ملف مؤقت يُرسل للمتصفح ثم يُحذف عند إغلاقه.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('المنتجات')
+    ws.append(['رقم المنتج', 'الاسم', 'الكمية'])
+    for row in export_rows(items):
+        ws.append(row)
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,291 @@
+"""
+مسار الاسترجاع السريع (native): يكتب سجلات النسخة مباشرة في الجداول دون المرور بـ serializers و ORM.
+- PostgreSQL: COPY FROM STDIN (صيغة CSV) على اتصال psycopg2، مع تأجيل الفهارس العادية عند التحميل في جدول فارغ
+  وجدول مرحلي مؤقت + INSERT ... ON CONFLICT عند التحميل في جدول يحتوي بيانات.
+- غير ذلك (SQLite): executemany مع INSERT ... ON CONFLICT(id) DO UPDATE.
+يُقرأ الملف بشكل متدفق عبر backup_parser، لذلك لا يوجد في الذاكرة أكثر من دفعة لكل جدول.
+لا تُكتب سجلات الصندوق الأسود في هذا المسار (مثل loaddata).
+"""
+import datetime
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+from .backup_import import IMPORT_ORDER, PROTECTED_USERNAME, SECTION_MODELS, BackupImporter, reset_sequences
+from .backup_parser import section_for_model
+from .order_lines import rebuild_order_lines
+from .order_stats import rebuild_order_stats
+
+
+NATIVE_BATCH_SIZE = 5000
+_MISSING = object()
+# حقول تصل قيمها من JSON بنوعها المناسب لقاعدة البيانات فلا تحتاج تحويلاً
+_PASSTHROUGH_FIELDS = (
+    models.IntegerField, models.AutoField, models.CharField, models.TextField, models.BooleanField,
+)
+
+
+def copy_value(field, value):
+    """تحويل قيمة من النسخة إلى نص مناسب لـ COPY (None تعني NULL)"""
+    if value is None:
+        return None
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, cls=field.encoder, ensure_ascii=False)
+    value = field.to_python(value)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def copy_line(values):
+    """سطر CSV لـ COPY: القيم النصية بين علامتي تنصيص دائماً، و NULL حقل فارغ بدون تنصيص"""
+    return ','.join(
+        '' if value is None else '"' + value.replace('"', '""') + '"'
+        for value in values
+    ) + '\n'
+
+
+class _LineStream(io.RawIOBase):
+    """ملف للقراءة فقط فوق مولّد أسطر، يستخدمه copy_expert دون تجميع البيانات في الذاكرة"""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._lines).encode('utf-8')
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _param_converter(field, connection):
+    """دالة تحويل واحدة لكل حقل تُختار مرة واحدة (بدلاً من get_db_prep_save العامة لكل قيمة)"""
+    target = field.target_field if isinstance(field, models.ForeignKey) else field
+    if isinstance(target, _PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, models.JSONField):
+        encoder = field.encoder
+        return lambda value: None if value is None else json.dumps(value, cls=encoder)
+    return lambda value: field.get_db_prep_save(field.to_python(value), connection)
+
+
+class _TablePlan:
+    """أعمدة الجدول ودوال التحويل لكل حقل"""
+
+    def __init__(self, model, connection):
+        self.model = model
+        self.table = model._meta.db_table
+        self.fields = [f for f in model._meta.concrete_fields]
+        self.columns = [f.column for f in self.fields]
+        self.pk_column = model._meta.pk.column
+        self.converters = []
+        for index, field in enumerate(self.fields):
+            convert = _param_converter(field, connection)
+            if convert is not None:
+                self.converters.append((index, convert))
+        self.was_empty = None
+        self.deferred_indexes = []
+
+    def values(self, record):
+        fields = record.get('fields') or {}
+        row = []
+        for field in self.fields:
+            if field.primary_key:
+                value = record.get('pk')
+            else:
+                value = fields.get(field.name, _MISSING)
+                if value is _MISSING:
+                    value = field.get_default()
+            row.append(value)
+        return row
+
+
+class NativeLoader:
+    """
+    تحميل أقسام النسخة بأسرع مسار متاح لقاعدة البيانات الحالية.
+    يجب استدعاء load() لكل ملف ثم finish() داخل نفس المعاملة (transaction).
+    """
+
+    def __init__(self, batch_size=NATIVE_BATCH_SIZE, defer_indexes=True):
+        self.batch_size = batch_size
+        self.defer_indexes = defer_indexes
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        self.vendor = self.connection.vendor
+        self.counts = {}
+        self._plans = {}
+        self._importer = BackupImporter()
+        self._protected_user_ids = None
+
+    @property
+    def errors(self):
+        return self._importer.errors
+
+    def _plan(self, section):
+        if section not in self._plans:
+            self._plans[section] = _TablePlan(SECTION_MODELS[section], self.connection)
+        return self._plans[section]
+
+    # ---------- التحميل ----------
+
+    def load(self, events):
+        """استهلاك أحداث ملف واحد (من iter_backup_events) وكتابة السجلات على دفعات"""
+        # فراغ الجدول يُفحص من جديد لكل ملف: بعد النسخة الكاملة تحمل التفاضلية سجلات معدلة لمعرفات موجودة
+        # فتحتاج مسار الدمج (ON CONFLICT) وليس COPY المباشر
+        for plan in self._plans.values():
+            plan.was_empty = None
+        batches = {}
+        deletions = []
+        for kind, section, value in events:
+            if kind != 'record':
+                continue
+            if section == 'deleted':
+                deletions.append(value)
+                continue
+            if deletions:
+                # الحذف قبل أي سجل لأن المعرف قد يُعاد استخدامه
+                self._importer.apply_deletions(deletions)
+                deletions = []
+            if section is None:
+                section = section_for_model(value.get('model') if isinstance(value, dict) else None)
+            if section not in SECTION_MODELS or not isinstance(value, dict):
+                continue
+            if section == 'user_profiles' and self._is_protected_profile(value):
+                continue
+            batch = batches.setdefault(section, [])
+            batch.append(self._plan(section).values(value))
+            if len(batch) >= self.batch_size:
+                self._write(section, batch)
+                batches[section] = []
+        if deletions:
+            self._importer.apply_deletions(deletions)
+        for section in IMPORT_ORDER:
+            if batches.get(section):
+                self._write(section, batches[section])
+        self.counts['deleted'] = self._importer.counts.get('deleted', 0)
+
+    def _is_protected_profile(self, record):
+        if self._protected_user_ids is None:
+            self._protected_user_ids = set(
+                User.objects.filter(models.Q(username=PROTECTED_USERNAME) | models.Q(is_superuser=True))
+                .values_list('pk', flat=True)
+            )
+        return (record.get('fields') or {}).get('user') in self._protected_user_ids
+
+    def _write(self, section, rows):
+        plan = self._plan(section)
+        with self.connection.cursor() as cursor:
+            if plan.was_empty is None:
+                cursor.execute(f'SELECT 1 FROM {self.connection.ops.quote_name(plan.table)} LIMIT 1')
+                plan.was_empty = cursor.fetchone() is None
+                if plan.was_empty and not plan.deferred_indexes and self.defer_indexes and self.vendor == 'postgresql':
+                    self._drop_plain_indexes(cursor, plan)
+            if self.vendor == 'postgresql':
+                self._copy(cursor, plan, rows)
+            else:
+                self._executemany(cursor, plan, rows)
+        self.counts[section] = self.counts.get(section, 0) + len(rows)
+
+    def _upsert_sql(self, plan, source):
+        qn = self.connection.ops.quote_name
+        columns = ', '.join(qn(c) for c in plan.columns)
+        updates = ', '.join(f'{qn(c)} = EXCLUDED.{qn(c)}' for c in plan.columns if c != plan.pk_column)
+        return (
+            f'INSERT INTO {qn(plan.table)} ({columns}) {source} '
+            f'ON CONFLICT ({qn(plan.pk_column)}) DO UPDATE SET {updates}'
+        )
+
+    def _executemany(self, cursor, plan, rows):
+        for row in rows:
+            for index, convert in plan.converters:
+                row[index] = convert(row[index])
+        placeholders = ', '.join(['%s'] * len(plan.columns))
+        cursor.executemany(self._upsert_sql(plan, f'VALUES ({placeholders})'), rows)
+
+    def _copy(self, cursor, plan, rows):
+        qn = self.connection.ops.quote_name
+        lines = (copy_line([copy_value(f, v) for f, v in zip(plan.fields, row)]) for row in rows)
+        stream = io.BufferedReader(_LineStream(lines), buffer_size=256 * 1024)
+        columns = ', '.join(qn(c) for c in plan.columns)
+        if plan.was_empty:
+            cursor.copy_expert(f'COPY {qn(plan.table)} ({columns}) FROM STDIN WITH (FORMAT csv)', stream)
+            return
+        # الجدول يحتوي بيانات: COPY إلى جدول مؤقت ثم دمج بـ ON CONFLICT
+        stage = qn(f'stage_{plan.table}')
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {qn(plan.table)} INCLUDING DEFAULTS) ON COMMIT DROP'
+        )
+        cursor.execute(f'TRUNCATE {stage}')
+        cursor.copy_expert(f'COPY {stage} ({columns}) FROM STDIN WITH (FORMAT csv)', stream)
+        cursor.execute(self._upsert_sql(plan, f'SELECT {columns} FROM {stage}'))
+
+    def _drop_plain_indexes(self, cursor, plan):
+        """حذف الفهارس العادية (غير الفريدة وغير المفتاح الأساسي) مؤقتاً وحفظ تعريفها لإعادة بنائها"""
+        constraints = self.connection.introspection.get_constraints(cursor, plan.table)
+        plain = [
+            name for name, info in constraints.items()
+            if info['index'] and not info['unique'] and not info['primary_key']
+        ]
+        if not plain:
+            return
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname = ANY(%s)',
+            [plan.table, plain],
+        )
+        plan.deferred_indexes = cursor.fetchall()
+        for name, _ in plan.deferred_indexes:
+            cursor.execute(f'DROP INDEX {self.connection.ops.quote_name(name)}')
+
+    # ---------- الإنهاء ----------
+
+    def finish(self):
+        """
+        إعادة بناء الفهارس، إصلاح المراجع، إعادة ضبط التسلسلات، ثم التحقق من القيود قبل الإيداع.
+        الكتابة المباشرة لا تمر بإشارات الطلبيات، فتُعاد بناء أسطرها وإحصائياتها إن حُمّلت طلبيات.
+        """
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            for plan in self._plans.values():
+                for _, definition in plan.deferred_indexes:
+                    cursor.execute(definition)
+                plan.deferred_indexes = []
+            for plan in self._plans.values():
+                for field in plan.fields:
+                    if not isinstance(field, models.ForeignKey):
+                        continue
+                    target = field.related_model._meta
+                    orphan = (
+                        f'{qn(field.column)} IS NOT NULL AND {qn(field.column)} NOT IN '
+                        f'(SELECT {qn(target.pk.column)} FROM {qn(target.db_table)})'
+                    )
+                    if field.related_model is User:
+                        # مستخدمون غير مفعّلين للحفاظ على تكامل البيانات (كما في الاستيراد العادي)
+                        cursor.execute(f'SELECT DISTINCT {qn(field.column)} FROM {qn(plan.table)} WHERE {orphan}')
+                        missing = [row[0] for row in cursor.fetchall()]
+                        User.objects.bulk_create(
+                            [User(pk=uid, username=f'imported_user_{uid}', is_active=False) for uid in missing],
+                            ignore_conflicts=True,
+                        )
+                    elif field.null:
+                        # المرجع المفقود يُفرغ إن كان الحقل يقبل NULL
+                        cursor.execute(f'UPDATE {qn(plan.table)} SET {qn(field.column)} = NULL WHERE {orphan}')
+        models_list = [plan.model for plan in self._plans.values()] + [User]
+        reset_sequences(models_list)
+        self.connection.check_constraints(table_names=[plan.table for plan in self._plans.values()])
+        if self.counts.get('orders'):
+            rebuild_order_lines()
+            rebuild_order_stats()
@@ -0,0 +1,109 @@
+"""
+أسطر الطلبيات المفهرسة (OrderLine).
+- كل منتج مسحوب في طلبية يُكتب كسطر (رقم المنتج، الكمية، المستلم، التاريخ) في نفس معاملة حفظ الطلبية
+  (إشارة post_save: confirm_products والاستعادة)، فيصبح سجل المنتج والمستلم استعلاماً تجميعياً مفهرساً
+  بدلاً من فحص products_data لكل الطلبيات.
+- products_data يبقى المصدر الأصلي (تفاصيل الطلبية، PDF، النسخ الاحتياطي)؛ الأسطر تُعاد بناؤها منه
+  بعد الاستيراد المجمّع وبأمر rebuild_order_lines.
+"""
+import json
+
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Order, OrderLine
+
+
+ORDER_LINES_BATCH_SIZE = 1000
+
+
+def order_items(products_data):
+    """(رقم المنتج، الاسم، الكمية) لكل منتج مسحوب فعلاً في products_data (قائمة أو نص JSON)"""
+    if isinstance(products_data, str):
+        try:
+            products_data = json.loads(products_data)
+        except ValueError:
+            return []
+    if not isinstance(products_data, list):
+        return []
+    items = []
+    for item in products_data:
+        if not isinstance(item, dict):
+            continue
+        number = str(item.get('product_number', '') or '').strip()
+        # قد يكون المفتاح quantity أو quantity_taken حسب إصدار البيانات
+        qty = item.get('quantity_taken')
+        if qty is None:
+            qty = item.get('quantity', 0)
+        try:
+            qty = int(qty or 0)
+        except (ValueError, TypeError):
+            continue
+        if number and qty > 0:
+            items.append((number, str(item.get('name', '') or '')[:200], qty))
+    return items
+
+
+def build_lines(order):
+    """أسطر الطلبية (غير محفوظة)"""
+    return [
+        OrderLine(
+            order_id=order.pk,
+            product_number=number[:50],
+            product_name=name,
+            quantity=qty,
+            recipient_name=order.recipient_name or None,
+            created_at=order.created_at,
+        )
+        for number, name, qty in order_items(order.products_data)
+    ]
+
+
+def create_order_lines(order):
+    """كتابة أسطر طلبية جديدة (في نفس معاملة إنشائها)"""
+    return OrderLine.objects.bulk_create(build_lines(order), batch_size=ORDER_LINES_BATCH_SIZE)
+
+
+def sync_order_lines(orders):
+    """إعادة كتابة أسطر مجموعة طلبيات (بعد الاستيراد أو الاستعادة): حذف مجمّع ثم إدراج مجمّع"""
+    orders = [o for o in orders if o.pk is not None]
+    if not orders:
+        return 0
+    lines = [line for order in orders for line in build_lines(order)]
+    with transaction.atomic():
+        OrderLine.objects.filter(order_id__in=[o.pk for o in orders]).delete()
+        OrderLine.objects.bulk_create(lines, batch_size=ORDER_LINES_BATCH_SIZE)
+    return len(lines)
+
+
+def rebuild_order_lines(batch_size=ORDER_LINES_BATCH_SIZE, progress=None):
+    """إعادة بناء أسطر كل الطلبيات من products_data على دفعات؛ يعيد عدد الأسطر"""
+    orders = Order.objects.order_by('pk').only('pk', 'products_data', 'recipient_name', 'created_at')
+    total = orders.count()
+    written = done = 0
+    batch = []
+    for order in orders.iterator(chunk_size=batch_size):
+        batch.append(order)
+        if len(batch) >= batch_size:
+            written += sync_order_lines(batch)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, total)
+    if batch:
+        written += sync_order_lines(batch)
+        if progress:
+            progress(total, total)
+    return written
+
+
+def product_lines(query):
+    """
+    أسطر الطلبيات لمنتج: الرقم نفسه (دون حساسية لحالة الأحرف) أو جزء من اسم المنتج كما كُتب في الطلبية،
+    فيبقى السجل مطابقاً لما سُحب فعلاً حتى لو تغيّر اسم المنتج لاحقاً.
+    """
+    query = str(query or '').strip()
+    if not query:
+        return OrderLine.objects.none()
+    # بحث دقيق لرقم المنتج (مثل orders_list) أو جزئي لاسمه
+    return OrderLine.objects.filter(Q(product_number__iexact=query) | Q(product_name__icontains=query))
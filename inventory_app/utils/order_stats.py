@@ -0,0 +1,85 @@
+"""
+إحصائيات الطلبيات التراكمية (لكل يوم ولكل مستلم).
+- تُحدَّث في نفس معاملة إنشاء الطلبية أو حذفها (إشارات post_save / post_delete) بتحديث ذري F()،
+  فتقرأ صفحة الطلبيات وواجهة المستلمين صفوفاً مجمّعة مسبقاً بدلاً من تجميع جدول الطلبيات في كل طلب.
+- الكتابة المجمّعة (استيراد النسخ الاحتياطي) لا تمر بالإشارات: تُعاد بناء الإحصائيات بعدها
+  بـ rebuild_order_stats (وأيضاً بأمر rebuild_order_lines).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import Order, OrderDailyStat, OrderRecipientStat
+
+
+def _bump(model, lookup, orders, quantity):
+    """إضافة (أو طرح) عدد وكمية لصف إحصائية بشكل ذري، وحذف الصف إن لم تبق له طلبيات"""
+    rows = model.objects.filter(**lookup)
+    if not rows.update(orders=F('orders') + orders, quantity=F('quantity') + quantity):
+        if orders <= 0:
+            return
+        row, created = model.objects.get_or_create(**lookup, defaults={'orders': orders, 'quantity': quantity})
+        if not created:
+            rows.update(orders=F('orders') + orders, quantity=F('quantity') + quantity)
+    if orders < 0:
+        rows.filter(orders__lte=0).delete()
+
+
+def record_order(order, sign=1):
+    """تسجيل طلبية منشأة (sign=1) أو محذوفة (sign=-1) في إحصائيات يومها ومستلمها"""
+    quantity = sign * (order.total_quantities or 0)
+    created_at = order.created_at or timezone.now()
+    _bump(OrderDailyStat, {'date': timezone.localdate(created_at)}, sign, quantity)
+    if order.recipient_name:
+        _bump(OrderRecipientStat, {'recipient_name': order.recipient_name}, sign, quantity)
+
+
+def rebuild_order_stats():
+    """إعادة بناء الإحصائيات من جدول الطلبيات (بعد الاستيراد المجمّع أو للإصلاح)"""
+    days = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(n=Count('id'), qty=Coalesce(Sum('total_quantities'), 0))
+        .order_by()
+    )
+    recipients = (
+        Order.objects.exclude(recipient_name__isnull=True)
+        .exclude(recipient_name='')
+        .values('recipient_name')
+        .annotate(n=Count('id'), qty=Coalesce(Sum('total_quantities'), 0))
+        .order_by()
+    )
+    with transaction.atomic():
+        OrderDailyStat.objects.all().delete()
+        OrderRecipientStat.objects.all().delete()
+        OrderDailyStat.objects.bulk_create([
+            OrderDailyStat(date=d['day'], orders=d['n'], quantity=d['qty']) for d in days
+        ], batch_size=1000)
+        OrderRecipientStat.objects.bulk_create([
+            OrderRecipientStat(recipient_name=r['recipient_name'], orders=r['n'], quantity=r['qty'])
+            for r in recipients
+        ], batch_size=1000)
+
+
+# ---------- القراءة ----------
+
+def order_totals():
+    """(عدد الطلبيات، طلبيات اليوم، مجموع الكميات المسحوبة)"""
+    totals = OrderDailyStat.objects.aggregate(orders=Sum('orders'), quantity=Sum('quantity'))
+    today = OrderDailyStat.objects.filter(date=timezone.localdate()).values_list('orders', flat=True).first()
+    return totals['orders'] or 0, today or 0, totals['quantity'] or 0
+
+
+def daily_series(days=30):
+    """صفوف الأيام الأخيرة (منذ days يوماً) بالترتيب الزمني"""
+    since = timezone.localdate(timezone.now() - timedelta(days=days))
+    return OrderDailyStat.objects.filter(date__gte=since, orders__gt=0).order_by('date')
+
+
+def recipient_stats(limit=None):
+    """المستلمون مرتبون حسب عدد الطلبيات"""
+    rows = OrderRecipientStat.objects.filter(orders__gt=0).order_by('-orders', 'recipient_name')
+    return rows[:limit] if limit else rows
@@ -0,0 +1,221 @@
+"""
+إنشاء PDF قائمة المنتجات على أجزاء.
+- المنتجات تُقرأ بـ iterator وتُقسم إلى أجزاء من PDF_CHUNK_ROWS صف؛ كل جزء يُنشأ كملف PDF مستقل
+  ثم تُدمج الأجزاء بـ pypdf، فلا يُبنى HTML أو جدول واحد لكل المنتجات.
+- reportlab: الأجزاء تُنشأ بالتوازي في مجمع عمليات (PDF_RENDER_WORKERS).
+- chromium: الأجزاء تُرسل بالتوازي إلى خدمة PDF إن كانت مضبوطة (بعدد متصفحاتها)، وإلا تُنشأ بالتسلسل
+  بمتصفح واحد يُعاد استخدامه لكل الأجزاء.
+- عدد الأجزاء قيد الإنشاء محدود (ضعف عدد العمال) فلا تتراكم الصفوف في الذاكرة، و progress(done, total)
+  يُستدعى بعد كل جزء (مهمة products_pdf الخلفية).
+"""
+import io
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from html import escape
+
+from django.conf import settings
+
+from ..models import Product
+from .streaming import ITERATOR_CHUNK_SIZE
+
+
+PDF_CHUNK_ROWS = 1000
+NO_LOCATION = 'بدون موقع'
+CHROMIUM_PRODUCTS_OPTIONS = {
+    'format': 'A4',
+    'landscape': True,
+    'margin': {'top': '1cm', 'right': '1cm', 'bottom': '1cm', 'left': '1cm'},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chunk_rows():
+    return max(1, getattr(settings, 'PDF_CHUNK_ROWS', PDF_CHUNK_ROWS) or PDF_CHUNK_ROWS)
+
+
+def render_workers():
+    return getattr(settings, 'PDF_RENDER_WORKERS', 0) or min(4, os.cpu_count() or 1)
+
+
+def _render_pool():
+    """مجمع عمليات مشترك لأجزاء reportlab (spawn: لا ترث اتصالات قاعدة البيانات)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=render_workers(), mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ---------- الصفوف والأجزاء ----------
+
+def product_pdf_rows():
+    """صفوف [#, رقم المنتج، الاسم، الفئة، الكمية، الموقع] بالترتيب حسب رقم المنتج"""
+    products = Product.objects.order_by('product_number').values_list(
+        'product_number', 'name', 'category', 'quantity', 'location__row', 'location__column',
+    )
+    for idx, (number, name, category, quantity, row, column) in enumerate(
+        products.iterator(chunk_size=ITERATOR_CHUNK_SIZE), start=1
+    ):
+        location = f'R{row}C{column}' if row is not None else NO_LOCATION
+        yield (idx, number, name, category or '-', quantity, location)
+
+
+def iter_parts(rows, size):
+    """
+    (rows, first, last) لكل جزء. الجزء يُرسل بعد قراءة ما يليه ليُعرف الأخير بدقة
+    (جزء واحد فارغ إن لم توجد منتجات: العنوان والإجمالي).
+    """
+    previous, chunk, first = None, [], True
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            if previous is not None:
+                yield previous, first, False
+                first = False
+            previous, chunk = chunk, []
+    if chunk:
+        if previous is not None:
+            yield previous, first, False
+            first = False
+        previous = chunk
+    yield previous or [], first, True
+
+
+def products_html(rows, total, generated_at, first=True, last=True):
+    """HTML جزء من قائمة المنتجات لمحرك المتصفح"""
+    parts = ['''<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+<meta charset="UTF-8">
+<style>
+    * { margin: 0; padding: 0; box-sizing: border-box; }
+    body { font-family: 'Segoe UI', 'Arial', 'Tahoma', sans-serif; font-size: 10pt; direction: rtl; padding: 20px; }
+    .header { text-align: center; color: #667eea; font-size: 28pt; font-weight: bold; margin-bottom: 20px; }
+    .info { text-align: center; margin-bottom: 20px; font-size: 11pt; color: #374151; }
+    table { width: 100%; border-collapse: collapse; margin: 0 auto; }
+    th { background-color: #667eea; color: white; padding: 12px 8px; text-align: right; font-weight: bold; border: 1px solid #555; font-size: 11pt; }
+    td { padding: 8px; border: 1px solid #ddd; text-align: right; font-size: 9pt; }
+    tr:nth-child(even) { background-color: #f8fafc; }
+    .summary { margin-top: 20px; text-align: right; font-weight: bold; font-size: 12pt; color: #374151; }
+</style>
+</head>
+<body>
+''']
+    if first:
+        parts.append(f'''<div class="header">قائمة المنتجات</div>
+<div class="info">
+    <strong>التاريخ:</strong> {generated_at:%Y-%m-%d} |
+    <strong>الوقت:</strong> {generated_at:%H:%M}
+</div>
+''')
+    parts.append('''<table>
+    <thead>
+        <tr><th>#</th><th>رقم المنتج</th><th>الاسم</th><th>الفئة</th><th>الكمية</th><th>الموقع</th></tr>
+    </thead>
+    <tbody>
+''')
+    parts.extend(
+        '<tr>' + ''.join(f'<td>{escape(str(value))}</td>' for value in row) + '</tr>\n'
+        for row in rows
+    )
+    parts.append('    </tbody>\n</table>\n')
+    if last:
+        parts.append(f'<div class="summary">إجمالي المنتجات: {total}</div>\n')
+    parts.append('</body>\n</html>\n')
+    return ''.join(parts)
+
+
+# ---------- الإنشاء والدمج ----------
+
+def _bounded_map(executor, fn, items, limit):
+    """نتائج fn(*item) بنفس الترتيب مع إبقاء limit مهام على الأكثر قيد التنفيذ"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, *item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def merge_pdfs(parts, progress=None, total=None):
+    """دمج أجزاء PDF (bytes) بالترتيب في ملف واحد"""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for done, part in enumerate(parts, start=1):
+        writer.append(io.BytesIO(part))
+        if progress:
+            progress(done, total)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _reportlab_parts(parts, total, generated_at):
+    from .pdf_native import products_pdf_part
+
+    items = ((rows, total, generated_at, first, last) for rows, first, last in parts)
+    if render_workers() <= 1:
+        return (products_pdf_part(*item) for item in items)
+    return _bounded_map(_render_pool(), products_pdf_part, items, render_workers() * 2)
+
+
+def _chromium_parts(parts, total, generated_at):
+    from .pdf_service import ChromiumRenderer, render_pdf
+
+    def html(rows, first, last):
+        return products_html(rows, total, generated_at, first, last)
+
+    if getattr(settings, 'PDF_SERVICE_ADDRESS', ''):
+        workers = max(1, getattr(settings, 'PDF_SERVICE_BROWSERS', 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from _bounded_map(
+                executor, lambda *part: render_pdf(html(*part), **CHROMIUM_PRODUCTS_OPTIONS), parts, workers * 2
+            )
+        return
+    renderer = ChromiumRenderer()
+    try:
+        for part in parts:
+            yield renderer.render(html(*part), CHROMIUM_PRODUCTS_OPTIONS)
+    finally:
+        renderer.close()
+
+
+def render_products_pdf(engine='chromium', progress=None):
+    """PDF قائمة المنتجات كاملة (bytes) بالمحرك المحدد، جزءاً جزءاً"""
+    total = Product.objects.count()
+    size = chunk_rows()
+    chunks = max(1, (total + size - 1) // size)
+    generated_at = datetime.now()
+    parts = iter_parts(product_pdf_rows(), size)
+
+    if engine != 'reportlab':
+        return merge_pdfs(_chromium_parts(parts, total, generated_at), progress, chunks)
+    try:
+        return merge_pdfs(_reportlab_parts(parts, total, generated_at), progress, chunks)
+    except BrokenProcessPool:
+        # عملية توقفت (ذاكرة / إنهاء): إعادة المحاولة بالتسلسل داخل العملية الحالية
+        _reset_pool()
+        from .pdf_native import products_pdf_part
+
+        parts = iter_parts(product_pdf_rows(), size)
+        return merge_pdfs(
+            (products_pdf_part(rows, total, generated_at, first, last) for rows, first, last in parts),
+            progress, chunks,
+        )
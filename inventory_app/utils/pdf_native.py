@@ -0,0 +1,264 @@
+"""
+محرك PDF بدون متصفح (ReportLab) لقائمة المنتجات وتفاصيل الطلبية.
+- النص العربي يُشكَّل بـ arabic_reshaper ثم يُرتب للعرض بـ bidi، والجداول بـ platypus
+  (أعمدة معكوسة لتبدأ من اليمين، و LongTable للقوائم الطويلة).
+- يحتاج خطاً TTF يحتوي الحروف العربية: PDF_FONT_PATH / PDF_FONT_BOLD_PATH أو أول خط متوفر من PDF_FONT_CANDIDATES.
+- المحرك يُختار لكل طلب (engine=reportlab|chromium) أو بالإعداد PDF_ENGINE.
+"""
+import io
+import logging
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+PDF_ENGINES = ('chromium', 'reportlab')
+PDF_FONT_NAME = 'InventoryArabic'
+PDF_FONT_BOLD_NAME = 'InventoryArabic-Bold'
+# (عادي، عريض) بالترتيب؛ static/fonts داخل المشروع أولاً ثم خطوط النظام
+PDF_FONT_CANDIDATES = (
+    ('static/fonts/Amiri-Regular.ttf', 'static/fonts/Amiri-Bold.ttf'),
+    ('static/fonts/NotoNaskhArabic-Regular.ttf', 'static/fonts/NotoNaskhArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf', '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf', '/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('C:/Windows/Fonts/tahoma.ttf', 'C:/Windows/Fonts/tahomabd.ttf'),
+    ('C:/Windows/Fonts/arial.ttf', 'C:/Windows/Fonts/arialbd.ttf'),
+)
+
+PAGE_MARGIN = 28  # ~1cm
+ORDER_IMAGE_SIZE = 38  # ~50px
+
+RTL_CHARS = re.compile('[\u0590-\u08ff\ufb1d-\ufdff\ufe70-\ufefc]')
+
+_fonts = None
+_arabic_reshaper = None
+
+
+def pdf_engine(requested=None):
+    """المحرك المطلوب إن كان صالحاً، وإلا PDF_ENGINE، وإلا chromium"""
+    for engine in (requested, getattr(settings, 'PDF_ENGINE', '')):
+        engine = (engine or '').strip().lower()
+        if engine in PDF_ENGINES:
+            return engine
+    return 'chromium'
+
+
+def _font_paths():
+    configured = getattr(settings, 'PDF_FONT_PATH', '')
+    if configured:
+        yield configured, getattr(settings, 'PDF_FONT_BOLD_PATH', '') or configured
+    for regular, bold in PDF_FONT_CANDIDATES:
+        if not os.path.isabs(regular):
+            regular, bold = os.path.join(settings.BASE_DIR, regular), os.path.join(settings.BASE_DIR, bold)
+        yield regular, bold
+
+
+def fonts():
+    """تسجيل الخط مرة واحدة لكل عملية: (عادي، عريض). عند عدم توفر خط عربي يُستخدم Helvetica"""
+    global _fonts
+    if _fonts is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        _fonts = ('Helvetica', 'Helvetica-Bold')
+        for regular, bold in _font_paths():
+            if not os.path.exists(regular):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, regular))
+                pdfmetrics.registerFont(TTFont(PDF_FONT_BOLD_NAME, bold if os.path.exists(bold) else regular))
+            except Exception as e:
+                logger.warning(f'PDF font {regular} could not be loaded: {e}')
+                continue
+            _fonts = (PDF_FONT_NAME, PDF_FONT_BOLD_NAME)
+            break
+        else:
+            logger.warning('No Arabic TTF font found for ReportLab PDFs (set PDF_FONT_PATH)')
+    return _fonts
+
+
+def _reshaper():
+    """
+    ArabicReshaper مشترك. arabic_reshaper 3.0 يعيد بناء تعبير الحروف المركبة (ligatures) في كل استدعاء
+    (hasattr على اسم خاص مشوه)، فيُبنى هنا مرة واحدة ويُعلَّم كموجود.
+    """
+    global _arabic_reshaper
+    if _arabic_reshaper is None:
+        import arabic_reshaper
+
+        reshaper = arabic_reshaper.ArabicReshaper()
+        reshaper._ligatures_re
+        setattr(reshaper, '__ligatures_re', True)
+        _arabic_reshaper = reshaper
+    return _arabic_reshaper
+
+
+@lru_cache(maxsize=4096)
+def _shape(text):
+    from bidi.algorithm import get_display
+
+    return get_display(_reshaper().reshape(text))
+
+
+def ar(text):
+    """تشكيل الحروف العربية وترتيبها للعرض من اليسار (ReportLab لا يدعم RTL)"""
+    text = '' if text is None else str(text)
+    return _shape(text) if RTL_CHARS.search(text) else text
+
+
+def _styles():
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+    from reportlab.lib.styles import ParagraphStyle
+
+    regular, bold = fonts()
+    return {
+        'title': ParagraphStyle('title', fontName=bold, fontSize=22, leading=28, alignment=TA_CENTER,
+                                textColor='#667eea', spaceAfter=10),
+        'subtitle': ParagraphStyle('subtitle', fontName=bold, fontSize=16, leading=22, alignment=TA_CENTER,
+                                   textColor='#1e293b', spaceAfter=10),
+        'info': ParagraphStyle('info', fontName=regular, fontSize=11, leading=15, alignment=TA_CENTER,
+                               textColor='#374151', spaceAfter=12),
+        'section': ParagraphStyle('section', fontName=bold, fontSize=13, leading=18, alignment=TA_RIGHT,
+                                  textColor='#1e293b', spaceBefore=12, spaceAfter=6),
+        'summary': ParagraphStyle('summary', fontName=bold, fontSize=12, leading=16, alignment=TA_RIGHT,
+                                  textColor='#374151', spaceBefore=12),
+    }
+
+
+def _paragraph(text, style):
+    from reportlab.platypus import Paragraph
+    from xml.sax.saxutils import escape
+
+    return Paragraph(escape(ar(text)), style)
+
+
+def _rtl_table(rows, widths, header_color, stripe_color, border_color, font_size, table_class=None):
+    """جدول بأعمدة معكوسة (العمود الأول في أقصى اليمين) مع صف عنوان يتكرر في كل صفحة"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    regular, bold = fonts()
+    table = (table_class or Table)([list(reversed(row)) for row in rows], colWidths=list(reversed(widths)),
+                                   repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), regular),
+        ('FONTNAME', (0, 0), (-1, 0), bold),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor(stripe_color)]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(border_color)),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ]))
+    return table
+
+
+def _build(story, pagesize, title):
+    from reportlab.platypus import SimpleDocTemplate
+
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=pagesize, title=title, leftMargin=PAGE_MARGIN,
+                            rightMargin=PAGE_MARGIN, topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
+    doc.build(story)
+    return output.getvalue()
+
+
+# ---------- قائمة المنتجات ----------
+
+def products_pdf_part(rows, total, generated_at, first=True, last=True):
+    """
+    جزء من PDF قائمة المنتجات (A4 أفقي، نفس أعمدة نسخة المتصفح). rows: صفوف
+    [#, رقم المنتج، الاسم، الفئة، الكمية، الموقع]؛ العنوان في الجزء الأول والإجمالي في الأخير.
+    لا يستخدم قاعدة البيانات، فيعمل في عمليات مجمع الإنشاء المتوازي (utils/pdf_chunks.py).
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import LongTable
+
+    styles = _styles()
+    table = [[ar(h) for h in ('#', 'رقم المنتج', 'الاسم', 'الفئة', 'الكمية', 'الموقع')]]
+    table.extend([str(idx), ar(number), ar(name), ar(category), str(quantity), ar(location)]
+                 for idx, number, name, category, quantity, location in rows)
+
+    story = []
+    if first:
+        story.append(_paragraph('قائمة المنتجات', styles['title']))
+        story.append(_paragraph(f'التاريخ: {generated_at:%Y-%m-%d} | الوقت: {generated_at:%H:%M}', styles['info']))
+    story.append(_rtl_table(table, [35, 130, 280, 140, 80, 120], '#667eea', '#f8fafc', '#cccccc', 9, LongTable))
+    if last:
+        story.append(_paragraph(f'إجمالي المنتجات: {total}', styles['summary']))
+    return _build(story, landscape(A4), 'قائمة المنتجات')
+
+
+# ---------- تفاصيل الطلبية ----------
+
+def _order_image(product):
+    """صورة المنتج المحلية (المصغرة إن وجدت) بنسبتها، أو '-' (روابط الصور الخارجية لا تُجلب)"""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image
+
+    from .thumbnails import image_source
+
+    path = image_source(product) if product else None
+    if not path:
+        return '-'
+    try:
+        width, height = ImageReader(path).getSize()
+        scale = ORDER_IMAGE_SIZE / max(width, height, 1)
+        return Image(path, width=width * scale, height=height * scale)
+    except Exception:
+        return '-'
+
+
+def order_pdf(order, products_map):
+    """PDF تفاصيل الطلبية (A4). products_map: {رقم المنتج: Product} لمنتجات الطلبية"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Table, TableStyle
+
+    styles = _styles()
+    regular, bold = fonts()
+
+    info = [
+        ('اسم المستلم:', order.recipient_name or '-', 'رقم الطلبية:', order.order_number),
+        ('عدد المنتجات:', f'{order.total_products} منتج', 'إجمالي الكميات المسحوبة:', f'{order.total_quantities} حبة'),
+        ('تاريخ وساعة السحب:', order.created_at.strftime('%Y-%m-%d %H:%M'), '', ''),
+    ]
+    info_table = Table([[ar(v) for v in reversed(row)] for row in info], colWidths=[90, 130, 110, 125])
+    info_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), bold),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#64748b')),
+        ('TEXTCOLOR', (3, 0), (3, -1), colors.HexColor('#64748b')),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8fafc')),
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+
+    rows = [[ar(h) for h in ('#', 'رقم المنتج', 'الصورة', 'السعر', 'الكمية المسحوبة')]]
+    for idx, item in enumerate(order.products_data, start=1):
+        num = item.get('product_number')
+        product = products_map.get(num)
+        price = float(product.price) if product and product.price is not None else 0
+        rows.append([str(idx), ar(num), _order_image(product), str(price), str(item.get('quantity_taken'))])
+    width = A4[0] - 2 * PAGE_MARGIN
+    products_table = _rtl_table(rows, [width * 0.1, width * 0.3, width * 0.2, width * 0.2, width * 0.2],
+                                '#1e293b', '#f1f5f9', '#cbd5e1', 10)
+    products_table.setStyle(TableStyle([('ALIGN', (0, 0), (-2, -1), 'CENTER')]))
+
+    story = [
+        _paragraph('تفاصيل الطلبية', styles['subtitle']),
+        info_table,
+        _paragraph('المنتجات في هذه الطلبية:', styles['section']),
+        products_table,
+    ]
+    return _build(story, A4, f'طلبية {order.order_number}')
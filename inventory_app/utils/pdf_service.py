@@ -0,0 +1,209 @@
+"""
+خدمة إنشاء PDF بمتصفح Chromium دائم (أمر run_pdf_service).
+- الخدمة عملية مستقلة عن عمال الويب: عدد ثابت من المتصفحات (PDF_SERVICE_BROWSERS)، لكل متصفح خيط
+  وصفحة يُعاد استخدامها، وطابور محدود (PDF_SERVICE_QUEUE) يرفض الطلبات الزائدة بدلاً من تشغيل متصفحات جديدة.
+- عمال الويب يرسلون HTML عبر multiprocessing.connection (مع authkey) ويستلمون bytes الـ PDF.
+- إن لم تُضبط PDF_SERVICE_ADDRESS أو تعذر الاتصال بالخدمة يُنشأ الـ PDF داخل الطلب كما في السابق.
+"""
+import hashlib
+import logging
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+PDF_SERVICE_QUEUE = 16
+PDF_SERVICE_TIMEOUT = 120  # ثوانٍ انتظار الطلب في الطابور وأثناء الإنشاء
+PAGE_RECYCLE_RENDERS = 200  # إعادة إنشاء الصفحة بعد عدد من الاستخدامات (تحرير الذاكرة)
+
+
+class PdfServiceError(Exception):
+    """خطأ من خدمة PDF (الطابور ممتلئ، انتهاء المهلة، أو فشل الإنشاء)"""
+
+
+def _authkey():
+    key = getattr(settings, 'PDF_SERVICE_AUTHKEY', '') or settings.SECRET_KEY
+    return hashlib.sha256(f'pdf-service:{key}'.encode('utf-8')).digest()
+
+
+def parse_address(address):
+    """'host:port' -> (host, port)، وأي قيمة أخرى تُعامل كمسار unix socket"""
+    address = (address or '').strip()
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+# ---------- المتصفح ----------
+
+class ChromiumRenderer:
+    """متصفح Chromium واحد مع صفحة يُعاد استخدامها؛ يُستخدم من خيط واحد فقط (Playwright sync)"""
+
+    def __init__(self):
+        from playwright.sync_api import sync_playwright
+
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True)
+        self._page = None
+        self._renders = 0
+
+    def render(self, html, options):
+        if self._page is None or self._renders >= PAGE_RECYCLE_RENDERS:
+            if self._page is not None:
+                self._page.close()
+            self._page = self._browser.new_page()
+            self._renders = 0
+        self._renders += 1
+        try:
+            self._page.set_content(html)
+            return self._page.pdf(**options)
+        except Exception:
+            # صفحة في حالة غير معروفة: تُستبدل في الطلب التالي
+            self._page = None
+            raise
+
+    def close(self):
+        for close in (lambda: self._browser.close(), lambda: self._playwright.stop()):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+def render_pdf_inline(html, options):
+    """إنشاء PDF داخل العملية الحالية بمتصفح مؤقت (بدون الخدمة)"""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            page = browser.new_page()
+            page.set_content(html)
+            return page.pdf(**options)
+        finally:
+            browser.close()
+
+
+# ---------- الخدمة ----------
+
+class PdfService:
+    """
+    خادم الخدمة: خيط استقبال لكل اتصال يضع الطلب في الطابور المحدود، وخيط لكل متصفح
+    ينفذ الطلبات بالترتيب. renderer_factory قابلة للاستبدال (الاختبارات).
+    """
+
+    def __init__(self, address, browsers=1, queue_size=PDF_SERVICE_QUEUE, renderer_factory=ChromiumRenderer,
+                 timeout=PDF_SERVICE_TIMEOUT):
+        self.listener = Listener(parse_address(address), authkey=_authkey())
+        self.address = self.listener.address
+        self.browsers = max(1, browsers)
+        self.jobs = queue.Queue(maxsize=max(1, queue_size))
+        self.renderer_factory = renderer_factory
+        self.timeout = timeout
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for index in range(self.browsers):
+            self._spawn(self._browser_loop, f'pdf-browser-{index}')
+        self._spawn(self._accept_loop, 'pdf-accept')
+        return self
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _browser_loop(self):
+        renderer = None
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    html, options, reply = self.jobs.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
+                    if renderer is None:
+                        renderer = self.renderer_factory()
+                    reply.put({'pdf': renderer.render(html, options)})
+                except Exception as e:
+                    logger.error(f'PDF render error: {e}', exc_info=True)
+                    reply.put({'error': str(e)})
+                    # متصفح متعطل: يُعاد تشغيله في الطلب التالي
+                    if renderer is not None:
+                        renderer.close()
+                    renderer = None
+        finally:
+            if renderer is not None:
+                renderer.close()
+
+    def _accept_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self.stop_event.is_set():
+                    break
+                continue
+            except Exception as e:
+                # فشل المصادقة أو اتصال مقطوع
+                logger.warning(f'PDF service rejected connection: {e}')
+                continue
+            self._spawn(lambda conn=conn: self._handle(conn), 'pdf-conn')
+            self.threads = [t for t in self.threads if t.is_alive()]
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                request = conn.recv()
+                reply = queue.Queue(maxsize=1)
+                try:
+                    self.jobs.put_nowait((request['html'], request.get('options') or {}, reply))
+                except queue.Full:
+                    conn.send({'error': 'busy'})
+                    return
+                try:
+                    conn.send(reply.get(timeout=self.timeout))
+                except queue.Empty:
+                    conn.send({'error': 'timeout'})
+            except (EOFError, OSError):
+                pass
+
+    def stop(self):
+        self.stop_event.set()
+        self.listener.close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+# ---------- العميل ----------
+
+def request_pdf(html, options, address=None, timeout=PDF_SERVICE_TIMEOUT):
+    """إرسال طلب إلى الخدمة؛ يرفع PdfServiceError عند رفض الخدمة أو فشل الإنشاء"""
+    conn = Client(parse_address(address or settings.PDF_SERVICE_ADDRESS), authkey=_authkey())
+    with conn:
+        conn.send({'html': html, 'options': options})
+        if not conn.poll(timeout):
+            raise PdfServiceError('timeout')
+        response = conn.recv()
+    if 'error' in response:
+        raise PdfServiceError(response['error'])
+    return response['pdf']
+
+
+def render_pdf(html, **options):
+    """
+    إنشاء PDF من HTML (خيارات page.pdf في Playwright).
+    عبر الخدمة إن كانت مضبوطة ومتاحة، وإلا داخل الطلب.
+    """
+    if getattr(settings, 'PDF_SERVICE_ADDRESS', ''):
+        try:
+            return request_pdf(html, options)
+        except (ConnectionError, FileNotFoundError, EOFError) as e:
+            logger.warning(f'PDF service unavailable, rendering inline: {e}')
+    return render_pdf_inline(html, options)
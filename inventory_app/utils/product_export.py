@@ -0,0 +1,108 @@
+"""
+تصدير قائمة المنتجات (Excel / CSV).
+تُقرأ المنتجات باستعلام values_list واحد مع iterator (الموقع عبر JOIN بدلاً من استعلام لكل منتج)،
+وتُكتب بمصنف write_only بأنماط مسماة مشتركة (NamedStyle) بدلاً من إنشاء Font/Border لكل خلية،
+أو كـ CSV متدفق.
+"""
+import csv
+import tempfile
+
+from ..models import Product
+from .streaming import ITERATOR_CHUNK_SIZE, buffered
+
+
+PRODUCT_EXPORT_HEADERS = ['#', 'رقم المنتج', 'الاسم', 'الفئة', 'الكمية', 'الموقع', 'تاريخ الإضافة']
+PRODUCT_COLUMN_WIDTHS = [5, 15, 25, 15, 15, 10, 12, 15]
+NO_LOCATION = 'لا يوجد موقع'
+
+
+def product_rows(chunk_size=ITERATOR_CHUNK_SIZE):
+    """صفوف التصدير بالترتيب حسب رقم المنتج (نفس أعمدة PRODUCT_EXPORT_HEADERS)"""
+    products = Product.objects.order_by('product_number').values_list(
+        'product_number', 'name', 'category', 'quantity', 'location__row', 'location__column', 'created_at',
+    )
+    for idx, (number, name, category, quantity, row, column, created_at) in enumerate(
+        products.iterator(chunk_size=chunk_size), start=1
+    ):
+        location = f'R{row}C{column}' if row is not None else NO_LOCATION
+        yield [idx, number, name, category or '', quantity, location, created_at.strftime('%Y-%m-%d')]
+
+
+def _named_styles():
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    side = Side(style='thin')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    header = NamedStyle(
+        name='products_header',
+        font=Font(name='Arial', size=12, bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid'),
+        alignment=Alignment(horizontal='right', vertical='center', wrap_text=True),
+        border=border,
+    )
+    body = NamedStyle(
+        name='products_cell',
+        font=Font(name='Arial', size=11),
+        alignment=Alignment(horizontal='right', vertical='center', wrap_text=True),
+        border=border,
+    )
+    return header, body
+
+
+def write_products_xlsx(rows=None):
+    """
+    ملف XLSX بمصنف write_only في ملف مؤقت (يُرسل ثم يُحذف عند إغلاقه).
+    كل الخلايا تشير إلى نمطين مسميين فقط.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    header_style, body_style = _named_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(body_style)
+    ws = wb.create_sheet('المنتجات')
+    for col, width in enumerate(PRODUCT_COLUMN_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    def styled_cells(style):
+        cells = [WriteOnlyCell(ws) for _ in PRODUCT_EXPORT_HEADERS]
+        for cell in cells:
+            cell.style = style
+        return cells
+
+    header_cells = styled_cells(header_style.name)
+    for cell, value in zip(header_cells, PRODUCT_EXPORT_HEADERS):
+        cell.value = value
+    ws.append(header_cells)
+    # الصف يُكتب فور append، لذا تُعاد نفس الخلايا (بنمطها) لكل الصفوف مع تغيير القيم فقط
+    body_cells = styled_cells(body_style.name)
+    for row in (rows if rows is not None else product_rows()):
+        for cell, value in zip(body_cells, row):
+            cell.value = value
+        ws.append(body_cells)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+class _Echo:
+    """كائن كتابة لـ csv.writer يعيد السطر بدلاً من تخزينه"""
+
+    def write(self, value):
+        return value
+
+
+def stream_products_csv(rows=None):
+    """CSV متدفق (UTF-8 مع BOM ليفتحه Excel بالعربية بشكل صحيح)"""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield '\ufeff' + writer.writerow(PRODUCT_EXPORT_HEADERS)
+        for row in (rows if rows is not None else product_rows()):
+            yield writer.writerow(row)
+
+    return buffered(lines())
@@ -0,0 +1,346 @@
+"""
+أدوات الصندوق الأسود (SecureBackup): حساب التوقيع الرقمي والتحقق من سلامة السجلات.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from ..models import SecureBackup, SecureBackupCounter
+
+
+VERIFY_CHUNK_SIZE = 5000
+VERIFY_CHECKPOINT_PATH = os.path.join(settings.BASE_DIR, 'logs', 'secure_backup_verify.json')
+RETENTION_STATE_PATH = os.path.join(settings.BASE_DIR, 'logs', 'secure_backup_retention.json')
+RETENTION_BATCH_SIZE = 5000
+
+
+def canonical_json(data):
+    """تمثيل JSON ثابت للبيانات (مفاتيح مرتبة) وهو ما يُوقَّع"""
+    return json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False)
+
+
+def compute_signature(table_name, record_id, action, json_data):
+    """حساب التوقيع الرقمي (SHA-256) لسجل في الصندوق الأسود"""
+    hash_input = f"{table_name}:{record_id}:{action}:{json_data}"
+    return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
+
+
+def _verify_chunk(bounds):
+    """
+    التحقق من السجلات ضمن نطاق المعرفات [start, end).
+    تُستدعى داخل عملية منفصلة لذلك تعيد نتائج بسيطة قابلة للتسلسل.
+    """
+    start_id, end_id = bounds
+    result = {
+        'start': start_id,
+        'end': end_id,
+        'checked': 0,
+        'first_id': None,
+        'last_id': None,
+        'mismatches': [],
+        'unsigned': [],
+        'gaps': [],
+    }
+    rows = (
+        SecureBackup.objects.filter(id__gte=start_id, id__lt=end_id)
+        .order_by('id')
+        .values_list('id', 'table_name', 'record_id', 'action', 'backup_data', 'hash_signature')
+        .iterator(chunk_size=2000)
+    )
+    previous_id = None
+    for backup_id, table_name, record_id, action, backup_data, hash_signature in rows:
+        if previous_id is not None and backup_id > previous_id + 1:
+            result['gaps'].append([previous_id + 1, backup_id - 1])
+        if result['first_id'] is None:
+            result['first_id'] = backup_id
+        previous_id = backup_id
+        result['checked'] += 1
+
+        if not hash_signature:
+            result['unsigned'].append(backup_id)
+            continue
+        expected = compute_signature(table_name, record_id, action, canonical_json(backup_data))
+        if expected != hash_signature:
+            result['mismatches'].append({
+                'id': backup_id,
+                'table': table_name,
+                'record_id': record_id,
+                'action': action,
+            })
+    result['last_id'] = previous_id
+    return result
+
+
+def _init_worker():
+    """تهيئة Django داخل العمليات الفرعية (ضروري عند استخدام spawn)"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def iter_id_ranges(start_id, max_id, chunk_size):
+    """تقسيم نطاق المعرفات إلى نوافذ متتالية بحجم ثابت"""
+    current = start_id
+    while current <= max_id:
+        yield (current, current + chunk_size)
+        current += chunk_size
+
+
+def empty_report():
+    return {
+        'last_id': 0,
+        'checked': 0,
+        'mismatches': [],
+        'unsigned': [],
+        'gaps': [],
+        'last_seen_id': None,
+        'started_at': timezone.now().isoformat(),
+        'updated_at': None,
+        'finished_at': None,
+        'completed': False,
+    }
+
+
+def load_checkpoint(path):
+    """قراءة ملف نقطة الاستئناف إن وُجد"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, report):
+    """حفظ نقطة الاستئناف بشكل ذري (كتابة ملف مؤقت ثم استبداله)"""
+    if not path:
+        return
+    # اسم مؤقت لكل عملية/خيط: عدة عمال قد يحفظون نفس الملف في الوقت نفسه
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _merge_chunk(report, chunk):
+    """دمج نتيجة نافذة واحدة في التقرير العام مع اكتشاف الفجوات بين النوافذ"""
+    report['checked'] += chunk['checked']
+    report['mismatches'].extend(chunk['mismatches'])
+    report['unsigned'].extend(chunk['unsigned'])
+    if chunk['first_id'] is not None:
+        last_seen = report.get('last_seen_id')
+        if last_seen is not None and chunk['first_id'] > last_seen + 1:
+            report['gaps'].append([last_seen + 1, chunk['first_id'] - 1])
+        report['gaps'].extend(chunk['gaps'])
+        report['last_seen_id'] = chunk['last_id']
+    report['last_id'] = chunk['end'] - 1
+    report['updated_at'] = timezone.now().isoformat()
+
+
+def verify_secure_backups(start_id=None, end_id=None, chunk_size=VERIFY_CHUNK_SIZE, workers=1,
+                          report=None, checkpoint_path=None, throttle=0, on_progress=None):
+    """
+    التحقق من التوقيعات الرقمية لسجلات الصندوق الأسود على نوافذ من المعرفات.
+
+    - workers > 1: توزيع النوافذ على مجموعة عمليات (ProcessPoolExecutor).
+    - report: تقرير سابق للاستئناف منه (يبدأ بعد last_id).
+    - checkpoint_path: يُحدَّث بعد كل نافذة مكتملة حتى يمكن الاستئناف لاحقاً.
+    - throttle: ثوانٍ للانتظار بين النوافذ في الوضع المتسلسل لتخفيف الضغط على قاعدة البيانات.
+    """
+    report = report or empty_report()
+    bounds = SecureBackup.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if bounds['max_id'] is None:
+        report['completed'] = True
+        report['finished_at'] = timezone.now().isoformat()
+        return report
+
+    if start_id is None:
+        start_id = max(report.get('last_id') or 0, (bounds['min_id'] or 1) - 1) + 1
+    max_id = bounds['max_id'] if end_id is None else min(end_id, bounds['max_id'])
+    ranges = list(iter_id_ranges(start_id, max_id, chunk_size))
+    if ranges:
+        # آخر نافذة لا تتجاوز الحد الأعلى المطلوب
+        last_start, _ = ranges[-1]
+        ranges[-1] = (last_start, max_id + 1)
+
+    def consume(results, pause=0):
+        for chunk in results:
+            _merge_chunk(report, chunk)
+            save_checkpoint(checkpoint_path, report)
+            if on_progress:
+                on_progress(report, max_id)
+            if pause:
+                time.sleep(pause)
+
+    if workers and workers > 1 and len(ranges) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        # إغلاق الاتصالات قبل التفرع حتى لا تتشارك العمليات نفس الاتصال
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            # map يحافظ على الترتيب، لذلك تبقى نقطة الاستئناف متصاعدة
+            consume(executor.map(_verify_chunk, ranges))
+    else:
+        consume((_verify_chunk(r) for r in ranges), pause=throttle)
+
+    # الفجوات الناتجة عن سياسة الاحتفاظ (prune_secure_backup) متوقعة وليست تلاعباً
+    retention_state = load_checkpoint(RETENTION_STATE_PATH) or {}
+    compacted_through = retention_state.get('compacted_through_id') or 0
+    if compacted_through:
+        expected_gaps = [g for g in report['gaps'] if g[1] <= compacted_through]
+        if expected_gaps:
+            report['gaps'] = [g for g in report['gaps'] if g[1] > compacted_through]
+            report['compacted_gaps'] = report.get('compacted_gaps', 0) + len(expected_gaps)
+
+    if end_id is None or end_id >= bounds['max_id']:
+        report['completed'] = True
+        report['finished_at'] = timezone.now().isoformat()
+        report['missing'] = missing_backups()
+    save_checkpoint(checkpoint_path, report)
+    return report
+
+
+def missing_backups():
+    """
+    عدد سجلات الصندوق الأسود المحذوفة خارج سياسة الاحتفاظ: ما سجّلته العدادات (bump_counter) ناقص الموجود.
+    فجوات المعرفات وحدها للعلم فقط: تسلسل PostgreSQL يترك فجوات عادية (معاملات ملغاة، ذاكرة التسلسل)،
+    أما العدادات فتُحدَّث مع كل كتابة ومع كل حذف بسياسة الاحتفاظ في نفس المعاملة.
+    """
+    counted = SecureBackupCounter.objects.aggregate(n=Sum('count'))['n'] or 0
+    return max(counted - SecureBackup.objects.count(), 0)
+
+
+# ==================== العدادات التراكمية ====================
+
+def bump_counter(table_name, action, delta=1, date=None):
+    """زيادة (أو إنقاص) عداد اليوم/الجدول/العملية بشكل ذري"""
+    date = date or timezone.localdate()
+    counters = SecureBackupCounter.objects.filter(date=date, table_name=table_name, action=action)
+    if counters.update(count=F('count') + delta):
+        return
+    counter, created = SecureBackupCounter.objects.get_or_create(
+        date=date, table_name=table_name, action=action, defaults={'count': delta}
+    )
+    if not created:
+        counters.update(count=F('count') + delta)
+
+
+def rebuild_counters():
+    """إعادة بناء العدادات من جدول الصندوق الأسود (للإصلاح فقط)"""
+    groups = (
+        SecureBackup.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'table_name', 'action')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        SecureBackupCounter.objects.all().delete()
+        SecureBackupCounter.objects.bulk_create([
+            SecureBackupCounter(date=g['day'], table_name=g['table_name'], action=g['action'], count=g['n'])
+            for g in groups
+        ], batch_size=1000)
+
+
+def dashboard_stats():
+    """إحصائيات لوحة التحكم من العدادات بدلاً من عدّ الجدول كاملاً"""
+    counters = SecureBackupCounter.objects.all()
+    total = counters.aggregate(n=Sum('count'))['n'] or 0
+    today = counters.filter(date=timezone.localdate()).aggregate(n=Sum('count'))['n'] or 0
+    deleted = counters.filter(action='delete').aggregate(n=Sum('count'))['n'] or 0
+    tables = list(
+        counters.filter(count__gt=0).order_by('table_name').values_list('table_name', flat=True).distinct()
+    )
+    return {'total': total, 'today': today, 'deleted_items': deleted}, tables
+
+
+# ==================== سياسة الاحتفاظ والتقليص ====================
+
+def _superseded(queryset, trunc):
+    """السجلات التي توجد نسخة أحدث منها لنفس السجل ضمن نفس الفترة (يوم أو شهر)"""
+    newer = (
+        SecureBackup.objects.annotate(period=trunc('timestamp'))
+        .filter(
+            table_name=OuterRef('table_name'),
+            record_id=OuterRef('record_id'),
+            id__gt=OuterRef('id'),
+            period=OuterRef('period'),
+        )
+    )
+    return queryset.annotate(period=trunc('timestamp')).filter(Exists(newer))
+
+
+def _delete_batch(ids):
+    """حذف دفعة من السجلات مع إنقاص العدادات المقابلة في نفس المعاملة"""
+    with transaction.atomic():
+        groups = (
+            SecureBackup.objects.filter(id__in=ids)
+            .annotate(day=TruncDate('timestamp'))
+            .values('day', 'table_name', 'action')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for g in groups:
+            bump_counter(g['table_name'], g['action'], delta=-g['n'], date=g['day'])
+        deleted, _ = SecureBackup.objects.filter(id__in=ids).delete()
+    return deleted
+
+
+def apply_retention(keep_all_days, daily_days, batch_size=RETENTION_BATCH_SIZE, dry_run=False,
+                    now=None, on_progress=None):
+    """
+    تطبيق سياسة احتفاظ متدرجة على الصندوق الأسود:
+    - أحدث من keep_all_days يوماً: الاحتفاظ بكل النسخ.
+    - حتى daily_days يوماً: آخر نسخة لكل سجل في كل يوم.
+    - أقدم من ذلك: آخر نسخة لكل سجل في كل شهر.
+    سجلات الحذف (delete) لا تُقلَّص لأنها مصدر استرجاع البيانات المحذوفة.
+    يتم الحذف على نوافذ من المعرفات، كل نافذة في معاملة قصيرة.
+    """
+    now = now or timezone.now()
+    daily_days = max(daily_days, keep_all_days)
+    tiers = [
+        ('daily', TruncDate, now - timedelta(days=keep_all_days)),
+        ('monthly', TruncMonth, now - timedelta(days=daily_days)),
+    ]
+    stats = {'daily': 0, 'monthly': 0, 'dry_run': dry_run}
+    compacted_through = 0
+
+    for tier, trunc, cutoff in tiers:
+        candidates = SecureBackup.objects.filter(timestamp__lt=cutoff).exclude(action='delete')
+        bounds = candidates.aggregate(min_id=Min('id'), max_id=Max('id'))
+        if bounds['max_id'] is None:
+            continue
+        compacted_through = max(compacted_through, bounds['max_id'])
+        for start, end in iter_id_ranges(bounds['min_id'], bounds['max_id'], batch_size):
+            window = candidates.filter(id__gte=start, id__lt=end)
+            ids = list(_superseded(window, trunc).values_list('id', flat=True))
+            if ids:
+                stats[tier] += len(ids) if dry_run else _delete_batch(ids)
+            if on_progress:
+                on_progress(tier, end - 1, bounds['max_id'], stats)
+
+    if not dry_run:
+        state = load_checkpoint(RETENTION_STATE_PATH) or {}
+        state.update({
+            'last_run': timezone.now().isoformat(),
+            'keep_all_days': keep_all_days,
+            'daily_days': daily_days,
+            'compacted_through_id': max(state.get('compacted_through_id') or 0, compacted_through),
+            'deleted': {'daily': stats['daily'], 'monthly': stats['monthly']},
+        })
+        save_checkpoint(RETENTION_STATE_PATH, state)
+    return stats
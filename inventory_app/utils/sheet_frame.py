@@ -0,0 +1,350 @@
+"""
+طبقة تحليل أوراق Excel المشتركة (pandas).
+تُقرأ الورقة مرة واحدة (openpyxl بوضع read_only) إلى DataFrame على دفعات، وتُطابق العناوين مرة واحدة،
+ثم تُحوّل الأعمدة (النصوص والكميات) وتُحدد الصفوف الفارغة وصفوف العناوين المكررة بأقنعة (masks)
+على العمود كاملاً بدلاً من فحص كل خلية في حلقة.
+ملفات CSV/TSV تُقرأ بوحدة csv المتدفقة (مع اكتشاف الترميز والفاصل) إلى نفس الإطارات، فتمر بنفس تحديد الأعمدة.
+يستخدمها رفع ملف Excel ومعاينته ومعالجته ودمج الملفات.
+"""
+import codecs
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+
+SHEET_CHUNK_ROWS = 20000
+MAX_QUANTITY = 2 ** 31 - 1  # حد IntegerField
+
+HEADER_MARKERS = ['MODEL', 'PRODUCT', 'رقم المنتج', 'PRODUCT NUMBER']
+FINAL_HEADER_MARKERS = ['FINAL MODEL', 'FINAL_MODEL', 'رقم المنتج النهائي']
+MAPPED_FIELDS = ['original_number', 'final_number', 'total_quantity', 'location', 'name', 'category']
+
+# أسماء الأعمدة المحتملة لملفات الدمج (تُطابق مرة واحدة لكل ملف)
+PRODUCT_NUMBER_HEADERS = [
+    'final_model', 'final model', 'model', 'product number', 'productnumber',
+    'رقم المنتج النهائي', 'رقم المنتج', 'موديل', 'الموديل',
+]
+QUANTITY_HEADERS = [
+    'total_quantity', 'total qty', 'total', 'quantity', 'qty', 't.qty', 'tqty',
+    'الاجمالي', 'اجمالي', 'الكمية', 'كمية',
+]
+NAME_HEADERS = ['name', 'الاسم']
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+CSV_EXTENSIONS = ('.csv', '.tsv', '.txt')
+CSV_ENCODINGS = ('utf-8-sig', 'cp1256')  # cp1256: ترميز ملفات Excel العربية المصدرة بصيغة CSV
+CSV_DELIMITERS = ',\t;|'
+CSV_SAMPLE_BYTES = 64 * 1024
+MERGE_FILE_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS + ('.json',)
+
+
+# ---------- بناء الإطارات ----------
+
+def rows_frame(rows, index=None):
+    """DataFrame بأعمدة رقمية (مواقع الأعمدة في الورقة) من قائمة صفوف؛ الصفوف القصيرة تُكمل بـ None"""
+    if not rows:
+        return pd.DataFrame(index=index if index is not None else [], dtype=object)
+    return pd.DataFrame(list(rows), index=index, dtype=object)
+
+
+def non_empty_mask(frame):
+    """الصفوف التي تحتوي خلية واحدة على الأقل ليست فارغة ولا صفراً"""
+    if frame.empty:
+        return pd.Series(False, index=frame.index)
+    return (frame.notna() & (frame != '') & (frame != 0)).any(axis=1)
+
+
+def frame_rows(frame):
+    """تحويل DataFrame إلى قوائم صفوف بقيم Python (NaN تصبح None)"""
+    return frame.astype(object).where(frame.notna(), None).values.tolist()
+
+
+def frame_records(frame):
+    """تحويل DataFrame إلى قواميس بقيم Python قابلة للتحويل إلى JSON (NA تصبح None)"""
+    columns = list(frame.columns)
+    return [dict(zip(columns, row)) for row in frame_rows(frame)]
+
+
+def _header_names(first):
+    return [str(cell) if cell is not None else f'Column_{i}' for i, cell in enumerate(first, start=1)]
+
+
+def iter_sheet_frames(excel_file, chunk_rows=SHEET_CHUNK_ROWS):
+    """
+    قراءة الورقة النشطة مرة واحدة: (headers, مولّد DataFrames للصفوف غير الفارغة).
+    يجب استهلاك المولّد قبل إغلاق الملف.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    rows = wb.active.iter_rows(values_only=True)
+    first = next(rows, None) or ()
+    # الصف الأول = العناوين
+    headers = _header_names(first)
+
+    def frames():
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_rows))
+                if not chunk:
+                    break
+                frame = rows_frame(chunk)
+                frame = frame[non_empty_mask(frame)]
+                if not frame.empty:
+                    yield frame
+        finally:
+            wb.close()
+
+    return headers, frames()
+
+
+def is_csv_file(filename):
+    return (filename or '').lower().endswith(CSV_EXTENSIONS)
+
+
+def detect_csv_format(sample, filename=''):
+    """
+    (الترميز، الفاصل) من أول جزء من الملف: UTF-8 (مع BOM أو بدونه) إن كان صالحاً وإلا cp1256،
+    والفاصل بـ csv.Sniffer ثم بعدّ الفواصل في سطر العناوين.
+    """
+    encoding, text = 'latin-1', sample.decode('latin-1')
+    for candidate in CSV_ENCODINGS:
+        try:
+            # final=False: العينة قد تقطع حرفاً متعدد البايتات في نهايتها
+            text = codecs.getincrementaldecoder(candidate)().decode(sample, final=False)
+            encoding = candidate
+            break
+        except UnicodeDecodeError:
+            continue
+
+    lines = text.splitlines()
+    if len(lines) > 1 and len(sample) >= CSV_SAMPLE_BYTES:
+        lines.pop()  # السطر الأخير قد يكون مقطوعاً
+    header = lines[0] if lines else ''
+    if (filename or '').lower().endswith('.tsv'):
+        return encoding, '\t'
+    try:
+        delimiter = csv.Sniffer().sniff('\n'.join(lines[:50]), delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = max(CSV_DELIMITERS, key=header.count)
+    if not header.count(delimiter) and any(header.count(d) for d in CSV_DELIMITERS):
+        delimiter = max(CSV_DELIMITERS, key=header.count)
+    return encoding, delimiter
+
+
+def iter_csv_frames(csv_file, filename='', chunk_rows=SHEET_CHUNK_ROWS):
+    """
+    مثل iter_sheet_frames لملفات CSV/TSV: قراءة متدفقة بوحدة csv (بدون تحميل الملف كاملاً).
+    الخلايا الفارغة تصبح None كما في Excel.
+    """
+    raw = getattr(csv_file, 'file', csv_file)
+    raw.seek(0)
+    encoding, delimiter = detect_csv_format(raw.read(CSV_SAMPLE_BYTES), filename or getattr(csv_file, 'name', ''))
+    raw.seek(0)
+    text = io.TextIOWrapper(raw, encoding=encoding, errors='replace', newline='')
+    rows = csv.reader(text, delimiter=delimiter)
+    headers = _header_names([cell or None for cell in next(rows, None) or ()])
+
+    def frames():
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_rows))
+                if not chunk:
+                    break
+                frame = rows_frame(chunk)
+                frame = frame.where(frame != '', None)
+                frame = frame[non_empty_mask(frame)]
+                if not frame.empty:
+                    yield frame
+        finally:
+            # فصل الغلاف حتى لا يُغلق الملف المرفوع نفسه
+            text.detach()
+
+    return headers, frames()
+
+
+def iter_file_frames(upload, filename=None, chunk_rows=SHEET_CHUNK_ROWS):
+    """(headers, إطارات) لملف Excel أو CSV/TSV حسب امتداده"""
+    filename = filename or getattr(upload, 'name', '') or ''
+    if is_csv_file(filename):
+        return iter_csv_frames(upload, os.path.basename(filename), chunk_rows)
+    return iter_sheet_frames(upload, chunk_rows)
+
+
+# ---------- تحويل الأعمدة ----------
+
+def clean_text(series):
+    """نص منظف (strip) لكل خلية، و None للخلايا الفارغة"""
+    text = series.astype(str).str.strip()
+    return text.where(series.notna(), None)
+
+
+def parse_quantities(series, zero_is_missing=False):
+    """
+    تحويل عمود الكمية إلى أعداد صحيحة (Int64) دفعة واحدة؛ القيم غير الرقمية تصبح NA.
+    zero_is_missing: اعتبار الصفر قيمة فارغة (كما في معاينة الاستيراد).
+    """
+    numbers = pd.to_numeric(series, errors='coerce')
+    numbers = numbers.where(np.isfinite(numbers) & (numbers.abs() <= MAX_QUANTITY))
+    if zero_is_missing:
+        numbers = numbers.where(numbers != 0)
+    return np.trunc(numbers).astype('Int64')
+
+
+def mapped_column(frame, column_mapping, field):
+    """عمود الحقل حسب تحديد الأعمدة، أو عمود فارغ إن لم يُحدد أو كان خارج الورقة"""
+    column = column_mapping.get(field)
+    if column is None or column not in frame.columns:
+        return pd.Series(None, index=frame.index, dtype=object)
+    return frame[column]
+
+
+def parse_mapped_rows(rows, column_mapping, row_numbers=None):
+    """
+    تحليل صفوف ورقة الاستيراد حسب تحديد الأعمدة إلى DataFrame مفهرس برقم الصف في الملف
+    بأعمدة MAPPED_FIELDS. تُحذف الصفوف الفارغة وصفوف العناوين المكررة.
+    total_quantity تكون NA والرقم النهائي None عند نقص البيانات (يُحكم على الصف بالخطأ لاحقاً).
+    """
+    if row_numbers is None:
+        row_numbers = range(2, 2 + len(rows))
+    frame = rows_frame(rows, index=pd.Index(list(row_numbers), name='row'))
+    frame = frame[non_empty_mask(frame)]
+
+    product_number = clean_text(mapped_column(frame, column_mapping, 'product_number'))
+    final_model = clean_text(mapped_column(frame, column_mapping, 'final_model'))
+    headers = (
+        product_number.str.upper().isin(HEADER_MARKERS)
+        | final_model.str.upper().isin(FINAL_HEADER_MARKERS)
+    )
+
+    location = clean_text(mapped_column(frame, column_mapping, 'location'))
+    # رقم المنتج النهائي: FINAL_MODEL إن وُجد وإلا رقم المنتج
+    final_number = final_model.where(final_model.fillna('') != '', product_number)
+    parsed = pd.DataFrame({
+        'original_number': product_number,
+        'final_number': final_number.where(final_number.fillna('') != '', None),
+        'total_quantity': parse_quantities(
+            mapped_column(frame, column_mapping, 'total_quantity'), zero_is_missing=True
+        ),
+        'location': location.where(location.fillna('') != '', None),
+        'name': clean_text(mapped_column(frame, column_mapping, 'name')),
+        'category': clean_text(mapped_column(frame, column_mapping, 'category')),
+    }, index=frame.index, columns=MAPPED_FIELDS)
+    return parsed[~headers]
+
+
+def iter_mapped_frames(rows, column_mapping, chunk_rows=SHEET_CHUNK_ROWS):
+    """تحليل صفوف ورقة (أي iterable) على دفعات: مولّد DataFrames من parse_mapped_rows"""
+    rows = iter(rows)
+    start = 2
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        parsed = parse_mapped_rows(chunk, column_mapping, range(start, start + len(chunk)))
+        start += len(chunk)
+        if not parsed.empty:
+            yield parsed
+
+
+def invalid_mask(parsed):
+    """الصفوف التي ينقصها رقم المنتج أو الإجمالي"""
+    return parsed['final_number'].isna() | parsed['total_quantity'].isna()
+
+
+# ---------- ملفات الدمج ----------
+
+def _normalize_header(value):
+    # إزالة المسافات وبعض العلامات فقط مع إبقاء الأحرف العربية
+    value = (value or '').strip().lower()
+    return ''.join(ch for ch in value if ch not in ' .,_-()[]{}\n\t')
+
+
+def find_header(headers, names):
+    """موقع أول عنوان يطابق أحد الأسماء (مطابقة كاملة أو تحتوي) بعد التطبيع"""
+    normalized = [_normalize_header(h) for h in headers]
+    for name in names:
+        wanted = _normalize_header(name)
+        for i, header in enumerate(normalized):
+            if header == wanted or (wanted and wanted in header):
+                return i
+    return None
+
+
+def extract_products(upload, filename=None):
+    """استخراج المنتجات من ملف Excel أو CSV/TSV للدمج: [{product_number, name, quantity}]"""
+    headers, frames = iter_file_frames(upload, filename)
+    headers = [h.strip().lower() if not h.startswith('Column_') else '' for h in headers]
+
+    # مطابقة العناوين مرة واحدة للملف كله
+    pn_idx = find_header(headers, PRODUCT_NUMBER_HEADERS)
+    qty_idx = find_header(headers, QUANTITY_HEADERS)
+    if qty_idx is None:
+        qty_idx = next(
+            (i for i, h in enumerate(headers)
+             if 'qty' in _normalize_header(h) or 'quantity' in _normalize_header(h)
+             or 'الكمية' in h or 'اجمالي' in h or 'الاجمالي' in h),
+            None,
+        )
+    name_idx = find_header(headers, NAME_HEADERS)
+
+    products = []
+    for frame in frames:
+        if pn_idx is not None:
+            number = clean_text(mapped_column(frame, {'pn': pn_idx}, 'pn')).fillna('')
+        else:
+            # بدون عمود رقم منتج: أول خلية غير فارغة في كل صف
+            values = frame.to_numpy(dtype=object)
+            first = pd.notna(values).argmax(axis=1)
+            number = clean_text(pd.Series(values[np.arange(len(values)), first], index=frame.index)).fillna('')
+        name = clean_text(mapped_column(frame, {'name': name_idx}, 'name'))
+        quantity = parse_quantities(mapped_column(frame, {'qty': qty_idx}, 'qty')).fillna(0)
+        chunk = pd.DataFrame({
+            'product_number': number,
+            'name': name.where(name.notna(), number),
+            'quantity': quantity.astype(int),
+        })
+        products.extend(frame_records(chunk))
+    return products
+
+
+def extract_json_products(file_obj):
+    """استخراج المنتجات من ملف JSON للدمج (صيغة النسخة الاحتياطية أو قائمة منتجات)"""
+    data = json.loads(file_obj.read().decode('utf-8'))
+    if isinstance(data, dict) and isinstance(data.get('products'), list):
+        records = [rec.get('fields', {}) if 'fields' in rec else rec for rec in data['products'] if isinstance(rec, dict)]
+    elif isinstance(data, list):
+        records = [rec for rec in data if isinstance(rec, dict)]
+    else:
+        records = []
+    products = []
+    for rec in records:
+        pn = rec.get('product_number') or rec.get('final_model') or ''
+        qty = rec.get('quantity') or 0
+        products.append({
+            'product_number': pn,
+            'name': rec.get('name') or pn,
+            'quantity': int(qty) if isinstance(qty, (int, float)) else 0,
+        })
+    return products
+
+
+def parse_merge_file(source, filename):
+    """
+    تحليل ملف دمج واحد (Excel أو CSV/TSV أو JSON): (filename, items, error).
+    source مسار ملف أو bytes؛ لا تعتمد على Django لتعمل في عملية مستقلة (ProcessPoolExecutor).
+    """
+    try:
+        with (open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)) as f:
+            if filename.lower().endswith('.json'):
+                items = extract_json_products(f)
+            else:
+                items = extract_products(f, filename)
+    except Exception as e:
+        return filename, [], str(e) or e.__class__.__name__
+    return filename, items, ''
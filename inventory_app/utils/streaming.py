@@ -0,0 +1,49 @@
+"""
+أدوات البث (Streaming) للتصدير الكبير: NDJSON وضغط gzip تدريجي.
+"""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+STREAM_BUFFER_SIZE = 64 * 1024
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def dumps_line(obj):
+    """تحويل كائن إلى سطر JSON واحد"""
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def buffered(chunks, size=STREAM_BUFFER_SIZE):
+    """تجميع الأجزاء الصغيرة في كتل أكبر (bytes) لتقليل عدد عمليات الكتابة"""
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_stream(chunks):
+    """ضغط تدفق من الكتل بصيغة gzip دون تحميله كاملاً في الذاكرة"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def ndjson_records(queryset, serialize, chunk_size=ITERATOR_CHUNK_SIZE):
+    """سطر NDJSON لكل سجل في الاستعلام باستخدام iterator لتثبيت استهلاك الذاكرة"""
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dumps_line(serialize(row))
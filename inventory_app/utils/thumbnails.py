@@ -0,0 +1,118 @@
+"""
+الصور المصغرة للمنتجات (قائمة المنتجات، تفاصيل الطلبية، ملفات PDF).
+- نسخة واحدة بحجم ثابت (THUMBNAIL_SIZE) بصيغة WebP أو JPEG (الإعداد THUMBNAIL_FORMAT) في products/thumbs/.
+- تُنشأ بعد حفظ الصورة وانتهاء المعاملة: كمهمة خلفية إن كانت المهام مفعلة، وإلا مباشرة بعد الحفظ.
+- الحفظ عبر update() على حقل thumbnail فقط: لا يغير updated_at ولا يضيف سجلاً في الصندوق الأسود.
+- أمر generate_thumbnails ينشئ الصور المصغرة للمنتجات الحالية.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Product
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (160, 160)  # يكفي لعرض 50px بدقة الشاشات العالية
+THUMBNAIL_FORMATS = {'WEBP': ('.webp', 'image/webp'), 'JPEG': ('.jpg', 'image/jpeg')}
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_format():
+    fmt = str(getattr(settings, 'THUMBNAIL_FORMAT', 'WEBP') or 'WEBP').upper()
+    return fmt if fmt in THUMBNAIL_FORMATS else 'WEBP'
+
+
+def render_thumbnail(source, size=THUMBNAIL_SIZE, fmt=None):
+    """صورة مصغرة (bytes) من مسار أو ملف مفتوح مع الحفاظ على النسبة واتجاه EXIF"""
+    from PIL import Image, ImageOps
+
+    fmt = fmt or thumbnail_format()
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size, Image.LANCZOS)
+        mode = 'RGBA' if fmt == 'WEBP' and img.has_transparency_data else 'RGB'
+        if img.mode != mode:
+            img = img.convert(mode)
+        options = {'method': 4} if fmt == 'WEBP' else {'optimize': True}
+        output = io.BytesIO()
+        img.save(output, fmt, quality=THUMBNAIL_QUALITY, **options)
+    return output.getvalue()
+
+
+def delete_thumbnail(product):
+    """حذف ملف الصورة المصغرة (عند حذف الصورة أو استبدالها)"""
+    if product.thumbnail:
+        product.thumbnail.delete(save=False)
+        product.thumbnail = None
+
+
+def generate_thumbnail(product):
+    """إنشاء الصورة المصغرة لمنتج وحفظها؛ يعيد True عند النجاح"""
+    if not product.image:
+        return False
+    try:
+        content = render_thumbnail(product.image.path)
+    except Exception as e:
+        # ملف مفقود أو تالف أو صيغة غير مدعومة: تبقى الصورة الأصلية
+        logger.warning(f'Thumbnail failed for product {product.pk}: {e}')
+        return False
+    delete_thumbnail(product)
+    stem = os.path.splitext(os.path.basename(product.image.name))[0]
+    product.thumbnail.save(f'{stem}{THUMBNAIL_FORMATS[thumbnail_format()][0]}', ContentFile(content), save=False)
+    Product.objects.filter(pk=product.pk).update(thumbnail=product.thumbnail.name)
+    return True
+
+
+def missing_thumbnails():
+    """المنتجات التي لها صورة بدون صورة مصغرة"""
+    return Product.objects.exclude(image='').exclude(image__isnull=True).filter(
+        Q(thumbnail='') | Q(thumbnail__isnull=True)
+    )
+
+
+def generate_thumbnails(product_ids):
+    """إنشاء الصور المصغرة لمجموعة منتجات: (عدد الناجحة، عدد الفاشلة)"""
+    done = failed = 0
+    for product in Product.objects.filter(pk__in=product_ids).exclude(image='').exclude(image__isnull=True):
+        if generate_thumbnail(product):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def schedule_thumbnail(product, user=None):
+    """
+    جدولة إنشاء الصورة المصغرة بعد نجاح المعاملة الحالية (الصورة محفوظة على القرص حينها):
+    كمهمة thumbnails إن كانت المهام الخلفية مفعلة، وإلا مباشرة.
+    """
+    product_id = product.pk
+
+    def run():
+        if getattr(settings, 'BACKGROUND_JOBS_ENABLED', False):
+            from .jobs import enqueue
+
+            enqueue('thumbnails', {'product_ids': [product_id]}, user=user)
+        else:
+            generate_thumbnails([product_id])
+
+    transaction.on_commit(run)
+
+
+def image_source(product):
+    """مسار أصغر صورة محلية متاحة للمنتج (المصغرة أولاً) أو None"""
+    for field in (product.thumbnail, product.image):
+        if field:
+            try:
+                if os.path.exists(field.path):
+                    return field.path
+            except (ValueError, NotImplementedError):
+                continue
+    return None
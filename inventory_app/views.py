@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
@@ -8,12 +8,11 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
 from django.db import models as db_models
-from .models import Product, Location, Warehouse, AuditLog, Order, ProductReturn, UserProfile, UserActivityLog, Container, SecureBackup
+from .models import Product, Location, Warehouse, AuditLog, Order, OrderLine, ProductReturn, UserProfile, UserActivityLog, Container, SecureBackup
 from .decorators import admin_required, staff_required, exclude_maintenance, exclude_admin_dashboard, get_user_type, is_admin
 from .forms import LoginForm, RegisterStaffForm, ProductForm, EditStaffForm
 import json
 import logging
-from django.core import serializers
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.views.decorators.cache import never_cache, cache_page
@@ -525,9 +524,32 @@ def secure_backup_login(request):
     return render(request, 'inventory_app/secure_backup_login.html')
 
 
+def _filter_secure_backups(queryset, params):
+    """تطبيق فلاتر الصندوق الأسود (q, table, action, date_from, date_to)"""
+    q = params.get('q', '')
+    table = params.get('table', '')
+    action = params.get('action', '')
+    date_from = params.get('date_from', '')
+    date_to = params.get('date_to', '')
+
+    if q:
+        queryset = queryset.filter(db_models.Q(id__icontains=q) | db_models.Q(hash_signature__icontains=q))
+    if table:
+        queryset = queryset.filter(table_name=table)
+    if action:
+        queryset = queryset.filter(action=action)
+    if date_from:
+        queryset = queryset.filter(timestamp__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(timestamp__date__lte=date_to)
+    return queryset
+
+
 @admin_required
 def secure_backup_dashboard(request):
     """لوحة تحكم السجل الآمن (الصندوق الأسود)"""
+    from .utils.secure_backup import dashboard_stats
+
     # التحقق من صلاحية الوصول
     if not request.session.get('secure_backup_access'):
         return redirect('inventory_app:secure_backup_login')
@@ -539,33 +561,16 @@ def secure_backup_dashboard(request):
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
 
-    queryset = SecureBackup.objects.all().order_by('-timestamp')
-
-    if q:
-        queryset = queryset.filter(db_models.Q(id__icontains=q) | db_models.Q(hash_signature__icontains=q))
-    if table:
-        queryset = queryset.filter(table_name=table)
-    if action:
-        queryset = queryset.filter(action=action)
-    if date_from:
-        queryset = queryset.filter(timestamp__date__gte=date_from)
-    if date_to:
-        queryset = queryset.filter(timestamp__date__lte=date_to)
+    queryset = _filter_secure_backups(SecureBackup.objects.all().order_by('-timestamp'), request.GET)
 
-    # Stats
-    stats = {
-        'total': SecureBackup.objects.count(),
-        'today': SecureBackup.objects.filter(timestamp__date=timezone.now().date()).count(),
-        'deleted_items': SecureBackup.objects.filter(action='delete').count()
-    }
+    # Stats (من العدادات التراكمية بدلاً من عدّ الجدول كاملاً)
+    stats, tables = dashboard_stats()
 
     # Pagination
     paginator = Paginator(queryset, 50)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    tables = SecureBackup.objects.values_list('table_name', flat=True).distinct()
-
     context = {
         'backups': page_obj,
         'stats': stats,
@@ -598,37 +603,101 @@ def get_secure_backup_detail(request, backup_id):
 
 @admin_required
 def export_secure_backup(request):
-    """تصدير سجلات الصندوق الأسود (SecureBackup)"""
+    """
+    تصدير سجلات الصندوق الأسود (SecureBackup) بصيغة NDJSON متدفقة.
+    السطر الأول معلومات وصفية ثم سجل واحد في كل سطر.
+    يدعم فلاتر لوحة التحكم (table, action, date_from, date_to, q) والضغط عبر gzip=1.
+    """
+    from .utils.streaming import buffered, dumps_line, gzip_stream, ndjson_records
+
     # التحقق من صلاحية الوصول
     if not request.session.get('secure_backup_access'):
         return redirect('inventory_app:secure_backup_login')
-        
-    try:
-        # تصدير كل السجلات
-        backups = SecureBackup.objects.all().order_by('timestamp')
-        data = json.loads(serializers.serialize('json', backups))
-        
-        # إضافة معلومات وصفية
-        export_data = {
-            'meta': {
-                'type': 'secure_backup_export',
-                'date': datetime.now().isoformat(),
-                'count': len(data),
-                'description': 'تصدير كامل لسجلات الصندوق الأسود'
-            },
-            'records': data
+
+    backups = _filter_secure_backups(SecureBackup.objects.all(), request.GET).order_by('id').values(
+        'id', 'table_name', 'record_id', 'backup_data', 'action', 'timestamp', 'hash_signature'
+    )
+    use_gzip = request.GET.get('gzip') in ('1', 'true')
+    filters = {k: v for k, v in request.GET.items() if k in ('q', 'table', 'action', 'date_from', 'date_to') and v}
+
+    def serialize(row):
+        pk = row.pop('id')
+        return {'model': 'inventory_app.securebackup', 'pk': pk, 'fields': row}
+
+    def generate():
+        yield dumps_line({'meta': {
+            'type': 'secure_backup_export',
+            'format': 'ndjson',
+            'date': datetime.now().isoformat(),
+            'filters': filters,
+            'description': 'تصدير سجلات الصندوق الأسود (سجل واحد في كل سطر)'
+        }})
+        yield from ndjson_records(backups, serialize)
+
+    stream = buffered(generate())
+    filename = f'secure_backup_log_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson'
+    if use_gzip:
+        stream = gzip_stream(stream)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin_required
+@require_http_methods(["GET", "POST"])
+def verify_secure_backup_api(request):
+    """
+    التحقق من التوقيعات الرقمية للصندوق الأسود.
+    GET: آخر تقرير محفوظ من أمر verify_secure_backup.
+    POST: فحص نافذة محدودة من المعرفات (start_id, limit) وإرجاع المؤشر التالي.
+    """
+    from .utils.secure_backup import VERIFY_CHECKPOINT_PATH, load_checkpoint, verify_secure_backups
+
+    if not request.session.get('secure_backup_access'):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    def summarize(report):
+        return {
+            'checked': report.get('checked', 0),
+            'last_id': report.get('last_id'),
+            'completed': report.get('completed', False),
+            'started_at': report.get('started_at'),
+            'finished_at': report.get('finished_at'),
+            'mismatches_count': len(report.get('mismatches', [])),
+            'unsigned_count': len(report.get('unsigned', [])),
+            'gaps_count': len(report.get('gaps', [])),
+            'missing': report.get('missing', 0),
+            'mismatches': report.get('mismatches', [])[:100],
+            'gaps': report.get('gaps', [])[:100],
         }
-        
-        json_data = json.dumps(export_data, ensure_ascii=False, indent=2)
-        
-        filename = f'secure_backup_log_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        response = HttpResponse(json_data, content_type='application/json')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-        
-    except Exception as e:
-        return HttpResponse(f"Error: {str(e)}", status=500)
 
+    if request.method == 'GET':
+        report = load_checkpoint(VERIFY_CHECKPOINT_PATH)
+        if not report:
+            return JsonResponse({'success': True, 'report': None})
+        return JsonResponse({'success': True, 'report': summarize(report)}, json_dumps_params={'ensure_ascii': False})
+
+    try:
+        payload = json.loads(request.body or '{}')
+        start_id = max(1, int(payload.get('start_id') or 1))
+        # حد أعلى لحجم النافذة حتى لا يطول الطلب
+        limit = min(max(1, int(payload.get('limit') or 10000)), 50000)
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'بيانات غير صالحة'}, status=400)
+
+    end_id = start_id + limit - 1
+    report = verify_secure_backups(start_id=start_id, end_id=end_id, workers=1)
+    last_id = SecureBackup.objects.aggregate(max_id=db_models.Max('id'))['max_id'] or 0
+    return JsonResponse({
+        'success': True,
+        'report': summarize(report),
+        'next_start_id': end_id + 1 if end_id < last_id else None,
+    }, json_dumps_params={'ensure_ascii': False})
 
 
 @admin_required
@@ -999,10 +1068,13 @@ def product_add(request):
                 price=price_val
             )
             
-            # رفع الصورة إذا تم اختيارها
+            # رفع الصورة إذا تم اختيارها (الصورة المصغرة تُنشأ بعد الحفظ)
             if 'image' in request.FILES:
+                from .utils.thumbnails import schedule_thumbnail
+
                 product.image = request.FILES['image']
                 product.save()
+                schedule_thumbnail(product, user=request.user if request.user.is_authenticated else None)
             
             # تسجيل العملية في السجل
             AuditLog.objects.create(
@@ -1026,6 +1098,8 @@ def product_add(request):
 
 def product_edit(request, product_id):
     """تعديل منتج"""
+    from .utils.thumbnails import delete_thumbnail, schedule_thumbnail
+
     product = get_object_or_404(Product, id=product_id)
     
     if request.method == 'POST':
@@ -1058,17 +1132,22 @@ def product_edit(request, product_id):
             
             # حذف الصورة إذا تم تحديد الخيار
             if request.POST.get('delete_image') == '1' and product.image:
+                delete_thumbnail(product)
                 product.image.delete()
                 product.image = None
             
             # رفع صورة جديدة إذا تم اختيارها
-            if 'image' in request.FILES:
-                # حذف الصورة القديمة إذا كانت موجودة
+            new_image = 'image' in request.FILES
+            if new_image:
+                # حذف الصورة القديمة (والمصغرة) إذا كانت موجودة
+                delete_thumbnail(product)
                 if product.image:
                     product.image.delete()
                 product.image = request.FILES['image']
             
             product.save()
+            if new_image:
+                schedule_thumbnail(product, user=request.user if request.user.is_authenticated else None)
             
             # تسجيل التغييرات في السجل
             changes = []
@@ -1990,170 +2069,168 @@ def low_stock_products_api(request):
 
 # ========== تصدير البيانات ==========
 
+def _render_products_pdf(engine=None, progress=None):
+    """
+    إنشاء PDF قائمة المنتجات (bytes)؛ يستخدمه التصدير المباشر ومهمة products_pdf الخلفية.
+    engine: chromium (HTML عبر المتصفح) أو reportlab (بدون متصفح)، والافتراضي PDF_ENGINE.
+    يُنشأ على أجزاء (بالتوازي حين يمكن) ثم تُدمج؛ progress(done, total) بعد كل جزء.
+    """
+    from .utils.pdf_chunks import render_products_pdf
+    from .utils.pdf_native import pdf_engine
+
+    return render_products_pdf(pdf_engine(engine), progress=progress)
+
+
 def export_products_pdf(request):
-    """تصدير قائمة المنتجات إلى PDF احترافي مع دعم كامل للعربية باستخدام Playwright"""
+    """تصدير قائمة المنتجات إلى PDF احترافي مع دعم كامل للعربية (Playwright، أو ReportLab مع ?engine=reportlab)"""
     from django.http import HttpResponse
-    from playwright.sync_api import sync_playwright
-    from datetime import datetime
-    import io
+    from .utils.export_cache import ExportArtifact, products_version
+    from .utils.pdf_native import pdf_engine
     
     try:
-        # جلب المنتجات
-        products = Product.objects.select_related('location').all().order_by('product_number')
+        # الملف يُعاد استخدامه من ذاكرة التصدير المؤقتة ما لم تتغير المنتجات
+        engine = pdf_engine(request.GET.get('engine'))
+        artifact = ExportArtifact('products_pdf', {'engine': engine}, products_version(), '.pdf')
+        return artifact.response(request, lambda: _render_products_pdf(engine), 'products_list.pdf',
+                                 'application/pdf')
         
-        # تاريخ التقرير
-        now = datetime.now()
-        
-        # إنشاء HTML محتوى
-        html_content = f'''
+    except Exception as e:
+        import traceback
+        error_msg = f'خطأ في إنشاء PDF: {str(e)}\n{traceback.format_exc()}'
+        return HttpResponse(error_msg, content_type='text/plain')
+
+def _order_pdf_html(order, products_map):
+    """HTML تفاصيل الطلبية لمحرك المتصفح (الصور المصغرة مضمنة base64)"""
+    from .utils.thumbnails import image_source
+    import mimetypes
+
+    rows_html = ''
+    for idx, item in enumerate(order.products_data, start=1):
+        num = item.get('product_number')
+        taken = item.get('quantity_taken')
+        
+        img_html = '-'
+        price = 0
+        if num in products_map:
+            prod = products_map[num]
+            price = float(prod.price) if prod.price is not None else 0
+            image_path = image_source(prod)
+            if image_path:
+                try:
+                    import base64
+                    mime = mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+                    with open(image_path, "rb") as image_file:
+                        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+                        img_html = f'<img src="data:{mime};base64,{encoded_string}" style="max-width: 50px; max-height: 50px; object-fit: contain;">'
+                except:
+                    pass
+            elif prod.image_url:
+                img_html = f'<img src="{prod.image_url}" style="max-width: 50px; max-height: 50px; object-fit: contain;">'
+
+        rows_html += f'''
+        <tr>
+            <td>{idx}</td>
+            <td style="text-align: center;"><strong>{num}</strong></td>
+            <td style="text-align: center;">{img_html}</td>
+            <td style="text-align: center;">{price}</td>
+            <td style="text-align: center;">{taken}</td>
+        </tr>
+        '''
+
+    html_content = f'''
 <!DOCTYPE html>
 <html dir="rtl" lang="ar">
 <head>
-    <meta charset="UTF-8">
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        
-        body {{
-            font-family: 'Segoe UI', 'Arial', 'Tahoma', sans-serif;
-            font-size: 10pt;
-            direction: rtl;
-            padding: 20px;
-        }}
-        
-        .header {{
-            text-align: center;
-            color: #667eea;
-            font-size: 28pt;
-            font-weight: bold;
-            margin-bottom: 20px;
-        }}
-        
-        .info {{
-            text-align: center;
-            margin-bottom: 20px;
-            font-size: 11pt;
-            color: #374151;
-        }}
-        
-        table {{
-            width: 100%;
-            border-collapse: collapse;
-            margin: 0 auto;
-        }}
-        
-        th {{
-            background-color: #667eea;
-            color: white;
-            padding: 12px 8px;
-            text-align: right;
-            font-weight: bold;
-            border: 1px solid #555;
-            font-size: 11pt;
-        }}
-        
-        td {{
-            padding: 8px;
-            border: 1px solid #ddd;
-            text-align: right;
-            font-size: 9pt;
-        }}
-        
-        tr:nth-child(even) {{
-            background-color: #f8fafc;
-        }}
-        
-        .summary {{
-            margin-top: 20px;
-            text-align: right;
-            font-weight: bold;
-            font-size: 12pt;
-            color: #374151;
-        }}
-    </style>
+<meta charset="UTF-8">
+<style>
+    * {{ margin: 0; padding: 0; box-sizing: border-box; }}
+    body {{ font-family: 'Segoe UI', 'Arial', 'Tahoma', sans-serif; font-size: 10pt; direction: rtl; padding: 20px; }}
+    .header-title {{ text-align: center; color: #1e293b; font-size: 16pt; font-weight: bold; margin-bottom: 15px; border-bottom: 2px solid #e2e8f0; padding-bottom: 5px; }}
+    
+    .info-grid {{ 
+        display: grid; 
+        grid-template-columns: repeat(2, 1fr); 
+        gap: 10px; 
+        margin-bottom: 20px; 
+        background: #f8fafc;
+        padding: 15px;
+        border-radius: 8px;
+        border: 1px solid #e2e8f0;
+    }}
+    
+    .info-item {{ margin-bottom: 5px; }}
+    .label {{ color: #64748b; font-weight: bold; font-size: 9pt; margin-bottom: 2px; display: block; }}
+    .value {{ color: #0f172a; font-weight: bold; font-size: 11pt; }}
+    
+    table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
+    th {{ background: #1e293b; color: white; font-weight: bold; padding: 8px; border: 1px solid #1e293b; font-size: 10pt; }}
+    td {{ padding: 6px; border: 1px solid #cbd5e1; font-size: 10pt; }}
+    tr:nth-child(even) {{ background-color: #f1f5f9; }}
+    
+    @page {{
+        margin: 0.5cm;
+        size: A4;
+    }}
+</style>
+<title>طلبية {order.order_number}</title>
 </head>
 <body>
-    <div class="header">قائمة المنتجات</div>
-    
-    <div class="info">
-        <strong>التاريخ:</strong> {now.strftime("%Y-%m-%d")} | 
-        <strong>الوقت:</strong> {now.strftime("%H:%M")}
+<div class="header-title">تفاصيل الطلبية</div>
+
+<div class="info-grid">
+    <div class="info-item">
+        <span class="label">اسم المستلم:</span>
+        <span class="value">{order.recipient_name or '-'}</span>
     </div>
-    
-    <table>
-        <thead>
-            <tr>
-                <th>#</th>
-                <th>رقم المنتج</th>
-                <th>الاسم</th>
-                <th>الفئة</th>
-                <th>الكمية</th>
-                <th>الموقع</th>
-            </tr>
-        </thead>
-        <tbody>
-'''
-        
-        # إضافة صفوف المنتجات
-        for idx, product in enumerate(products, start=1):
-            location = product.location.full_location if product.location else 'بدون موقع'
-            category = product.category if product.category else '-'
-            
-            html_content += f'''
-            <tr>
-                <td>{idx}</td>
-                <td>{product.product_number}</td>
-                <td>{product.name}</td>
-                <td>{category}</td>
-                <td>{product.quantity}</td>
-                <td>{location}</td>
-            </tr>
-            '''
-        
-        # إغلاق HTML
-        html_content += f'''
-        </tbody>
-    </table>
-    
-    <div class="summary">
-        إجمالي المنتجات: {products.count()}
+    <div class="info-item">
+        <span class="label">رقم الطلبية:</span>
+        <span class="value" style="font-family: monospace;">{order.order_number}</span>
+    </div>
+    <div class="info-item">
+        <span class="label">عدد المنتجات:</span>
+        <span class="value">{order.total_products} منتج</span>
+    </div>
+    <div class="info-item">
+        <span class="label">إجمالي الكميات المسحوبة:</span>
+        <span class="value">{order.total_quantities} حبة</span>
     </div>
+    <div class="info-item" style="grid-column: span 2;">
+        <span class="label">تاريخ وساعة السحب:</span>
+        <span class="value">{order.created_at.strftime('%Y-%m-%d %H:%M')}</span>
+    </div>
+</div>
+
+<div style="font-weight: bold; font-size: 14pt; margin-bottom: 10px; color: #1e293b;">المنتجات في هذه الطلبية:</div>
+
+<table>
+    <thead>
+        <tr>
+            <th style="width: 10%;">#</th>
+            <th style="width: 30%;">رقم المنتج</th>
+            <th style="width: 20%;">الصورة</th>
+            <th style="width: 20%;">السعر</th>
+            <th style="width: 20%;">الكمية المسحوبة</th>
+        </tr>
+    </thead>
+    <tbody>
+        {rows_html}
+    </tbody>
+</table>
 </body>
 </html>
 '''
-        
-        # إنشاء PDF باستخدام Playwright
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.set_content(html_content)
-            
-            pdf_bytes = page.pdf(
-                format='A4',
-                landscape=True,
-                margin={'top': '1cm', 'right': '1cm', 'bottom': '1cm', 'left': '1cm'}
-            )
-            
-            browser.close()
-        
-        # إرجاع الاستجابة
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="products_list.pdf"'
-        
-        return response
-        
-    except Exception as e:
-        import traceback
-        error_msg = f'خطأ في إنشاء PDF: {str(e)}\n{traceback.format_exc()}'
-        return HttpResponse(error_msg, content_type='text/plain')
+    return html_content
+
 
 def export_order_pdf(request, order_id):
+    """
+    PDF تفاصيل الطلبية. الطلبية لا تتغير بعد إنشائها، فيُحفظ الملف في ذاكرة التصدير المؤقتة
+    ويُعاد إنشاؤه فقط إن تغيرت منتجاتها (السعر / الصورة).
+    """
     from django.http import HttpResponse
-    from playwright.sync_api import sync_playwright
-    from datetime import datetime
+    from .utils.export_cache import ExportArtifact, order_version
+    from .utils.pdf_native import order_pdf, pdf_engine
+    from .utils.pdf_service import render_pdf
     try:
         order = get_object_or_404(Order, id=order_id)
         
@@ -2161,134 +2238,21 @@ def export_order_pdf(request, order_id):
         product_numbers = [p.get('product_number') for p in order.products_data if p.get('product_number')]
         products = Product.objects.filter(product_number__in=product_numbers)
         products_map = {p.product_number: p for p in products}
+        engine = pdf_engine(request.GET.get('engine'))
 
-        rows_html = ''
-        for idx, item in enumerate(order.products_data, start=1):
-            num = item.get('product_number')
-            taken = item.get('quantity_taken')
-            
-            img_html = '-'
-            price = 0
-            if num in products_map:
-                prod = products_map[num]
-                price = float(prod.price) if prod.price is not None else 0
-                if prod.image:
-                    try:
-                        import base64
-                        with open(prod.image.path, "rb") as image_file:
-                            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                            img_html = f'<img src="data:image/jpeg;base64,{encoded_string}" style="max-width: 50px; max-height: 50px; object-fit: contain;">'
-                    except:
-                        pass
-                elif prod.image_url:
-                    img_html = f'<img src="{prod.image_url}" style="max-width: 50px; max-height: 50px; object-fit: contain;">'
-
-            rows_html += f'''
-            <tr>
-                <td>{idx}</td>
-                <td style="text-align: center;"><strong>{num}</strong></td>
-                <td style="text-align: center;">{img_html}</td>
-                <td style="text-align: center;">{price}</td>
-                <td style="text-align: center;">{taken}</td>
-            </tr>
-            '''
-
-        html_content = f'''
-<!DOCTYPE html>
-<html dir="rtl" lang="ar">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: 'Segoe UI', 'Arial', 'Tahoma', sans-serif; font-size: 10pt; direction: rtl; padding: 20px; }}
-        .header-title {{ text-align: center; color: #1e293b; font-size: 16pt; font-weight: bold; margin-bottom: 15px; border-bottom: 2px solid #e2e8f0; padding-bottom: 5px; }}
-        
-        .info-grid {{ 
-            display: grid; 
-            grid-template-columns: repeat(2, 1fr); 
-            gap: 10px; 
-            margin-bottom: 20px; 
-            background: #f8fafc;
-            padding: 15px;
-            border-radius: 8px;
-            border: 1px solid #e2e8f0;
-        }}
-        
-        .info-item {{ margin-bottom: 5px; }}
-        .label {{ color: #64748b; font-weight: bold; font-size: 9pt; margin-bottom: 2px; display: block; }}
-        .value {{ color: #0f172a; font-weight: bold; font-size: 11pt; }}
-        
-        table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-        th {{ background: #1e293b; color: white; font-weight: bold; padding: 8px; border: 1px solid #1e293b; font-size: 10pt; }}
-        td {{ padding: 6px; border: 1px solid #cbd5e1; font-size: 10pt; }}
-        tr:nth-child(even) {{ background-color: #f1f5f9; }}
-        
-        @page {{
-            margin: 0.5cm;
-            size: A4;
-        }}
-    </style>
-    <title>طلبية {order.order_number}</title>
-</head>
-<body>
-    <div class="header-title">تفاصيل الطلبية</div>
-    
-    <div class="info-grid">
-        <div class="info-item">
-            <span class="label">اسم المستلم:</span>
-            <span class="value">{order.recipient_name or '-'}</span>
-        </div>
-        <div class="info-item">
-            <span class="label">رقم الطلبية:</span>
-            <span class="value" style="font-family: monospace;">{order.order_number}</span>
-        </div>
-        <div class="info-item">
-            <span class="label">عدد المنتجات:</span>
-            <span class="value">{order.total_products} منتج</span>
-        </div>
-        <div class="info-item">
-            <span class="label">إجمالي الكميات المسحوبة:</span>
-            <span class="value">{order.total_quantities} حبة</span>
-        </div>
-        <div class="info-item" style="grid-column: span 2;">
-            <span class="label">تاريخ وساعة السحب:</span>
-            <span class="value">{order.created_at.strftime('%Y-%m-%d %H:%M')}</span>
-        </div>
-    </div>
-
-    <div style="font-weight: bold; font-size: 14pt; margin-bottom: 10px; color: #1e293b;">المنتجات في هذه الطلبية:</div>
-    
-    <table>
-        <thead>
-            <tr>
-                <th style="width: 10%;">#</th>
-                <th style="width: 30%;">رقم المنتج</th>
-                <th style="width: 20%;">الصورة</th>
-                <th style="width: 20%;">السعر</th>
-                <th style="width: 20%;">الكمية المسحوبة</th>
-            </tr>
-        </thead>
-        <tbody>
-            {rows_html}
-        </tbody>
-    </table>
-</body>
-</html>
-'''
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.set_content(html_content)
-            pdf_bytes = page.pdf(
+        def build():
+            if engine == 'reportlab':
+                return order_pdf(order, products_map)
+            return render_pdf(
+                _order_pdf_html(order, products_map),
                 format='A4',
                 print_background=True,
                 margin={'top': '1cm', 'right': '1cm', 'bottom': '1cm', 'left': '1cm'}
             )
-            browser.close()
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
-        filename = f"order_{order.order_number}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+
+        artifact = ExportArtifact('order_pdf', {'order': order.pk, 'engine': engine},
+                                  order_version(order, products_map.values()), '.pdf')
+        return artifact.response(request, build, f"order_{order.order_number}.pdf", 'application/pdf')
     except Exception as e:
         import traceback
         error_msg = f'خطأ في إنشاء PDF: {str(e)}\n{traceback.format_exc()}'
@@ -2296,84 +2260,26 @@ def export_order_pdf(request, order_id):
 
 
 def export_products_excel(request):
-    """تصدير قائمة المنتجات إلى Excel"""
-    from django.http import HttpResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    from openpyxl.utils import get_column_letter
-    
-    # إنشاء workbook جديد
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "المنتجات"
-    
-    # تنسيق النمط العربي
-    arabic_font = Font(name='Arial', size=12, bold=True)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # رأس الجدول
-    headers = ['#', 'رقم المنتج', 'الاسم', 'الفئة', 'الكمية', 'الموقع', 'تاريخ الإضافة']
-    ws.append(headers)
-    
-    # تنسيق رأس الجدول
-    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(name='Arial', size=12, bold=True, color='FFFFFF')
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
-        cell.border = border
-    
-    # جلب المنتجات
-    products = Product.objects.all().order_by('product_number')
-    
-    # إضافة البيانات
-    for idx, product in enumerate(products, start=1):
-        location_text = product.location.full_location if product.location else 'لا يوجد موقع'
-        
-        row_data = [
-            idx,
-            product.product_number,
-            product.name,
-            product.category or '',
-            product.quantity,
-            location_text,
-            product.created_at.strftime('%Y-%m-%d')
-        ]
-        
-        ws.append(row_data)
-        
-        # تنسيق الصف
-        for col in range(1, len(row_data) + 1):
-            cell = ws.cell(row=idx + 1, column=col)
-            cell.alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
-            cell.border = border
-            cell.font = Font(name='Arial', size=11)
-    
-    # ضبط عرض الأعمدة
-    column_widths = [5, 15, 25, 15, 15, 10, 12, 15]
-    for col, width in enumerate(column_widths, start=1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    # إعداد الاستجابة
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    """
+    تصدير قائمة المنتجات إلى Excel (مصنف write_only بأنماط مشتركة) أو CSV (format=csv).
+    المنتجات تُقرأ باستعلام واحد مع iterator، والملف يُحفظ في ذاكرة التصدير المؤقتة لكل إصدار من البيانات.
+    """
+    from .utils.export_cache import ExportArtifact, products_version
+    from .utils.product_export import stream_products_csv, write_products_xlsx
+
+    # الملف يُعاد استخدامه من ذاكرة التصدير المؤقتة ما لم تتغير المنتجات
+    version = products_version()
+    if request.GET.get('format') == 'csv':
+        artifact = ExportArtifact('products_csv', {}, version, '.csv')
+        return artifact.response(request, stream_products_csv, 'قائمة_المنتجات.csv', 'text/csv; charset=utf-8')
+
+    artifact = ExportArtifact('products_xlsx', {}, version, '.xlsx')
+    return artifact.response(
+        request,
+        write_products_xlsx,
+        'قائمة_المنتجات.xlsx',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    response['Content-Disposition'] = 'attachment; filename="قائمة_المنتجات.xlsx"'
-    
-    wb.save(response)
-    return response
-
-
- 
-
-
- 
 
 
 def convert_to_hijri(gregorian_date):
@@ -2510,7 +2416,12 @@ def update_location_notes(request):
 @exclude_maintenance
 @login_required
 def inspect_backup(request):
-    """تحليل ملف النسخ الاحتياطي وإرجاع تقرير تفصيلي قبل الاستيراد"""
+    """
+    تحليل ملف النسخ الاحتياطي وإرجاع تقرير تفصيلي قبل الاستيراد.
+    يُقرأ الملف بشكل متدفق (قسماً قسماً) دون تحميله كاملاً في الذاكرة.
+    """
+    from .utils.backup_parser import BackupInspector, BackupParseError, events_from_data, iter_backup_events
+
     try:
         uploaded_file = request.FILES.get('backup_file')
         inline_json = request.POST.get('backup_json')
@@ -2519,106 +2430,29 @@ def inspect_backup(request):
 
         filename = getattr(uploaded_file, 'name', '') if uploaded_file else 'inline.json'
         size = getattr(uploaded_file, 'size', None)
-        raw_bytes = uploaded_file.read() if uploaded_file else inline_json.encode('utf-8', errors='ignore')
-        data, parse_meta = _load_backup_data(raw_bytes, filename)
-        if data is None:
-            msg = 'الملف غير صالح (JSON)'
-            if isinstance(parse_meta, dict) and parse_meta.get('message'):
-                msg = msg + ' - ' + parse_meta.get('message')
-            return JsonResponse({'success': False, 'error': msg})
-        if isinstance(data, list):
-            grouped = {}
-            for item in data:
-                if isinstance(item, dict):
-                    model = item.get('model') or ''
-                    name = model.split('.')[-1] if model else ''
-                    if not name:
-                        continue
-                    section = name + 's'
-                    if name == 'userprofile':
-                        section = 'user_profiles'
-                    elif name == 'useractivitylog':
-                        section = 'user_activity_logs'
-                    elif name == 'auditlog':
-                        section = 'audit_logs'
-                    grouped.setdefault(section, []).append(item)
-            data = {'export_info': {'description': 'array_payload_transformed'}, **grouped}
-
-        export_info = data.get('export_info', {})
-        known_sections = [
-            'warehouses', 'locations', 'products',
-            'orders', 'returns', 'audit_logs',
-            'user_profiles', 'user_activity_logs'
-        ]
-        sections = []
-        schema_errors = []
-
-        def analyze_section(name, items):
-            info = {
-                'name': name,
-                'count': 0,
-                'models': {},
-                'schema_ok': True,
-                'errors': [],
-                'sample': []
-            }
-            if not isinstance(items, list):
-                info['schema_ok'] = False
-                info['errors'].append('القسم ليس مصفوفة')
-                return info
-            info['count'] = len(items)
-            for idx, item in enumerate(items):
-                if idx < 3:
-                    try:
-                        info['sample'].append(item)
-                    except Exception:
-                        pass
-                if not isinstance(item, dict):
-                    info['schema_ok'] = False
-                    info['errors'].append(f'{name}[{idx}]: العنصر ليس كائناً JSON')
-                    continue
-                for req in ['model', 'pk', 'fields']:
-                    if req not in item:
-                        info['schema_ok'] = False
-                        info['errors'].append(f"{name}[{idx}]: المكوّن '{req}' مفقود")
-                        break
-                model = item.get('model')
-                if isinstance(model, str):
-                    info['models'][model] = info['models'].get(model, 0) + 1
-            return info
-
-        for key, value in data.items():
-            if isinstance(value, list):
-                sec = analyze_section(key, value)
-                sections.append(sec)
-                if sec['errors']:
-                    schema_errors.extend(sec['errors'])
-
-        # تحليل التكرار في المنتجات الموجودة مسبقاً
-        product_duplicates = []
-        if 'products' in data and isinstance(data['products'], list):
-            try:
-                from collections import Counter
-                backup_numbers = []
-                for item in data['products']:
-                    if isinstance(item, dict) and isinstance(item.get('fields'), dict):
-                        pn = item['fields'].get('product_number')
-                        if pn:
-                            backup_numbers.append(pn)
-                counts = Counter(backup_numbers)
-                numbers = list(counts.keys())
-                existing = Product.objects.filter(product_number__in=numbers).values('product_number', 'name')
-                exist_map = {e['product_number']: e['name'] for e in existing}
-                for pn, cnt in counts.items():
-                    if pn in exist_map or cnt > 1:
-                        product_duplicates.append({
-                            'product_number': pn,
-                            'count_in_backup': cnt,
-                            'existing': pn in exist_map,
-                            'existing_name': exist_map.get(pn)
-                        })
-            except Exception:
-                pass
+        source = uploaded_file if uploaded_file else inline_json.encode('utf-8', errors='ignore')
+        inspector = BackupInspector()
+        parse_meta = {}
+        try:
+            for event in iter_backup_events(source, filename, parse_meta):
+                inspector.feed(*event)
+        except BackupParseError:
+            # ملفات معدلة يدوياً (تعليقات، فواصل زائدة...) تُقرأ بالمحلل المتسامح إن لم تكن كبيرة
+            data, parse_meta = _load_backup_data(source, filename)
+            if data is None:
+                msg = 'الملف غير صالح (JSON)'
+                if isinstance(parse_meta, dict) and parse_meta.get('message'):
+                    msg = msg + ' - ' + parse_meta.get('message')
+                return JsonResponse({'success': False, 'error': msg})
+            inspector = BackupInspector()
+            for event in events_from_data(data):
+                inspector.feed(*event)
+
+        report = inspector.report()
+        export_info = report['export_info']
+        sections = report['sections']
+        schema_errors = report['schema_errors']
+        product_duplicates = report['product_duplicates']
 
         # اقتراح التبعيات
         present = set([s['name'] for s in sections if s['count'] > 0])
@@ -2669,57 +2503,52 @@ def reset_environment(request):
         return JsonResponse({'success': True, 'message': 'تم تهيئة بيئة نظيفة بنجاح'})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
+
+
+@login_required
+@admin_required
 def export_backup(request):
-    """تصدير النسخ الاحتياطي الشامل - يشمل جميع البيانات والأنشطة"""
+    """
+    تصدير النسخ الاحتياطي الشامل - يشمل جميع البيانات والأنشطة.
+    يُبث الملف تدريجياً (StreamingHttpResponse) مع المرور على كل جدول بدفعات:
+    - format=json (افتراضي): ملف JSON متوافق مع الاستيراد، ويمكن ضغطه عبر gzip=1
+    - format=zip: ملف ZIP يحتوي NDJSON لكل جدول مع manifest.json
+    - type=differential: التغييرات فقط منذ علامة آخر نسخة مكتملة (بما فيها المحذوفات)
+    علامة آخر نسخة تُحدّث فقط لطلب POST (زر التصدير) أو طلب تفاضلي صريح، وليس لأي GET
+    (الروابط المسبقة الجلب لا يجب أن تجعل النسخة التفاضلية التالية تتخطى تغييرات).
+    """
+    from .utils.backup import backup_plan, record_on_completion, stream_json_backup, stream_zip_backup
+    from .utils.streaming import buffered, gzip_stream
+
+    params = request.POST if request.method == 'POST' else request.GET
+    export_format = params.get('format', 'json')
+    use_gzip = params.get('gzip') in ('1', 'true')
+    differential = params.get('type') == 'differential'
+    backup_type = 'differential' if differential else 'full'
+    label = 'diff' if differential else 'full'
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
     try:
-        # جمع جميع البيانات بشكل شامل
-        data = {
-            'export_info': {
-                'date': datetime.now().isoformat(),
-                'version': '2.0',
-                'description': 'نسخ احتياطي شامل كامل من نظام إدارة المستودع - يشمل جميع البيانات والعمليات والأنشطة'
-            },
-            # البيانات الأساسية
-            'warehouses': json.loads(serializers.serialize('json', Warehouse.objects.all())),
-            'locations': json.loads(serializers.serialize('json', Location.objects.all())),
-            'products': json.loads(serializers.serialize('json', Product.objects.all())),
-            
-            # سجلات العمليات
-            'audit_logs': json.loads(serializers.serialize('json', AuditLog.objects.all())),
-            'orders': json.loads(serializers.serialize('json', Order.objects.all())),
-            'returns': json.loads(serializers.serialize('json', ProductReturn.objects.all())),
-            
-        # التقارير (تمت إزالة التقارير اليومية)
-            
-            # بيانات المستخدمين والأنشطة (استثناء admin من UserProfile لتجنب التكرار)
-            # نحذف UserProfile للمستخدمين الذين هم superuser (admin) لتجنب التكرار عند الاستيراد
-            'user_profiles': json.loads(serializers.serialize('json', UserProfile.objects.exclude(user__is_superuser=True))),
-            'user_activity_logs': json.loads(serializers.serialize('json', UserActivityLog.objects.all())),
-            
-            # إحصائيات النسخ الاحتياطي
-            'backup_stats': {
-                'warehouses_count': Warehouse.objects.count(),
-                'locations_count': Location.objects.count(),
-                'products_count': Product.objects.count(),
-                'audit_logs_count': AuditLog.objects.count(),
-                'orders_count': Order.objects.count(),
-                'returns_count': ProductReturn.objects.count(),
-                
-                'user_profiles_count': UserProfile.objects.exclude(user__is_superuser=True).count(),  # عدد UserProfiles بدون admin
-                'user_activity_logs_count': UserActivityLog.objects.count(),
-            }
-        }
-        
-        # إنشاء ملف JSON
-        json_data = json.dumps(data, ensure_ascii=False, indent=2)
-        
-        # إعداد الاستجابة
-        filename = f'backup_full_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        response = HttpResponse(json_data, content_type='application/json')
+        sections, info, watermark = backup_plan(differential=differential)
+        if export_format == 'zip':
+            stream = stream_zip_backup(sections, info)
+            filename = f'backup_{label}_{timestamp}.zip'
+            content_type = 'application/zip'
+        else:
+            stream = buffered(stream_json_backup(sections, info))
+            filename = f'backup_{label}_{timestamp}.json'
+            content_type = 'application/json'
+            if use_gzip:
+                stream = gzip_stream(stream)
+                filename += '.gz'
+                content_type = 'application/gzip'
+
+        if request.method == 'POST' or differential:
+            stream = record_on_completion(stream, watermark, backup_type)
+        response = StreamingHttpResponse(stream, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
         return response
-        
+
     except Exception as e:
         logger.error(f'Error in export_backup: {str(e)}')
         return JsonResponse({
@@ -2734,6 +2563,8 @@ def export_backup(request):
 @login_required
 def import_backup(request):
     """استيراد النسخ الاحتياطي"""
+    from .utils.backup_import import import_backup_payload
+
     try:
         uploaded_file = request.FILES.get('backup_file')
         inline_json = request.POST.get('backup_json')
@@ -2741,39 +2572,13 @@ def import_backup(request):
             return JsonResponse({'success': False, 'error': 'لم يتم إرسال ملف أو محتوى JSON'})
         
         filename = getattr(uploaded_file, 'name', '') if uploaded_file else 'inline.json'
-        raw_bytes = uploaded_file.read() if uploaded_file else inline_json.encode('utf-8', errors='ignore')
-        data, parse_meta = _load_backup_data(raw_bytes, filename)
+        source = uploaded_file if uploaded_file else inline_json.encode('utf-8', errors='ignore')
+        data, parse_meta = _load_backup_data(source, filename)
         if data is None:
             msg = 'الملف غير صالح (JSON)'
             if isinstance(parse_meta, dict) and parse_meta.get('message'):
                 msg = msg + ' - ' + parse_meta.get('message')
             return JsonResponse({'success': False, 'error': msg})
-        if isinstance(data, list):
-            grouped = {}
-            for item in data:
-                if isinstance(item, dict):
-                    model = item.get('model') or ''
-                    name = model.split('.')[-1] if model else ''
-                    if not name:
-                        continue
-                    section = name + 's'
-                    if name == 'userprofile':
-                        section = 'user_profiles'
-                    elif name == 'useractivitylog':
-                        section = 'user_activity_logs'
-                    elif name == 'auditlog':
-                        section = 'audit_logs'
-                    grouped.setdefault(section, []).append(item)
-            data = {'export_info': {'description': 'array_payload_transformed'}, **grouped}
-        
-        # تهيئة export_info إن كان مفقوداً
-        if 'export_info' not in data or not isinstance(data.get('export_info'), dict):
-            data['export_info'] = {
-                'date': datetime.now().isoformat(),
-                'version': 'unknown',
-                'description': 'استيراد بدون معلومات التصدير'
-            }
-        
         clear_existing = request.POST.get('clear_existing', 'false') == 'true'
         avoid_duplicates = request.POST.get('avoid_duplicates', 'false') == 'true'
         # الأقسام المحددة (اختياري)
@@ -2782,202 +2587,13 @@ def import_backup(request):
             selected_sections = set(json.loads(selected_sections_raw)) if selected_sections_raw else set()
         except Exception:
             selected_sections = set()
-        # إذا لم تُحدّد أقسام، نستخدم الافتراضي: كل ما هو موجود في الملف
-        if not selected_sections:
-            selected_sections = set([k for k, v in data.items() if isinstance(v, list)])
-        
-        # تحقق بنية الأقسام قبل الاستيراد وإعداد إحصائيات
-        schema_errors = []
-        for section in selected_sections:
-            if section in data:
-                if not isinstance(data[section], list):
-                    schema_errors.append(f"القسم '{section}' يجب أن يكون مصفوفة")
-                    continue
-                for idx, item in enumerate(data[section]):
-                    if not isinstance(item, dict):
-                        schema_errors.append(f"{section}[{idx}]: العنصر ليس كائناً JSON")
-                        break
-                    for k in ['model', 'pk', 'fields']:
-                        if k not in item:
-                            schema_errors.append(f"{section}[{idx}]: المكوّن '{k}' مفقود")
-                            break
-        if schema_errors:
-            return JsonResponse({'success': False, 'error': 'أخطاء في بنية الملف', 'details': schema_errors})
-        
-        # إضافة التبعيات اللازمة تلقائياً لتجنب أخطاء المراجع
-        # المنتجات تحتاج الأماكن والمستودعات، والأماكن تحتاج مستودعات، والسجلات تحتاج المنتجات
-        if 'products' in selected_sections:
-            selected_sections.update(['locations', 'warehouses'])
-        if 'locations' in selected_sections:
-            selected_sections.add('warehouses')
-        if 'audit_logs' in selected_sections:
-            selected_sections.update(['products', 'locations', 'warehouses'])
-        
-        # بدء الاستيراد
-        import_counts = {s: 0 for s in selected_sections}
-        import_errors = []
-        with transaction.atomic():
-            if clear_existing:
-                # حذف بحسب الأقسام المختارة، مع مراعاة العلاقات
-                if 'user_activity_logs' in selected_sections:
-                    UserActivityLog.objects.all().delete()
-                if 'audit_logs' in selected_sections:
-                    AuditLog.objects.all().delete()
-                if 'returns' in selected_sections:
-                    ProductReturn.objects.all().delete()
-                if 'orders' in selected_sections:
-                    Order.objects.all().delete()
-                if 'products' in selected_sections:
-                    Product.objects.all().delete()
-                if 'locations' in selected_sections:
-                    Location.objects.all().delete()
-                if 'warehouses' in selected_sections:
-                    Warehouse.objects.all().delete()
-                if 'user_profiles' in selected_sections:
-                    # حماية الحساب المسؤول 'ammar' من الحذف أثناء الاستيراد
-                    UserProfile.objects.exclude(user__username='ammar').exclude(user__is_superuser=True).delete()
-            
-            # استيراد البيانات بالترتيب الصحيح (حسب العلاقات)
-            # 1. البيانات الأساسية أولاً
-            if 'warehouses' in selected_sections and 'warehouses' in data:
-                objects = serializers.deserialize('json', json.dumps(data['warehouses']))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['warehouses'] += 1
-                    except Exception as e:
-                        import_errors.append(f"warehouses[{i}]: {str(e)}")
-            
-            if 'locations' in selected_sections and 'locations' in data:
-                objects = serializers.deserialize('json', json.dumps(data['locations']))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['locations'] += 1
-                    except Exception as e:
-                        import_errors.append(f"locations[{i}]: {str(e)}")
-            
-            if 'products' in selected_sections and 'products' in data:
-                objects = serializers.deserialize('json', json.dumps(data['products']))
-                for i, obj in enumerate(objects):
-                    try:
-                        instance = obj.object
-                        if avoid_duplicates:
-                            pn = getattr(instance, 'product_number', None)
-                            if pn:
-                                existing = Product.objects.filter(product_number=pn).first()
-                                if existing:
-                                    instance.pk = existing.pk
-                        instance.save()
-                        import_counts['products'] += 1
-                    except Exception as e:
-                        import_errors.append(f"products[{i}]: {str(e)}")
-            
-            # 2. ملفات المستخدمين (معالجة ذكية للمستخدمين المفقودين)
-            if 'user_profiles' in selected_sections and 'user_profiles' in data:
-                # التأكد من وجود مستخدم النظام الافتراضي
-                system_user, _ = User.objects.get_or_create(username='system', defaults={'email': 'system@local', 'is_active': False})
-                
-                for i, profile_data in enumerate(data['user_profiles']):
-                    try:
-                        # استخراج user_id من البيانات
-                        user_id = None
-                        if 'fields' in profile_data:
-                            user_id = profile_data['fields'].get('user') or profile_data['fields'].get('user_id')
-                        
-                        if not user_id:
-                            continue
-
-                        # التحقق من وجود المستخدم
-                        if not User.objects.filter(pk=user_id).exists():
-                            # إذا كان المستخدم غير موجود، نربط الملف بمستخدم النظام أو نتجاوزه
-                            # هنا سنقوم بإنشاء مستخدم وهمي للحفاظ على تكامل البيانات
-                            try:
-                                # محاولة استرداد اسم المستخدم القديم إذا كان متاحاً في مكان ما، أو استخدام ID
-                                dummy_username = f"imported_user_{user_id}"
-                                User.objects.create(pk=user_id, username=dummy_username, is_active=False)
-                            except Exception:
-                                # إذا فشل إنشاء المستخدم بنفس الـ ID (ربما تعارض)، نستخدم مستخدم النظام
-                                profile_data['fields']['user'] = system_user.id
-                        
-                        # الآن نحاول الاستيراد
-                        objects = serializers.deserialize('json', json.dumps([profile_data]))
-                        for obj in objects:
-                            # حماية: لا تقم بتحديث ملف المسؤول ammar إذا كان موجوداً في النسخة الاحتياطية بمعلومات قديمة
-                            if obj.object.user.username == 'ammar':
-                                continue
-                            obj.save()
-                            import_counts['user_profiles'] += 1
-                            
-                    except Exception as e:
-                        import_errors.append(f"user_profiles[{i}]: {str(e)}")
-
-            
-            # 3. سجلات العمليات
-            if 'audit_logs' in selected_sections and 'audit_logs' in data:
-                objects = serializers.deserialize('json', json.dumps(data['audit_logs']))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['audit_logs'] += 1
-                    except Exception as e:
-                        import_errors.append(f"audit_logs[{i}]: {str(e)}")
-            
-            if 'orders' in selected_sections and 'orders' in data:
-                objects = serializers.deserialize('json', json.dumps(data['orders']))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['orders'] += 1
-                    except Exception as e:
-                        import_errors.append(f"orders[{i}]: {str(e)}")
-            
-            if 'returns' in selected_sections and 'returns' in data:
-                objects = serializers.deserialize('json', json.dumps(data['returns']))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['returns'] += 1
-                    except Exception as e:
-                        import_errors.append(f"returns[{i}]: {str(e)}")
-            
-            # 4. التقارير (لا يوجد تقارير يومية بعد الإزالة)
-            
-            # 5. سجلات أنشطة المستخدمين
-            if 'user_activity_logs' in selected_sections and 'user_activity_logs' in data:
-                # التأكد من وجود مستخدم النظام لمعالجة السجلات التي ليس لها مستخدم
-                system_user, _ = User.objects.get_or_create(username='system', defaults={'email': 'system@local', 'is_active': False})
-                
-                # معالجة السجلات قبل الاستيراد
-                logs_data = data['user_activity_logs']
-                for log in logs_data:
-                    if 'fields' in log and 'user' in log['fields']:
-                        user_id = log['fields']['user']
-                        # التحقق من وجود المستخدم
-                        if not User.objects.filter(pk=user_id).exists():
-                            # ربط السجل بمستخدم النظام بدلاً من المستخدم المفقود
-                            log['fields']['user'] = system_user.id
-
-                objects = serializers.deserialize('json', json.dumps(logs_data))
-                for i, obj in enumerate(objects):
-                    try:
-                        obj.save()
-                        import_counts['user_activity_logs'] += 1
-                    except Exception as e:
-                        import_errors.append(f"user_activity_logs[{i}]: {str(e)}")
         
-        if import_errors:
-            return JsonResponse({
-                'success': False,
-                'error': 'حدثت أخطاء أثناء الاستيراد',
-                'details': import_errors[:50],
-                'imported': import_counts
-            })
-        return JsonResponse({
-            'success': True,
-            'message': 'تم الاستيراد بنجاح',
-            'imported': import_counts
-        })
+        return JsonResponse(import_backup_payload(
+            data,
+            selected_sections=selected_sections,
+            clear_existing=clear_existing,
+            avoid_duplicates=avoid_duplicates,
+        ))
         
     except json.JSONDecodeError as e:
         return JsonResponse({
@@ -3012,6 +2628,79 @@ def data_deletion_page(request):
     })
 
 
+# ملاحظة أمنية: يفضل وضع كلمة المرور في الإعدادات/المتغيرات البيئية
+DELETE_DATA_PASSWORD = 'Thepest**1'
+
+
+def _delete_selected_data(options):
+    """حذف الأقسام المحددة (delete_products, delete_orders, ...) وإرجاع وصف ما حُذف"""
+    # قراءة البيانات المحددة للحذف
+    delete_products = options.get('delete_products', False)
+    delete_locations = options.get('delete_locations', False)
+    delete_warehouses = options.get('delete_warehouses', False)
+    delete_audit_logs = options.get('delete_audit_logs', False)
+    
+    delete_orders = options.get('delete_orders', False)
+    delete_returns = options.get('delete_returns', False)
+    delete_user_profiles = options.get('delete_user_profiles', False)
+    delete_user_activity_logs = options.get('delete_user_activity_logs', False)
+    
+    deleted_items = []
+    
+    # حذف البيانات المحددة بالترتيب الصحيح (تجنب أخطاء Foreign Key)
+    # 1. حذف السجلات التي تعتمد على بيانات أخرى أولاً
+    if delete_user_activity_logs:
+        count = UserActivityLog.objects.count()
+        UserActivityLog.objects.all().delete()
+        deleted_items.append(f'{count} سجل نشاط مستخدم')
+    
+    if delete_audit_logs:
+        count = AuditLog.objects.count()
+        AuditLog.objects.all().delete()
+        deleted_items.append(f'{count} سجل عمليات')
+    
+    if delete_returns:
+        count = ProductReturn.objects.count()
+        ProductReturn.objects.all().delete()
+        deleted_items.append(f'{count} مرتجع')
+    
+    if delete_orders:
+        count = Order.objects.count()
+        Order.objects.all().delete()
+        deleted_items.append(f'{count} طلبية')
+    
+    if delete_products:
+        count = Product.objects.count()
+        Product.objects.all().delete()
+        deleted_items.append(f'{count} منتج')
+    
+    if delete_locations:
+        count = Location.objects.count()
+        Location.objects.all().delete()
+        deleted_items.append(f'{count} مكان')
+    
+    if delete_warehouses:
+        count = Warehouse.objects.count()
+        Warehouse.objects.all().delete()
+        deleted_items.append(f'{count} مستودع')
+    
+    
+    
+    if delete_user_profiles:
+        # حذف جميع ملفات المستخدمين ما عدا المستخدم المسؤول 'ammar'
+        profiles_to_delete = UserProfile.objects.exclude(user__username='ammar')
+        count = profiles_to_delete.count()
+        profiles_to_delete.delete()
+        
+        # حذف المستخدمين المرتبطين (ما عدا ammar)
+        users_to_delete = User.objects.exclude(username='ammar').exclude(is_superuser=True)
+        users_count = users_to_delete.count()
+        users_to_delete.delete()
+        
+        deleted_items.append(f'{count} ملف مستخدم و {users_count} حساب')
+    return deleted_items
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @transaction.atomic
@@ -3023,77 +2712,12 @@ def delete_data(request):
         data = json.loads(request.body)
         # التحقق من كلمة المرور
         password = str(data.get('password', '') or '').strip()
-        # ملاحظة أمنية: يفضل وضع كلمة المرور في الإعدادات/المتغيرات البيئية
-        REQUIRED_PASSWORD = 'Thepest**1'
         if not password:
             return JsonResponse({'success': False, 'error': 'يجب إدخال كلمة مرور الحذف'}, status=400)
-        if password != REQUIRED_PASSWORD:
+        if password != DELETE_DATA_PASSWORD:
             return JsonResponse({'success': False, 'error': 'كلمة مرور غير صحيحة'}, status=403)
         
-        # قراءة البيانات المحددة للحذف
-        delete_products = data.get('delete_products', False)
-        delete_locations = data.get('delete_locations', False)
-        delete_warehouses = data.get('delete_warehouses', False)
-        delete_audit_logs = data.get('delete_audit_logs', False)
-        
-        delete_orders = data.get('delete_orders', False)
-        delete_returns = data.get('delete_returns', False)
-        delete_user_profiles = data.get('delete_user_profiles', False)
-        delete_user_activity_logs = data.get('delete_user_activity_logs', False)
-        
-        deleted_items = []
-        
-        # حذف البيانات المحددة بالترتيب الصحيح (تجنب أخطاء Foreign Key)
-        # 1. حذف السجلات التي تعتمد على بيانات أخرى أولاً
-        if delete_user_activity_logs:
-            count = UserActivityLog.objects.count()
-            UserActivityLog.objects.all().delete()
-            deleted_items.append(f'{count} سجل نشاط مستخدم')
-        
-        if delete_audit_logs:
-            count = AuditLog.objects.count()
-            AuditLog.objects.all().delete()
-            deleted_items.append(f'{count} سجل عمليات')
-        
-        if delete_returns:
-            count = ProductReturn.objects.count()
-            ProductReturn.objects.all().delete()
-            deleted_items.append(f'{count} مرتجع')
-        
-        if delete_orders:
-            count = Order.objects.count()
-            Order.objects.all().delete()
-            deleted_items.append(f'{count} طلبية')
-        
-        if delete_products:
-            count = Product.objects.count()
-            Product.objects.all().delete()
-            deleted_items.append(f'{count} منتج')
-        
-        if delete_locations:
-            count = Location.objects.count()
-            Location.objects.all().delete()
-            deleted_items.append(f'{count} مكان')
-        
-        if delete_warehouses:
-            count = Warehouse.objects.count()
-            Warehouse.objects.all().delete()
-            deleted_items.append(f'{count} مستودع')
-        
-        
-        
-        if delete_user_profiles:
-            # حذف جميع ملفات المستخدمين ما عدا المستخدم المسؤول 'ammar'
-            profiles_to_delete = UserProfile.objects.exclude(user__username='ammar')
-            count = profiles_to_delete.count()
-            profiles_to_delete.delete()
-            
-            # حذف المستخدمين المرتبطين (ما عدا ammar)
-            users_to_delete = User.objects.exclude(username='ammar').exclude(is_superuser=True)
-            users_count = users_to_delete.count()
-            users_to_delete.delete()
-            
-            deleted_items.append(f'{count} ملف مستخدم و {users_count} حساب')
+        deleted_items = _delete_selected_data(data)
         
         if not deleted_items:
             return JsonResponse({
@@ -3120,18 +2744,15 @@ def delete_data(request):
 
 @login_required
 def get_all_recipients_stats(request):
-    """API لجلب إحصائيات جميع المستلمين"""
-    from django.db.models import Count, Sum
-    recipients = (
-        Order.objects.exclude(recipient_name__isnull=True)
-        .exclude(recipient_name='')
-        .values('recipient_name')
-        .annotate(count=Count('id'), total_qty=Sum('total_quantities'))
-        .order_by('-count')
-    )
+    """API لجلب إحصائيات جميع المستلمين (من الإحصائيات التراكمية لكل مستلم)"""
+    from .utils.order_stats import recipient_stats
+    recipients = [
+        {'recipient_name': r.recipient_name, 'count': r.orders, 'total_qty': r.quantity}
+        for r in recipient_stats()
+    ]
     return JsonResponse({
         'success': True,
-        'recipients': list(recipients)
+        'recipients': recipients
     })
 
 
@@ -3139,8 +2760,7 @@ def get_all_recipients_stats(request):
 def orders_list(request):
     """عرض قائمة الطلبات المسحوبة مع إحصائيات متقدمة"""
     from django.core.paginator import Paginator
-    from django.db.models.functions import TruncDate
-    from django.db.models import Count, Sum
+    from .utils.order_stats import daily_series, order_totals, recipient_stats
     import json
     
     # الاستعلام الأساسي
@@ -3154,74 +2774,40 @@ def orders_list(request):
     if recipient_filter:
         orders_qs = orders_qs.filter(recipient_name=recipient_filter)
         
-        # تجميع سجل المواد للمستلم (لعرض جدول تفصيلي)
-        # نستخدم all() للحصول على كل العناصر، يمكن تحديد العدد لاحقاً إذا كان الأداء بطيئاً
-        for order in orders_qs:
-            products = order.products_data
-            if isinstance(products, str):
-                try:
-                    import json
-                    products = json.loads(products)
-                except:
-                    products = []
-            
-            for item in products:
-                # إذا كان هناك بحث محدد عن منتج، نتجاهل المنتجات الأخرى
-                if product_query:
-                    p_num = str(item.get('product_number', '')).strip().lower()
-                    # بحث دقيق لرقم المنتج
-                    if product_query != p_num:
-                        continue
-
-                qty = item.get('quantity_taken')
-                if qty is None:
-                    qty = item.get('quantity', 0)
-                
-                if int(qty) > 0:
-                    recipient_items.append({
-                        'date': order.created_at,
-                        'order_number': order.order_number,
-                        'order_id': order.id,
-                        'product_name': item.get('name', 'منتج'),
-                        'product_number': item.get('product_number', ''),
-                        'quantity': int(qty),
-                    })
-        
-        # ترتيب حسب التاريخ الأحدث
-        recipient_items.sort(key=lambda x: x['date'], reverse=True)
+        # سجل المواد للمستلم (جدول تفصيلي) من أسطر الطلبيات المفهرسة بالمستلم والتاريخ
+        lines = OrderLine.objects.filter(recipient_name=recipient_filter)
+        if product_query:
+            # بحث دقيق لرقم المنتج
+            lines = lines.filter(product_number__iexact=product_query)
+        recipient_items = [
+            {
+                'date': line['created_at'],
+                'order_number': line['order__order_number'],
+                'order_id': line['order_id'],
+                'product_name': line['product_name'] or 'منتج',
+                'product_number': line['product_number'],
+                'quantity': line['quantity'],
+            }
+            for line in lines.order_by('-created_at', 'pk').values(
+                'created_at', 'order__order_number', 'order_id', 'product_name', 'product_number', 'quantity',
+            )
+        ]
     
-    # إحصائيات عامة
-    total_orders = Order.objects.count()
-    today_orders = Order.objects.filter(created_at__date=timezone.now().date()).count()
-    total_quantities_taken = Order.objects.aggregate(
-        total=db_models.Sum('total_quantities')
-    )['total'] or 0
+    # إحصائيات عامة ورسوم بيانية من الإحصائيات التراكمية (صف لكل يوم / مستلم)
+    total_orders, today_orders, total_quantities_taken = order_totals()
 
     # 1. إحصائيات الرسم البياني: حركة السحب اليومية (آخر 30 يوم)
-    last_30_days = timezone.now() - timedelta(days=30)
-    daily_stats = (
-        Order.objects.filter(created_at__gte=last_30_days)
-        .annotate(date=TruncDate('created_at'))
-        .values('date')
-        .annotate(count=Count('id'), qty=Sum('total_quantities'))
-        .order_by('date')
-    )
+    daily_stats = daily_series(30)
     
-    daily_labels = [s['date'].strftime('%Y-%m-%d') for s in daily_stats]
-    daily_counts = [s['count'] for s in daily_stats]
-    daily_qtys = [s['qty'] for s in daily_stats]
+    daily_labels = [s.date.strftime('%Y-%m-%d') for s in daily_stats]
+    daily_counts = [s.orders for s in daily_stats]
+    daily_qtys = [s.quantity for s in daily_stats]
 
     # 2. إحصائيات الرسم البياني: أكثر المستلمين نشاطاً (Top 5)
-    top_recipients = (
-        Order.objects.exclude(recipient_name__isnull=True)
-        .exclude(recipient_name='')
-        .values('recipient_name')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:5]
-    )
+    top_recipients = recipient_stats(5)
     
-    recipient_labels = [s['recipient_name'] for s in top_recipients]
-    recipient_counts = [s['count'] for s in top_recipients]
+    recipient_labels = [s.recipient_name for s in top_recipients]
+    recipient_counts = [s.orders for s in top_recipients]
     
     # إضافة Pagination - 20 طلب لكل صفحة
     paginator = Paginator(orders_qs, 20)
@@ -3249,48 +2835,25 @@ def orders_list(request):
 @login_required
 def search_order_history(request):
     """API للبحث الذكي في سجلات المنتجات داخل الطلبات"""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncDate
+    from .utils.order_lines import product_lines
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'success': False, 'error': 'No query provided'})
     
-    # 1. البحث الأولي السريع: الطلبات التي يحتوي نصها (JSON) على كلمة البحث
-    candidates = Order.objects.filter(products_data__icontains=query)
-    
-    total_withdrawn = 0
-    recipients_map = {} # name -> count
-    dates_map = {} # date -> quantity
-    
-    # 2. الفحص الدقيق وحساب الكميات
-    for order in candidates:
-        try:
-            # products_data هو قائمة من القواميس
-            products = order.products_data
-            if isinstance(products, str):
-                import json
-                products = json.loads(products)
-                
-            for p in products:
-                # التحقق مما إذا كان هذا المنتج هو المقصود
-                p_name = str(p.get('name', '')).lower()
-                p_num = str(p.get('product_number', '')).strip().lower()
-                q_lower = query.lower()
-                
-                # بحث دقيق لرقم المنتج، أو جزئي للاسم
-                if q_lower == p_num or q_lower in p_name:
-                    # قد يكون المفتاح quantity أو quantity_taken حسب إصدار البيانات
-                    qty = int(p.get('quantity_taken', p.get('quantity', 0)))
-                    total_withdrawn += qty
-                    
-                    # تجميع المستلمين
-                    r_name = order.recipient_name or 'غير محدد'
-                    # نقوم بجمع الكميات بدلاً من عدد الطلبات
-                    recipients_map[r_name] = recipients_map.get(r_name, 0) + qty
-                    
-                    # تجميع التواريخ
-                    date_str = order.created_at.strftime('%Y-%m-%d')
-                    dates_map[date_str] = dates_map.get(date_str, 0) + qty
-        except Exception:
-            continue
+    # أسطر الطلبيات للمنتج (رقم دقيق أو جزء من الاسم المحفوظ في السطر) وتجميعها في قاعدة البيانات
+    lines = product_lines(query)
+    total_withdrawn = lines.aggregate(total=Sum('quantity'))['total'] or 0
+    recipients_map = {}
+    for row in lines.values('recipient_name').annotate(qty=Sum('quantity')).order_by():
+        # نجمع الكميات بدلاً من عدد الطلبات
+        r_name = row['recipient_name'] or 'غير محدد'
+        recipients_map[r_name] = recipients_map.get(r_name, 0) + row['qty']
+    dates_map = {
+        row['date'].strftime('%Y-%m-%d'): row['qty']
+        for row in lines.annotate(date=TruncDate('created_at')).values('date').annotate(qty=Sum('quantity')).order_by()
+    }
             
     # تحضير النتائج
     # إرجاع جميع المستلمين (بدون تقييد بـ 5)
@@ -3343,12 +2906,7 @@ def order_detail(request, order_id):
         if p_num in products_map:
             product = products_map[p_num]
             p['price'] = float(product.price) if product.price is not None else 0
-            if product.image:
-                p['image_url'] = product.image.url
-            elif product.image_url:
-                p['image_url'] = product.image_url
-            else:
-                p['image_url'] = None
+            p['image_url'] = product.thumbnail_url
         else:
              p['price'] = 0
 
@@ -3407,8 +2965,8 @@ def reset_all_quantities(request):
                 'count': 0
             })
         
-        # تحديث جميع الكميات إلى 0
-        updated_count = Product.objects.update(quantity=0)
+        # تحديث جميع الكميات إلى 0 (مع updated_at لأن update() لا يحدثه: النسخ التفاضلي وذاكرة التصدير تعتمدان عليه)
+        updated_count = Product.objects.update(quantity=0, updated_at=timezone.now())
         
         return JsonResponse({
             'success': True,
@@ -4392,7 +3950,9 @@ def return_detail(request, return_id):
 @admin_required
 def import_products_excel(request):
     """صفحة استيراد المنتجات من ملف Excel"""
-    return render(request, 'inventory_app/import_excel.html')
+    return render(request, 'inventory_app/import_excel.html', {
+        'background_jobs_enabled': getattr(settings, 'BACKGROUND_JOBS_ENABLED', False),
+    })
 
 
 @login_required
@@ -4407,52 +3967,37 @@ def upload_excel_file(request):
     
     excel_file = request.FILES['excel_file']
     
-    # التحقق من نوع الملف
-    if not excel_file.name.endswith(('.xlsx', '.xls')):
-        return JsonResponse({'error': 'يجب أن يكون الملف بصيغة Excel (.xlsx أو .xls)'}, status=400)
-    
+    from django.core.serializers.json import DjangoJSONEncoder
+    from .utils.excel_staging import SESSION_KEY, discard_user_uploads, iter_sheet_rows, purge_stale_uploads, stage_rows
+    from .utils.sheet_frame import CSV_EXTENSIONS, EXCEL_EXTENSIONS
+
+    # التحقق من نوع الملف (CSV/TSV تُقرأ بالمسار السريع بدلاً من openpyxl)
+    if not excel_file.name.lower().endswith(EXCEL_EXTENSIONS + CSV_EXTENSIONS):
+        return JsonResponse({'error': 'يجب أن يكون الملف بصيغة Excel (.xlsx أو .xls) أو CSV (.csv أو .tsv)'}, status=400)
+
     try:
-        import openpyxl
-        from openpyxl import load_workbook
-        
-        # قراءة الملف
-        wb = load_workbook(excel_file, data_only=True)
-        ws = wb.active
-        
-        # قراءة البيانات
-        data = []
-        headers = []
-        
-        for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-            if row_idx == 1:
-                # الصف الأول = العناوين
-                headers = [str(cell) if cell is not None else f'Column_{i}' for i, cell in enumerate(row, start=1)]
-            else:
-                # البيانات
-                if any(cell is not None for cell in row):  # تجاهل الصفوف الفارغة
-                    data.append(list(row))
-        
-        request.session['excel_data'] = {
-            'headers': headers,
-            'data': data
-        }
-        
-        total_rows = len(data)
+        # قراءة الملف بوضع read_only صفاً صفاً وكتابته في المخزن المرحلي على دفعات
+        # (الجلسة تحفظ معرف الرفع فقط بدلاً من الورقة كاملة)
+        purge_stale_uploads()
+        discard_user_uploads(request.user)
+        headers, rows = iter_sheet_rows(excel_file)
+        upload, first_rows = stage_rows(headers, rows, user=request.user, filename=excel_file.name)
+        request.session[SESSION_KEY] = str(upload.id)
+        request.session.pop('excel_data', None)
+        
+        total_rows = upload.total_rows
         # تم تحديث الحد المسموح به للمعاينة ليشمل كامل الملف
         # هذا يضمن أن المستخدم يرى ويعالج جميع البيانات، خاصة للملفات المتوسطة الحجم (مثل 420 منتج)
         preview_limit = total_rows
-        if total_rows > 5000:
-            # تنبيه: للملفات الكبيرة جداً، قد يكون الأداء بطيئاً في المتصفح
-            # لكننا سنسمح بذلك لضمان الدقة
-            preview_limit = total_rows
         
         return JsonResponse({
             'success': True,
+            'upload_id': str(upload.id),
             'headers': headers,
-            'data': data[:min(preview_limit, 50)],
+            'data': first_rows,
             'total_rows': total_rows,
             'preview_limit': preview_limit
-        })
+        }, encoder=DjangoJSONEncoder)
         
     except Exception as e:
         return JsonResponse({'error': f'خطأ في قراءة الملف: {str(e)}'}, status=500)
@@ -4461,7 +4006,17 @@ def upload_excel_file(request):
 @login_required
 @admin_required
 def preview_excel_data(request):
-    """معاينة البيانات من Excel قبل الإضافة"""
+    """
+    معاينة البيانات من Excel قبل الإضافة.
+    يُحسم وجود المنتجات باستعلامات IN مجمّعة، وتُعاد صفحة واحدة من المعاينة
+    (page / page_size) مع إمكانية التصفية حسب الحالة (status) أو نص البحث (search).
+    معاينة الملف المرحلي تُحفظ بعد أول طلب، فالصفحات التالية لا تعيد قراءة الملف.
+    """
+    from .utils.excel_preview import (
+        PREVIEW_PAGE_SIZE, build_preview, filter_preview, paginate, preview_counts, store_preview, stored_page,
+    )
+    from .utils.excel_staging import StagedSheet, get_sheet
+
     if request.method != 'POST':
         return JsonResponse({'error': 'طريقة غير مسموحة'}, status=405)
     
@@ -4469,9 +4024,9 @@ def preview_excel_data(request):
         import json
         data = json.loads(request.body)
         
-        # الحصول على البيانات من الجلسة
-        excel_data = request.session.get('excel_data')
-        if not excel_data:
+        # الحصول على البيانات من المخزن المرحلي
+        sheet = get_sheet(request, data.get('upload_id'))
+        if not sheet:
             return JsonResponse({'error': 'لم يتم العثور على بيانات Excel'}, status=400)
         
         # الحصول على تحديد الأعمدة
@@ -4483,182 +4038,50 @@ def preview_excel_data(request):
             if field not in column_mapping or column_mapping[field] is None:
                 return JsonResponse({'error': f'يجب تحديد عمود {field}'}, status=400)
         
-        headers = excel_data['headers']
-        total_rows = len(excel_data['data'])
-        
-        # السماح بمعاينة كافة الصفوف
-        preview_limit = total_rows
-        
-        rows = excel_data['data'][:preview_limit]
-        
-        # التحقق من وجود أعمدة اختيارية
-        has_final_model = 'final_model' in column_mapping and column_mapping['final_model'] is not None
-        has_name = 'name' in column_mapping and column_mapping['name'] is not None
-        has_category = 'category' in column_mapping and column_mapping['category'] is not None
-        
-        print(f"[DEBUG] Total rows in Excel: {len(rows)}")
-        print(f"[DEBUG] Has FINAL_MODEL column: {has_final_model}")
-        
-        # معاينة البيانات
-        preview_data = []
-        
-        for row_idx, row in enumerate(rows, start=2):
-            try:
-                # التحقق من أن الصف ليس فارغاً
-                if not any(cell for cell in row if cell is not None):
-                    continue
-                
-                # استخراج البيانات
-                try:
-                    product_number_cell = row[column_mapping['product_number']]
-                    product_number = str(product_number_cell).strip() if product_number_cell is not None else None
-                    
-                    # تخطي صفوف العناوين
-                    if product_number and product_number.upper() in ['MODEL', 'PRODUCT', 'رقم المنتج', 'PRODUCT NUMBER']:
-                        continue
-                except (IndexError, KeyError):
-                    product_number = None
-                
-                # استخراج FINAL_MODEL إذا كان موجوداً
-                final_model = None
-                if has_final_model:
-                    try:
-                        final_model_cell = row[column_mapping['final_model']]
-                        final_model = str(final_model_cell).strip() if final_model_cell is not None else None
-                        
-                        # تخطي صفوف العناوين
-                        if final_model and final_model.upper() in ['FINAL MODEL', 'FINAL_MODEL', 'رقم المنتج النهائي']:
-                            continue
-                    except (IndexError, KeyError):
-                        final_model = None
-                
-                # إجمالي الكمية (مطلوب)
-                try:
-                    total_cell = row[column_mapping['total_quantity']]
-                    if total_cell and isinstance(total_cell, (int, float)):
-                        total_quantity = int(total_cell)
-                    elif total_cell and str(total_cell).replace('.', '').replace('-', '').isdigit():
-                        total_quantity = int(float(total_cell))
-                    else:
-                        total_quantity = None
-                except (IndexError, KeyError, ValueError):
-                    total_quantity = None
-                
-                # حقول اختيارية: الاسم والفئة
-                name_val = None
-                category_val = None
-                try:
-                    if 'name' in column_mapping and column_mapping['name'] is not None:
-                        nc = row[column_mapping['name']]
-                        name_val = str(nc).strip() if nc is not None else None
-                except Exception:
-                    name_val = None
-                try:
-                    if 'category' in column_mapping and column_mapping['category'] is not None:
-                        cc = row[column_mapping['category']]
-                        category_val = str(cc).strip() if cc is not None else None
-                except Exception:
-                    category_val = None
-                
-                # الموقع
-                location_str = None
-                try:
-                    if 'location' in column_mapping and column_mapping['location'] is not None:
-                        loc_cell = row[column_mapping['location']]
-                        location_str = str(loc_cell).strip() if loc_cell else None
-                except (IndexError, KeyError):
-                    location_str = None
-                
-                # تحديد رقم المنتج النهائي
-                # إذا كان هناك عمود FINAL_MODEL، استخدمه مباشرة
-                if has_final_model and final_model:
-                    final_product_number = final_model
-                else:
-                    # إذا لم يكن هناك FINAL_MODEL، استخدم product_number
-                    final_product_number = product_number
-                
-                # التحقق من البيانات
-                if not final_product_number or total_quantity is None:
-                    error_details = []
-                    if not final_product_number:
-                        error_details.append('رقم المنتج فارغ')
-                    if total_quantity is None:
-                        error_details.append('الإجمالي فارغ')
-                    
-                    preview_data.append({
-                        'row': row_idx,
-                        'original_number': str(product_number_cell).strip() if product_number_cell and str(product_number_cell).strip() else 'فارغ',
-                        'final_number': final_product_number or 'فارغ',
-                        'total_quantity': total_quantity or 0,
-                        'location': location_str or '',
-                        'status': 'error',
-                        'message': f'⚠️ {" | ".join(error_details)}'
-                    })
-                    continue
-                
-                # التحقق من وجود المنتج
-                existing_product = Product.objects.filter(product_number=final_product_number).first()
-                
-                status = 'new'
-                message = 'منتج جديد'
-                
-                if existing_product:
-                    status = 'exists'
-                    message = f'موجود مسبقاً (الكمية الحالية: {existing_product.quantity})'
-                
-                result_row = {
-                    'row': row_idx,
-                    'original_number': str(product_number_cell).strip() if product_number_cell else product_number,
-                    'final_number': final_product_number,
-                    'total_quantity': total_quantity,
-                    'location': location_str or '',
-                    'status': status,
-                    'message': message
-                }
-                if has_name:
-                    try:
-                        name_cell = row[column_mapping['name']]
-                        result_row['name'] = str(name_cell).strip() if name_cell is not None else ''
-                    except Exception:
-                        result_row['name'] = ''
-                if has_category:
-                    try:
-                        category_cell = row[column_mapping['category']]
-                        result_row['category'] = str(category_cell).strip() if category_cell is not None else ''
-                    except Exception:
-                        result_row['category'] = ''
-                preview_data.append(result_row)
-                
-            except Exception as e:
-                preview_data.append({
-                    'row': row_idx,
-                    'original_number': 'N/A',
-                    'final_number': 'N/A',
-                    'total_quantity': 0,
-                    'location': '',
-                    'status': 'error',
-                    'message': str(e)
-                })
-        
-        print(f"[DEBUG] Preview data count: {len(preview_data)}")
+        if isinstance(sheet, StagedSheet):
+            # المعاينة تُحسب مرة واحدة لكل تحديد أعمدة، وكل صفحة تقرأ شريحتها من الصفوف المحفوظة
+            counts = store_preview(sheet, column_mapping)
+            page_rows, filtered_rows, page, pages, page_size = stored_page(
+                sheet.upload, data.get('status'), data.get('search', ''),
+                data.get('page', 1), data.get('page_size', PREVIEW_PAGE_SIZE)
+            )
+        else:
+            preview_data = build_preview(sheet.iter_rows(), column_mapping)
+            filtered = filter_preview(preview_data, data.get('status'), data.get('search', ''))
+            page_rows, page, pages, page_size = paginate(
+                filtered, data.get('page', 1), data.get('page_size', PREVIEW_PAGE_SIZE)
+            )
+            counts = preview_counts(preview_data)
+            filtered_rows = len(filtered)
         
         return JsonResponse({
             'success': True,
-            'preview': preview_data,
-            'total_rows': len(preview_data),
-            'preview_limit': preview_limit,
-            'full_rows': total_rows
+            'preview': page_rows,
+            'total_rows': sum(counts.values()),
+            'filtered_rows': filtered_rows,
+            'counts': counts,
+            'page': page,
+            'pages': pages,
+            'page_size': page_size,
+            'full_rows': sheet.total_rows
         })
         
     except Exception as e:
         return JsonResponse({'error': f'خطأ في المعاينة: {str(e)}'}, status=500)
 
 
+@transaction.non_atomic_requests
 @login_required
 @admin_required
-@transaction.atomic
 def process_excel_data(request):
-    """معالجة البيانات من Excel وإضافتها للنظام"""
+    """
+    معالجة البيانات من Excel وإضافتها للنظام.
+    تُكتب الصفوف بالجملة على دفعات (كل دفعة في معاملة مستقلة) عبر ExcelImporter.
+    الطلب خارج ATOMIC_REQUESTS حتى تُثبّت كل دفعة فور انتهائها ولا تبقى الأقفال طوال الاستيراد.
+    """
+    from .utils.excel_import import ExcelImporter, preview_items, sheet_items
+    from .utils.excel_staging import discard_sheet, get_sheet
+
     if request.method != 'POST':
         return JsonResponse({'error': 'طريقة غير مسموحة'}, status=405)
     
@@ -4666,15 +4089,15 @@ def process_excel_data(request):
         import json
         data = json.loads(request.body)
         
-        # الحصول على البيانات من الجلسة
-        excel_data = request.session.get('excel_data')
-        if not excel_data:
+        # الحصول على البيانات من المخزن المرحلي
+        sheet = get_sheet(request, data.get('upload_id'))
+        if not sheet:
             return JsonResponse({'error': 'لم يتم العثور على بيانات Excel'}, status=400)
         
         # الحصول على تحديد الأعمدة
         column_mapping = data.get('column_mapping', {})
         conflict_resolution = data.get('conflict_resolution', 'skip')  # skip, update, replace
-        edited_data = data.get('edited_data', None)  # البيانات المعدلة من المعاينة
+        edited_data = data.get('edited_data', None)  # البيانات المعدلة من المعاينة (عملاء قدامى)
         
         # التحقق من الأعمدة المطلوبة
         required_fields = ['product_number', 'total_quantity']
@@ -4682,283 +4105,25 @@ def process_excel_data(request):
             if field not in column_mapping or column_mapping[field] is None:
                 return JsonResponse({'error': f'يجب تحديد عمود {field}'}, status=400)
         
-        headers = excel_data['headers']
-        rows = excel_data['data']
-        
-        print(f"[DEBUG] Edited data received: {edited_data is not None}")
-        if edited_data:
-            print(f"[DEBUG] Edited data count: {len(edited_data)}")
-        
-        # معالجة البيانات
-        results = {
-            'added': 0,
-            'updated': 0,
-            'skipped': 0,
-            'errors': []
-        }
-        
-        from django.db import transaction
-        
-        # تتبع تكرار أرقام المنتجات لإضافة -1, -2, etc
-        product_number_counter = {}
+        importer = ExcelImporter(
+            conflict_resolution,
+            user=request.user.username if request.user.is_authenticated else 'Guest',
+        )
         
-        # إذا كانت هناك بيانات معدلة، استخدمها بدلاً من قراءة Excel مرة أخرى
-        has_name = 'name' in column_mapping and column_mapping['name'] is not None
-        has_category = 'category' in column_mapping and column_mapping['category'] is not None
         if edited_data:
-            print("[DEBUG] Using edited data from preview")
-            for item in edited_data:
-                # تخطي الصفوف التي ما زالت تحتوي على أخطاء
-                if item['status'] == 'error':
-                    results['errors'].append(f"الصف {item['row']}: {item['message']}")
-                    results['skipped'] += 1
-                    continue
-                
-                try:
-                    product_number = item['final_number']
-                    location_str = item.get('location', None)
-                    # استخراج الاسم والفئة إذا طُلبا
-                    name_val = None
-                    category_val = None
-                    try:
-                        src_row = rows[item['row'] - 2]
-                        if has_name and column_mapping['name'] is not None:
-                            nc = src_row[column_mapping['name']]
-                            name_val = str(nc).strip() if nc is not None else None
-                        if has_category and column_mapping['category'] is not None:
-                            cc = src_row[column_mapping['category']]
-                            category_val = str(cc).strip() if cc is not None else None
-                    except Exception:
-                        pass
-                    
-                    # إجمالي الكمية مباشرة
-                    total_quantity = item['total_quantity']
-                    
-                    # معالجة الموقع
-                    location = None
-                    if location_str:
-                        # دعم صيغ متعددة مثل "R1C5" أو "R1-C5" أو "R1 C5"
-                        import re
-                        s = str(location_str).strip().upper()
-                        # تحويل أي فاصل غير حرفي إلى صيغة R..C..
-                        s = s.replace('-', ' ').replace('_', ' ')
-                        s = re.sub(r"\s+", "", s)
-                        match = re.match(r"R(\d+)C(\d+)", s)
-                        if match:
-                            row_num = int(match.group(1))
-                            col_num = int(match.group(2))
-                            warehouse = Warehouse.objects.first()
-                            if warehouse:
-                                location, _ = Location.objects.get_or_create(
-                                    warehouse=warehouse,
-                                    row=row_num,
-                                    column=col_num
-                                )
-                        else:
-                            # كاحتياط: إذا كانت القيمة رقمية فقط فتعامل معها كمُعرّف موقع
-                            if s.isdigit():
-                                try:
-                                    location = Location.objects.get(id=int(s))
-                                except Location.DoesNotExist:
-                                    location = None
-                    
-                    # التحقق من وجود المنتج
-                    existing_product = Product.objects.filter(product_number=product_number).first()
-                    
-                    if existing_product:
-                        if conflict_resolution == 'skip':
-                            results['skipped'] += 1
-                            continue
-                        elif conflict_resolution == 'update':
-                            existing_product.quantity += total_quantity
-                            if location:
-                                existing_product.location = location
-                            update_fields = ['quantity', 'location']
-                            if name_val:
-                                existing_product.name = name_val
-                                update_fields.append('name')
-                            if category_val:
-                                existing_product.category = category_val
-                                update_fields.append('category')
-                            existing_product.save(update_fields=update_fields)
-                            results['updated'] += 1
-                        elif conflict_resolution == 'replace':
-                            existing_product.quantity = total_quantity
-                            if location:
-                                existing_product.location = location
-                            update_fields = ['quantity', 'location']
-                            if name_val:
-                                existing_product.name = name_val
-                                update_fields.append('name')
-                            if category_val:
-                                existing_product.category = category_val
-                                update_fields.append('category')
-                            existing_product.save(update_fields=update_fields)
-                            results['updated'] += 1
-                    else:
-                        # إنشاء منتج جديد
-                        Product.objects.create(
-                            product_number=product_number,
-                            name=(name_val or product_number),
-                            category=(category_val or None),
-                            quantity=total_quantity,
-                            location=location
-                        )
-                        results['added'] += 1
-                        
-                except Exception as e:
-                    results['errors'].append(f"الصف {item['row']}: {str(e)}")
-            
+            # جلب الصفوف الأصلية المطلوبة (للاسم والفئة) في استعلام واحد
+            source_rows = sheet.rows_at({item['row'] - 2 for item in edited_data if isinstance(item.get('row'), int)})
+            results = importer.run(preview_items(edited_data, source_rows, column_mapping, importer))
             return JsonResponse({
                 'success': True,
                 'results': results
             })
         
-        # إذا لم تكن هناك بيانات معدلة، استخدم القراءة المباشرة من Excel
-        has_final_model = 'final_model' in column_mapping and column_mapping['final_model'] is not None
-        
-        for row_idx, row in enumerate(rows, start=2):  # start=2 لأن الصف 1 هو العناوين
-            try:
-                # التحقق من أن الصف ليس فارغاً تماماً
-                if not any(cell for cell in row if cell is not None):
-                    continue
-                
-                # استخراج البيانات مع معالجة الأخطاء
-                try:
-                    product_number_cell = row[column_mapping['product_number']]
-                    product_number = str(product_number_cell).strip() if product_number_cell is not None else None
-                    
-                    # تخطي صفوف العناوين المكررة
-                    if product_number and product_number.upper() in ['MODEL', 'PRODUCT', 'رقم المنتج', 'PRODUCT NUMBER']:
-                        continue
-                except (IndexError, KeyError):
-                    product_number = None
-                
-                # استخراج FINAL_MODEL إذا كان موجوداً
-                final_model = None
-                if has_final_model:
-                    try:
-                        final_model_cell = row[column_mapping['final_model']]
-                        final_model = str(final_model_cell).strip() if final_model_cell is not None else None
-                        
-                        if final_model and final_model.upper() in ['FINAL MODEL', 'FINAL_MODEL', 'رقم المنتج النهائي']:
-                            continue
-                    except (IndexError, KeyError):
-                        final_model = None
-                
-                # إجمالي الكمية (مطلوب)
-                try:
-                    total_cell = row[column_mapping['total_quantity']]
-                    if total_cell and isinstance(total_cell, (int, float)):
-                        total_quantity = int(total_cell)
-                    elif total_cell and str(total_cell).replace('.', '').replace('-', '').isdigit():
-                        total_quantity = int(float(total_cell))
-                    else:
-                        total_quantity = None
-                except (IndexError, KeyError, ValueError):
-                    total_quantity = None
-                
-                # حقول اختيارية
-                location_str = None
-                try:
-                    if 'location' in column_mapping and column_mapping['location'] is not None:
-                        loc_cell = row[column_mapping['location']]
-                        location_str = str(loc_cell).strip() if loc_cell else None
-                except (IndexError, KeyError):
-                    location_str = None
-                
-                # حقول اختيارية: الاسم والفئة
-                name_val = None
-                category_val = None
-                try:
-                    if 'name' in column_mapping and column_mapping['name'] is not None:
-                        nc = row[column_mapping['name']]
-                        name_val = str(nc).strip() if nc is not None else None
-                except Exception:
-                    name_val = None
-                try:
-                    if 'category' in column_mapping and column_mapping['category'] is not None:
-                        cc = row[column_mapping['category']]
-                        category_val = str(cc).strip() if cc is not None else None
-                except Exception:
-                    category_val = None
-                
-                # تحديد رقم المنتج النهائي
-                if has_final_model and final_model:
-                    final_product_number = final_model
-                else:
-                    final_product_number = product_number
-                
-                # التحقق من البيانات
-                if not final_product_number or total_quantity is None:
-                    results['errors'].append(f'الصف {row_idx}: بيانات ناقصة (رقم المنتج أو الإجمالي)')
-                    continue
-                
-                # البحث عن الموقع
-                location = None
-                if location_str:
-                    # تحليل الموقع (مثل R1C5)
-                    import re
-                    match = re.match(r'R(\d+)C(\d+)', location_str.upper())
-                    if match:
-                        row_num = int(match.group(1))
-                        col_num = int(match.group(2))
-                        
-                        # البحث عن الموقع أو إنشاءه
-                        warehouse = Warehouse.objects.first()
-                        if warehouse:
-                            location, _ = Location.objects.get_or_create(
-                                warehouse=warehouse,
-                                row=row_num,
-                                column=col_num
-                            )
-                
-                # التحقق من وجود المنتج
-                existing_product = Product.objects.filter(product_number=final_product_number).first()
-                
-                if existing_product:
-                    # المنتج موجود - معالجة التعارض
-                    if conflict_resolution == 'skip':
-                        results['skipped'] += 1
-                    elif conflict_resolution == 'update':
-                        # تحديث الكمية (إضافة)
-                        existing_product.quantity += total_quantity
-                        if location:
-                            existing_product.location = location
-                        if name_val:
-                            existing_product.name = name_val
-                        if category_val:
-                            existing_product.category = category_val
-                        existing_product.save()
-                        results['updated'] += 1
-                    elif conflict_resolution == 'replace':
-                        # استبدال الكمية
-                        existing_product.quantity = total_quantity
-                        if location:
-                            existing_product.location = location
-                        if name_val:
-                            existing_product.name = name_val
-                        if category_val:
-                            existing_product.category = category_val
-                        existing_product.save()
-                        results['updated'] += 1
-                else:
-                    # منتج جديد
-                    Product.objects.create(
-                        product_number=final_product_number,
-                        name=(name_val or final_product_number),
-                        category=(category_val or None),
-                        quantity=total_quantity,
-                        location=location
-                    )
-                    results['added'] += 1
-                    
-            except Exception as e:
-                results['errors'].append(f'الصف {row_idx}: {str(e)}')
+        # القراءة المباشرة من المخزن المرحلي
+        results = importer.run(sheet_items(sheet.iter_rows(), column_mapping, importer))
         
-        # مسح البيانات من الجلسة
-        if 'excel_data' in request.session:
-            del request.session['excel_data']
+        # مسح البيانات من المخزن المرحلي والجلسة
+        discard_sheet(request, sheet)
         
         return JsonResponse({
             'success': True,
@@ -4977,180 +4142,128 @@ def merge_files_page(request):
     return render(request, 'inventory_app/merge_files.html')
 
 
-def _normalize_product_number(raw):
-    import re
-    if raw is None:
-        return ''
-    s = str(raw).strip()
-    return re.sub(r'[^A-Za-z0-9]', '', s).upper()
-
-
-def _extract_products_from_excel(file_obj):
-    from openpyxl import load_workbook
-    wb = load_workbook(file_obj, data_only=True)
-    ws = wb.active
-    headers = []
-    products = []
-    for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-        if row_idx == 1:
-            headers = [str(c).strip().lower() if c is not None else '' for c in row]
-            continue
-        # heuristic mapping
-        # find product_number column
-        def _norm(s):
-            s = (s or '').strip().lower()
-            # إزالة المسافات وبعض العلامات فقط مع إبقاء الأحرف العربية
-            return ''.join(ch for ch in s if ch not in ' .,_-()[]{}\n\t')
-        def find_col(names):
-            norm_headers = [_norm(h) for h in headers]
-            for n in names:
-                nn = _norm(n)
-                # مطابقة كاملة أو تحتوي
-                for i, nh in enumerate(norm_headers):
-                    if nh == nn or (nn and nn in nh):
-                        return i
-            return None
-        pn_idx = find_col(['final_model', 'final model', 'model', 'product number', 'productnumber', 'رقم المنتج النهائي', 'رقم المنتج', 'موديل', 'الموديل'])
-        qty_idx = find_col(['total_quantity', 'total qty', 'total', 'quantity', 'qty', 't.qty', 'tqty', 'الاجمالي', 'اجمالي', 'الكمية', 'كمية'])
-        if qty_idx is None:
-            for i, h in enumerate(headers):
-                hn = _norm(h)
-                if 'qty' in hn or 'quantity' in hn or 'الكمية' in h or 'اجمالي' in h or 'الاجمالي' in h:
-                    qty_idx = i
-                    break
-        name_idx = find_col(['name', 'الاسم'])
-        if pn_idx is None and len(row) > 0:
-            # fallback: first non-empty cell treated as product number
-            try:
-                pn_idx = next(i for i, c in enumerate(row) if c is not None)
-            except StopIteration:
-                pn_idx = None
-        if pn_idx is None:
-            continue
-        product_number = str(row[pn_idx]).strip() if row[pn_idx] is not None else ''
-        name = str(row[name_idx]).strip() if (name_idx is not None and row[name_idx] is not None) else product_number
-        total_quantity = 0
-        if qty_idx is not None:
-            q = row[qty_idx]
-            if isinstance(q, (int, float)):
-                total_quantity = int(q)
-            elif q and str(q).replace('.', '').replace('-', '').isdigit():
-                try:
-                    total_quantity = int(float(q))
-                except Exception:
-                    total_quantity = 0
-        products.append({'product_number': product_number, 'name': name, 'quantity': total_quantity})
-    return products
-
-
-def _extract_products_from_json(file_obj):
-    import json as pyjson
-    text = file_obj.read().decode('utf-8') if hasattr(file_obj, 'read') else file_obj.decode('utf-8')
-    data = pyjson.loads(text)
-    products = []
-    # backup schema
-    if isinstance(data, dict) and 'products' in data and isinstance(data['products'], list):
-        for rec in data['products']:
-            if isinstance(rec, dict):
-                fields = rec.get('fields', {}) if 'fields' in rec else rec
-                pn = fields.get('product_number') or fields.get('final_model') or ''
-                name = fields.get('name') or pn
-                qty = fields.get('quantity') or 0
-                products.append({'product_number': pn, 'name': name, 'quantity': int(qty) if isinstance(qty, (int, float)) else 0})
-    elif isinstance(data, list):
-        for rec in data:
-            pn = rec.get('product_number') or rec.get('final_model') or ''
-            name = rec.get('name') or pn
-            qty = rec.get('quantity') or 0
-            products.append({'product_number': pn, 'name': name, 'quantity': int(qty) if isinstance(qty, (int, float)) else 0})
-    return products
-
-
 @login_required
 @admin_required
 @require_http_methods(["POST"])
 def merge_files_upload(request):
+    """
+    رفع ملفات الدمج: تُحلل الملفات بالتوازي (ملف لكل عملية) وتُحفظ العناصر في جلسة دمج على الخادم،
+    ويُعاد للمتصفح معرف الجلسة والإحصائيات وأول صفحة فقط.
+    """
+    from .utils.merge_files import create_merge_session, items_page, parse_uploads, session_counts
+
     try:
         files = request.FILES.getlist('files[]') or request.FILES.getlist('files')
         if not files:
             return JsonResponse({'success': False, 'error': 'يرجى اختيار ملفات'}, status=400)
-        all_items = []
-        for f in files:
-            fname = f.name.lower()
-            items = []
-            if fname.endswith(('.xlsx', '.xls')):
-                items = _extract_products_from_excel(f)
-            elif fname.endswith('.json'):
-                items = _extract_products_from_json(f)
-            else:
-                continue
-            for it in items:
-                it['source'] = f.name
-            all_items.extend(items)
-        # duplicates detection
-        groups = {}
-        for it in all_items:
-            key = _normalize_product_number(it.get('product_number'))
-            if not key:
-                continue
-            groups.setdefault(key, []).append(it)
-        duplicates = {k: v for k, v in groups.items() if len(v) > 1}
+        session = create_merge_session(request.user, parse_uploads(files))
+        items, page, pages, page_size, filtered = items_page(session)
         return JsonResponse({
             'success': True,
-            'items': all_items,
-            'counts': {
-                'total': len(all_items),
-                'unique': len(groups),
-                'duplicates': len(duplicates)
-            },
-            'duplicates': duplicates
+            'session_id': str(session.id),
+            'files': session.files,
+            'counts': session_counts(session),
+            'items': items,
+            'page': page,
+            'pages': pages,
+            'page_size': page_size,
+            'filtered': filtered,
         }, json_dumps_params={'ensure_ascii': False})
     except Exception as e:
         logger.error(f'Merge upload error: {str(e)}', exc_info=True)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@login_required
+@admin_required
+@require_http_methods(["GET"])
+def merge_files_items(request):
+    """صفحة من عناصر جلسة الدمج (mode: all / unique / duplicates، q للبحث)"""
+    from .utils.merge_files import MERGE_PAGE_SIZE, get_merge_session, items_page, session_counts
+
+    session = get_merge_session(request.GET.get('session_id'), request.user)
+    if not session:
+        return JsonResponse({'success': False, 'error': 'انتهت جلسة الدمج، يرجى رفع الملفات مجدداً'}, status=404)
+    items, page, pages, page_size, filtered = items_page(
+        session,
+        mode=request.GET.get('mode', 'all'),
+        search=request.GET.get('q', ''),
+        keep_order=request.GET.get('keep_order', '1') != '0',
+        page=request.GET.get('page', 1),
+        page_size=request.GET.get('page_size', MERGE_PAGE_SIZE),
+    )
+    return JsonResponse({
+        'success': True,
+        'counts': session_counts(session),
+        'items': items,
+        'page': page,
+        'pages': pages,
+        'page_size': page_size,
+        'filtered': filtered,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def merge_files_item(request):
+    """حذف عنصر من جلسة الدمج أو تعديله تلقائياً (action: delete / rename)"""
+    from .utils.merge_files import delete_item, get_merge_session, rename_item, session_counts
+
+    try:
+        data = json.loads(request.body)
+        session = get_merge_session(data.get('session_id'), request.user)
+        if not session:
+            return JsonResponse({'success': False, 'error': 'انتهت جلسة الدمج، يرجى رفع الملفات مجدداً'}, status=404)
+        position = int(data.get('position'))
+        if data.get('action') == 'delete':
+            found = delete_item(session, position)
+        elif data.get('action') == 'rename':
+            found = rename_item(session, position) is not None
+        else:
+            return JsonResponse({'success': False, 'error': 'إجراء غير معروف'}, status=400)
+        if not found:
+            return JsonResponse({'success': False, 'error': 'العنصر غير موجود'}, status=404)
+        return JsonResponse({'success': True, 'counts': session_counts(session)})
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'البيانات غير صالحة'}, status=400)
+
+
 @login_required
 @admin_required
 @require_http_methods(["POST"])
 def merge_files_process(request):
+    """
+    تنفيذ الإصلاح (auto_fix: merge / rename) على جلسة الدمج؛ النتيجة تُحفظ كجلسة فرعية
+    ويُعاد معرفها مع أول صفحة فقط.
+    """
+    from .utils.merge_files import (
+        consolidate_session, create_merge_session, get_merge_session, items_page, session_counts,
+    )
+
     try:
-        import json as pyjson
-        body = pyjson.loads(request.body)
-        items = body.get('items', [])
-        auto_fix = body.get('auto_fix', 'merge')  # merge, rename
-        # consolidate
-        consolidated = {}
-        for it in items:
-            key = _normalize_product_number(it.get('product_number'))
-            if not key:
-                continue
-            if key not in consolidated:
-                consolidated[key] = {
-                    'product_number': it.get('product_number') or '',
-                    'name': it.get('name') or it.get('product_number') or '',
-                    'quantity': int(it.get('quantity') or 0)
-                }
-            else:
-                if auto_fix == 'merge':
-                    consolidated[key]['quantity'] += int(it.get('quantity') or 0)
-                elif auto_fix == 'rename':
-                    # keep separate by appending suffix
-                    # store as list of variants
-                    consolidated.setdefault('_variants', []).append(it)
-        result_list = list(consolidated.values())
-        # if rename, append variants with unique suffixes
-        if auto_fix == 'rename' and '_variants' in consolidated:
-            idx = 1
-            for it in consolidated['_variants']:
-                base = str(it.get('product_number') or '')
-                result_list.append({
-                    'product_number': f"{base}-{idx}",
-                    'name': it.get('name') or base,
-                    'quantity': int(it.get('quantity') or 0)
-                })
-                idx += 1
-        return JsonResponse({'success': True, 'items': result_list, 'total': len(result_list)})
+        body = json.loads(request.body)
+        if body.get('session_id'):
+            session = get_merge_session(body['session_id'], request.user)
+            if not session:
+                return JsonResponse({'success': False, 'error': 'انتهت جلسة الدمج، يرجى رفع الملفات مجدداً'}, status=404)
+        else:
+            # عملاء قدامى يرسلون العناصر نفسها
+            session = create_merge_session(request.user, [('', body.get('items', []), '')])
+        result = consolidate_session(session, body.get('auto_fix', 'merge'))
+        items, page, pages, page_size, filtered = items_page(result)
+        counts = session_counts(result)
+        return JsonResponse({
+            'success': True,
+            'session_id': str(result.id),
+            'total': counts['total'],
+            'counts': counts,
+            'items': items,
+            'page': page,
+            'pages': pages,
+            'page_size': page_size,
+            'filtered': filtered,
+        }, json_dumps_params={'ensure_ascii': False})
     except Exception as e:
         logger.error(f'Merge process error: {str(e)}', exc_info=True)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -5160,28 +4273,31 @@ def merge_files_process(request):
 @admin_required
 @require_http_methods(["POST"])
 def merge_files_export(request):
+    """تصدير جلسة الدمج (أو نتيجة الإصلاح) بصيغة JSON متدفقة أو Excel (write_only)"""
+    from django.http import FileResponse
+    from .utils.merge_files import get_merge_session, iter_session_items, stream_json_export, write_xlsx_export
+
     try:
-        import json as pyjson
         export_format = request.POST.get('format', 'json')
         items_json = request.POST.get('items')
-        items = pyjson.loads(items_json) if items_json else []
-        from django.http import HttpResponse
-        if export_format == 'excel':
-            from openpyxl import Workbook
-            wb = Workbook()
-            ws = wb.active
-            ws.title = 'المنتجات'
-            ws.append(['رقم المنتج', 'الاسم', 'الكمية'])
-            for it in items:
-                ws.append([it.get('product_number') or '', it.get('name') or '', int(it.get('quantity') or 0)])
-            resp = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            resp['Content-Disposition'] = 'attachment; filename="merged_products.xlsx"'
-            wb.save(resp)
-            return resp
+        if items_json:
+            # عملاء قدامى يرسلون العناصر نفسها
+            items = json.loads(items_json)
         else:
-            resp = HttpResponse(pyjson.dumps(items, ensure_ascii=False), content_type='application/json')
-            resp['Content-Disposition'] = 'attachment; filename="merged_products.json"'
-            return resp
+            session = get_merge_session(request.POST.get('session_id'), request.user)
+            if not session:
+                return JsonResponse({'success': False, 'error': 'انتهت جلسة الدمج، يرجى رفع الملفات مجدداً'}, status=404)
+            items = iter_session_items(session)
+        if export_format == 'excel':
+            return FileResponse(
+                write_xlsx_export(items),
+                as_attachment=True,
+                filename='merged_products.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        resp = StreamingHttpResponse(stream_json_export(items), content_type='application/json')
+        resp['Content-Disposition'] = 'attachment; filename="merged_products.json"'
+        return resp
     except Exception as e:
         logger.error(f'Merge export error: {str(e)}', exc_info=True)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -5329,7 +4445,23 @@ def container_delete(request, container_id):
             'success': False,
             'error': str(e)
         }, status=500)
-def _load_backup_data(raw_bytes, filename):
+def _load_backup_data(source, filename):
+    """
+    قراءة ملف النسخ الاحتياطي: بالمحلل المتدفق أولاً (ترميز يُكتشف مرة واحدة)،
+    ثم بالمحلل المتسامح للملفات الصغيرة المعدلة يدوياً إذا فشلت القراءة.
+    """
+    from .utils.backup_parser import BackupParseError, load_backup, read_limited
+
+    try:
+        return load_backup(source, filename)
+    except BackupParseError as e:
+        raw_bytes = read_limited(source)
+        if raw_bytes is None:
+            return None, {'error': 'json_invalid', 'message': str(e)}
+    return _load_backup_data_tolerant(raw_bytes, filename)
+
+
+def _load_backup_data_tolerant(raw_bytes, filename):
     data = None
     parse_info = {'source': 'raw', 'encoding': None, 'fixes': []}
     try:
@@ -5615,4 +4747,85 @@ def revert_compaction(request):
         return JsonResponse({'success': True, 'message': f'تم التراجع عن ترتيب {type_str} {undo_info["id"]} بنجاح'})
     
     except Exception as e:
-        return JsonResponse({'success': False, 'error': f'حدث خطأ: {str(e)}'})
\ No newline at end of file
+        return JsonResponse({'success': False, 'error': f'حدث خطأ: {str(e)}'})
+
+# ========== المهام الخلفية ==========
+
+def _get_user_job(request, job_id):
+    """المهمة إن كانت لهذا المستخدم (أو المستخدم superuser)، وإلا None"""
+    from .models import BackgroundJob
+
+    jobs = BackgroundJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(user=request.user)
+    return jobs.filter(pk=job_id).first()
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@admin_required
+def jobs_enqueue(request, kind):
+    """إضافة مهمة خلفية (استيراد Excel، تصدير/استيراد نسخة احتياطية، PDF المنتجات، الصور المصغرة، حذف البيانات)"""
+    from .utils.jobs import JobError, enqueue_from_request, job_payload
+
+    try:
+        job = enqueue_from_request(kind, request)
+    except JobError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'البيانات غير صالحة'}, status=400)
+    return JsonResponse({'success': True, 'job': job_payload(job)}, status=202)
+
+
+@require_http_methods(["GET"])
+@admin_required
+def jobs_list(request):
+    """آخر مهام المستخدم"""
+    from .models import BackgroundJob
+    from .utils.jobs import job_payload
+
+    jobs = BackgroundJob.objects.select_related('user')
+    if not request.user.is_superuser:
+        jobs = jobs.filter(user=request.user)
+    return JsonResponse({'success': True, 'jobs': [job_payload(job) for job in jobs[:50]]})
+
+
+@require_http_methods(["GET"])
+@admin_required
+def job_status(request, job_id):
+    """حالة المهمة وتقدمها (يستعلم عنها المتصفح دورياً)"""
+    from .utils.jobs import job_payload
+
+    job = _get_user_job(request, job_id)
+    if not job:
+        return JsonResponse({'success': False, 'error': 'المهمة غير موجودة'}, status=404)
+    return JsonResponse({'success': True, 'job': job_payload(job)})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@admin_required
+def job_cancel(request, job_id):
+    """إلغاء مهمة (المنتظرة فوراً، والجارية عند أول نقطة فحص)"""
+    from .utils.jobs import job_payload, request_cancel
+
+    job = _get_user_job(request, job_id)
+    if not job:
+        return JsonResponse({'success': False, 'error': 'المهمة غير موجودة'}, status=404)
+    if not request_cancel(job):
+        return JsonResponse({'success': False, 'error': 'المهمة منتهية بالفعل'}, status=409)
+    job.refresh_from_db()
+    return JsonResponse({'success': True, 'job': job_payload(job)})
+
+
+@require_http_methods(["GET"])
+@admin_required
+def job_download(request, job_id):
+    """تنزيل ملف ناتج المهمة (نسخة احتياطية، PDF...)"""
+    import os
+    from django.http import FileResponse
+
+    job = _get_user_job(request, job_id)
+    if not job or job.status != 'succeeded' or not job.result_file or not os.path.exists(job.result_file):
+        return JsonResponse({'success': False, 'error': 'لا يوجد ملف لهذه المهمة'}, status=404)
+    return FileResponse(open(job.result_file, 'rb'), as_attachment=True, filename=os.path.basename(job.result_file))
@@ -215,6 +215,44 @@ PASSWORD_RESET_TIMEOUT = 3600  # ساعة واحدة
 # كلمة مرور تصفير الكميات (اختيارية - تُحمّل من .env)
 RESET_PASSWORD = config('RESET_PASSWORD', default=None)
 
+# سياسة الاحتفاظ بسجلات الصندوق الأسود (أمر prune_secure_backup)
+# كل النسخ لآخر N يوم، ثم آخر نسخة يومياً حتى M يوم، ثم آخر نسخة شهرياً
+SECURE_BACKUP_KEEP_ALL_DAYS = config('SECURE_BACKUP_KEEP_ALL_DAYS', default=30, cast=int)
+SECURE_BACKUP_DAILY_DAYS = config('SECURE_BACKUP_DAILY_DAYS', default=365, cast=int)
+# النسخ التفاضلية تعيد ما سُجل خلال هذا الهامش (ثوانٍ) قبل علامة النسخة السابقة:
+# يلتقط تغييرات معاملات كانت مفتوحة وقت أخذ العلامة وأُودعت بعدها
+BACKUP_WATERMARK_OVERLAP_SECONDS = config('BACKUP_WATERMARK_OVERLAP_SECONDS', default=300, cast=int)
+
+# المهام الخلفية (أمر run_jobs): تفعيلها يجعل الواجهة ترسل الاستيراد/التصدير الطويل كمهام مع متابعة التقدم
+BACKGROUND_JOBS_ENABLED = config('BACKGROUND_JOBS_ENABLED', default=False, cast=bool)
+BACKGROUND_JOBS_DIR = Path(config('BACKGROUND_JOBS_DIR', default=str(BASE_DIR / 'job_files')))
+BACKGROUND_JOB_WORKERS = config('BACKGROUND_JOB_WORKERS', default=2, cast=int)
+BACKGROUND_JOBS_KEEP_DAYS = config('BACKGROUND_JOBS_KEEP_DAYS', default=7, cast=int)
+
+# خدمة PDF (أمر run_pdf_service): عنوان host:port أو مسار unix socket؛ فارغ = إنشاء PDF داخل الطلب
+PDF_SERVICE_ADDRESS = config('PDF_SERVICE_ADDRESS', default='')
+PDF_SERVICE_BROWSERS = config('PDF_SERVICE_BROWSERS', default=2, cast=int)
+PDF_SERVICE_QUEUE = config('PDF_SERVICE_QUEUE', default=16, cast=int)
+
+# محرك PDF الافتراضي: chromium (HTML عبر المتصفح) أو reportlab (بدون متصفح)؛ يمكن تجاوزه بـ ?engine=
+PDF_ENGINE = config('PDF_ENGINE', default='chromium')
+# PDF قائمة المنتجات يُنشأ على أجزاء: عدد الصفوف لكل جزء، وعدد العمليات لأجزاء reportlab (0 = حسب المعالجات، بحد أقصى 4)
+PDF_CHUNK_ROWS = config('PDF_CHUNK_ROWS', default=1000, cast=int)
+PDF_RENDER_WORKERS = config('PDF_RENDER_WORKERS', default=0, cast=int)
+# خط TTF عربي لمحرك reportlab (فارغ = البحث في static/fonts ثم خطوط النظام)
+PDF_FONT_PATH = config('PDF_FONT_PATH', default='')
+PDF_FONT_BOLD_PATH = config('PDF_FONT_BOLD_PATH', default='')
+
+# ذاكرة تخزين ملفات التصدير على القرص (PDF / Excel / CSV)؛ 0 = تعطيلها
+EXPORT_CACHE_DIR = Path(config('EXPORT_CACHE_DIR', default=str(BASE_DIR / 'export_cache')))
+EXPORT_CACHE_MAX_BYTES = config('EXPORT_CACHE_MAX_MB', default=512, cast=int) * 1024 * 1024
+
+# صيغة الصور المصغرة للمنتجات: WEBP أو JPEG (أمر generate_thumbnails --all بعد تغييرها)
+THUMBNAIL_FORMAT = config('THUMBNAIL_FORMAT', default='WEBP')
+
+# عدد العمليات لتحليل ملفات الدمج بالتوازي (0 = حسب عدد المعالجات، بحد أقصى 4)
+MERGE_PARSE_WORKERS = config('MERGE_PARSE_WORKERS', default=0, cast=int)
+
 # Rate limiting settings
 RATELIMIT_ENABLE = config('RATELIMIT_ENABLE', default=True, cast=bool)
 RATELIMIT_USE_CACHE = 'default'
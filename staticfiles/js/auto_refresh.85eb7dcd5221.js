@@ -0,0 +1,5 @@
+/**
+ * Auto refresh script placeholder.
+ * This file was recreated to prevent 404 errors.
+ */
+console.log('Auto refresh script loaded.');